@@ -0,0 +1,118 @@
+"""
+購読者への配信コスト (購読者数ごと)
+
+1セッションの結果メッセージを N 人の購読者へ配る時の、以下を出力する。
+
+- publish: プロデューサーの writer が1メッセージあたりに使う時間 (購読者ごとのバッファに積むだけ)
+- 購読者1人増えるごとの publish の増分
+- 比較用に、購読者ごとにシリアライズし直した場合の時間 (配信側で1回だけシリアライズする効果)
+- 全員に送り終えるまでの配信数/秒 (送信は待ち時間のない偽の WebSocket)
+
+--slow を指定すると購読者の一部を遅い接続にして、プロデューサーと他の購読者が
+待たされないこと (遅い購読者だけが部分結果を捨てられること) を確認する。
+
+実行: uv run python -m benchmarks.broadcast_benchmark [--subscribers 1 10 100 1000] [--messages 2000] [--slow 0.1]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from src.broadcast import DEFAULT_SUBSCRIBER_BUFFER, BroadcastHub
+
+TEXT = "本日の会議では新しい機能について確認します。次回までに資料を準備してください。"
+# 1発話あたりの部分結果の数 (その後に確定結果が1つ)
+PARTIALS_PER_UTTERANCE = 9
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received = 0
+        self.lagged = 0
+
+    async def send_text(self, payload: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if payload.startswith('{"type": "subscriber_lagged"'):
+            self.lagged += 1
+        else:
+            self.received += 1
+
+    async def close(self):
+        pass
+
+
+def messages(count: int):
+    for seq in range(1, count + 1):
+        final = seq % (PARTIALS_PER_UTTERANCE + 1) == 0
+        yield {
+            "type": "transcription_final" if final else "transcription_partial",
+            "utterance_id": f"bench-{seq // (PARTIALS_PER_UTTERANCE + 1)}",
+            "revision": seq % (PARTIALS_PER_UTTERANCE + 1),
+            "text": TEXT,
+            "message_seq": seq,
+        }
+
+
+async def run(subscribers: int, count: int, slow: float, buffer_size: int):
+    hub = BroadcastHub(buffer_size, max_subscribers=0)
+    hub.open("bench")
+    slow_count = int(subscribers * slow)
+    sockets = [FakeWebSocket(0.001 if i < slow_count else 0.0) for i in range(subscribers)]
+    members = [hub.subscribe("bench", socket) for socket in sockets]
+
+    publish_time = 0.0
+    started = time.perf_counter()
+    for message in messages(count):
+        # writer と同じく1回だけシリアライズして配る
+        t0 = time.perf_counter()
+        payload = json.dumps(message, ensure_ascii=False)
+        hub.publish("bench", message["type"], payload)
+        publish_time += time.perf_counter() - t0
+        # 他の処理 (購読者の送信タスク) に順番を回す
+        await asyncio.sleep(0)
+    hub.close("bench")
+    await asyncio.gather(*(member.wait_closed() for member in members[slow_count:]))
+    elapsed = time.perf_counter() - started
+    for member in members:
+        member.cancel()
+
+    # 比較: 購読者ごとにシリアライズし直す場合 (N本の /ws/transcribe 接続の writer がしていること)
+    t0 = time.perf_counter()
+    for message in messages(min(count, 200)):
+        for _ in range(subscribers):
+            json.dumps(message, ensure_ascii=False)
+    per_subscriber = (time.perf_counter() - t0) / min(count, 200)
+
+    fast = sockets[slow_count:]
+    delivered = sum(socket.received for socket in sockets)
+    fast_complete = all(socket.received == count for socket in fast)
+    slow_received = sum(socket.received for socket in sockets[:slow_count]) / max(slow_count, 1)
+    print(
+        f"  {subscribers:>6} {publish_time / count * 1e6:>11.1f} {per_subscriber * 1e6:>13.1f} "
+        f"{delivered / elapsed:>14,.0f} {'yes' if fast_complete else 'NO':>9} "
+        f"{slow_received if slow_count else float('nan'):>10.0f}"
+    )
+    return publish_time / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="購読者への配信コスト")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--slow", type=float, default=0.0, help="遅い購読者 (送信1回1ms) の割合")
+    parser.add_argument("--buffer", type=int, default=DEFAULT_SUBSCRIBER_BUFFER, help="購読者ごとのバッファ")
+    args = parser.parse_args()
+
+    print(f"📊 購読者への配信: {args.messages} メッセージ (部分結果{PARTIALS_PER_UTTERANCE}つごとに確定結果)")
+    print(f"  {'subs':>6} {'publish µs':>11} {'per-sub µs':>13} {'deliveries/s':>14} "
+          f"{'fast=all':>9} {'slow recv':>10}")
+    results = [(n, asyncio.run(run(n, args.messages, args.slow, args.buffer))) for n in args.subscribers]
+    if len(results) > 1:
+        (n0, t0), (n1, t1) = results[0], results[-1]
+        print(f"📊 購読者1人あたりの publish の増分: {(t1 - t0) / (n1 - n0) * 1e6:.3f} µs/メッセージ")
+
+
+if __name__ == "__main__":
+    main()
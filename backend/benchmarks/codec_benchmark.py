@@ -0,0 +1,116 @@
+"""
+音声デコード・リサンプリングのスループットと品質の計測 (コーデックごと)
+
+各コーデックについて、1秒あたりの送信量、AudioDecoder による 16kHz int16 への
+正規化速度 (実時間の何倍か)、符号化→復号の SNR を出力する。
+リサンプラーは正弦波の SNR と、出力ナイキスト周波数を超える成分の抑圧量も確認する。
+
+実行: uv run python -m benchmarks.codec_benchmark [--seconds 60] [--rates 16000 44100 48000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.audio_codec import (
+    TARGET_SAMPLE_RATE,
+    AudioDecoder,
+    PolyphaseResampler,
+    decode_ima_adpcm,
+    decode_mulaw,
+    encode_ima_adpcm,
+    encode_mulaw,
+)
+
+from .vad_benchmark import synthesize
+
+
+def snr_db(reference: np.ndarray, actual: np.ndarray) -> float:
+    reference = reference.astype(np.float64)
+    noise = np.sum((reference - actual.astype(np.float64)) ** 2)
+    if noise == 0:
+        return float("inf")
+    return 10 * np.log10(np.sum(reference ** 2) / noise)
+
+
+def encode_frames(audio: np.ndarray, encoding: str, frame_samples: int):
+    """クライアントと同じ単位でフレームごとに符号化し、(ペイロード, 復号結果) を返す"""
+    payloads, decoded = [], []
+    index = 0
+    for start in range(0, audio.size, frame_samples):
+        block = audio[start:start + frame_samples]
+        if encoding == "pcm_s16le":
+            payload = block.tobytes()
+            decoded.append(block)
+        elif encoding == "pcm_f32le":
+            payload = (block / 32768).astype(np.float32).tobytes()
+            decoded.append(np.frombuffer(payload, dtype=np.float32) * 32768)
+        elif encoding == "mulaw":
+            payload = encode_mulaw(block)
+            decoded.append(decode_mulaw(payload))
+        else:
+            # ADPCMブロックは奇数サンプル - 比較用に末尾の複製分を落とす
+            payload, index = encode_ima_adpcm(block, index)
+            decoded.append(decode_ima_adpcm(payload)[:block.size])
+        payloads.append(payload)
+    return payloads, np.concatenate(decoded)
+
+
+def bench_codecs(seconds: float, rates, frame_ms: int):
+    print(f"📊 コーデック: {seconds:.0f}秒の音声, フレーム {frame_ms}ms → {TARGET_SAMPLE_RATE}Hz int16")
+    print(f"  {'encoding':<10} {'rate':>6} {'KB/s':>7} {'vs 16k s16':>10} {'x realtime':>11} {'SNR dB':>7}")
+    baseline = TARGET_SAMPLE_RATE * 2
+    for rate in rates:
+        audio = synthesize(seconds, rate)
+        frame_samples = rate * frame_ms // 1000
+        # ADPCMはフレームごとに独立したブロックなので1サンプル多い奇数長にする
+        for encoding in ("pcm_s16le", "pcm_f32le", "mulaw", "ima_adpcm"):
+            samples = frame_samples + 1 if encoding == "ima_adpcm" else frame_samples
+            payloads, decoded = encode_frames(audio, encoding, samples)
+            wire = sum(len(payload) for payload in payloads) / seconds
+
+            decoder = AudioDecoder(rate, encoding)
+            start = time.process_time()
+            for payload in payloads:
+                decoder.decode(payload)
+            elapsed = max(time.process_time() - start, 1e-9)
+
+            print(
+                f"  {encoding:<10} {rate:>6} {wire / 1024:>7.1f} {wire / baseline:>9.2f}x "
+                f"{seconds / elapsed:>10,.0f}x {snr_db(audio, decoded):>7.1f}"
+            )
+
+
+def bench_resampler(rates):
+    print("📊 リサンプラー品質 (1kHz正弦波のSNR / 出力ナイキスト超の成分の抑圧)")
+    for rate in rates:
+        if rate == TARGET_SAMPLE_RATE:
+            continue
+        t = np.arange(rate * 2) / rate
+        resampler = PolyphaseResampler(rate)
+        out = resampler.process(10000 * np.sin(2 * np.pi * 1000 * t))
+        m = np.arange(out.size)
+        ideal = 10000 * np.sin(2 * np.pi * 1000 * (m / TARGET_SAMPLE_RATE - resampler.delay))
+        # 立ち上がり (フィルタ長ぶん) を除いて比較
+        skip = resampler.taps
+        quality = snr_db(ideal[skip:], out[skip:])
+
+        alias_hz = min(rate / 2 * 0.9, TARGET_SAMPLE_RATE * 0.75)
+        resampler = PolyphaseResampler(rate)
+        out = resampler.process(10000 * np.sin(2 * np.pi * alias_hz * t))[skip:]
+        rejection = 20 * np.log10(np.sqrt(np.mean(out ** 2)) / (10000 / np.sqrt(2)))
+        print(f"  {rate:>6}Hz: SNR {quality:.1f} dB, {alias_hz / 1000:.1f}kHz の抑圧 {rejection:.1f} dB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="音声コーデックのスループットと品質")
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--rates", type=int, nargs="+", default=[16000, 44100, 48000])
+    parser.add_argument("--frame-ms", type=int, default=100)
+    args = parser.parse_args()
+    bench_codecs(args.seconds, args.rates, args.frame_ms)
+    bench_resampler(args.rates)
+
+
+if __name__ == "__main__":
+    main()
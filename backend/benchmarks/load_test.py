@@ -0,0 +1,408 @@
+"""
+/ws/transcribe の同時接続負荷試験とレイテンシ計測
+
+複数の擬似クライアントがPCM/WAVの音声を実時間 (または加速) で送り、
+以下を計測する。
+
+- 維持できた接続数、送信チャンク数/秒
+- 最初の部分結果までの時間 / 最終結果までの時間 (p50/p95/p99)
+- サーバーのCPU時間とRSS (1接続あたり)
+- サーバーがアップストリームへ音声を送った回数 (/metrics の transcribe_upstream_sends_total)
+
+レイテンシの起点は各発話の最後の音声フレームを送信した時刻で、発話区間は
+サーバーと同じVADで音声ファイルから求める。
+
+実行例 (偽Liveサーバーでサーバーを起動して計測):
+    uv run python -m benchmarks.load_test --spawn-server --clients 20 --pace 4 \\
+        --output results.json --baseline baseline.json
+
+アップストリームへ送るフレームの長さごとの比較 (送信間隔の揺らぎ付き):
+    uv run python -m benchmarks.load_test --spawn-server --jitter-ms 40 --upstream-frame-ms 0
+    uv run python -m benchmarks.load_test --spawn-server --jitter-ms 40 --upstream-frame-ms 50
+
+文字起こしプロファイルごとの比較 (発話の区間もプロファイルのVAD設定で求める):
+    uv run python -m benchmarks.load_test --spawn-server --clients 8 --profile dictation
+    uv run python -m benchmarks.load_test --spawn-server --clients 8 --profile meeting
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import wave
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import websockets
+
+from src.profiles import DEFAULT_PROFILE, PROFILES
+from src.protocol import build_audio_frame
+from src.vad import AUDIO, SPEECH_END, VADConfig, VoiceActivitySegmenter
+
+from .vad_benchmark import synthesize
+
+SAMPLE_RATE = 16000
+PARTIAL_TYPES = ("transcription_partial",)
+FINAL_TYPES = ("transcription_result", "transcription_final")
+
+# ベースラインとの比較で回帰とみなす指標と方向 (True: 大きいほど悪い)
+REGRESSION_METRICS = {
+    "time_to_first_partial_ms.p95": True,
+    "time_to_final_ms.p95": True,
+    "chunks_per_second": False,
+    "connections_sustained": False,
+    "server_cpu_seconds_per_connection": True,
+}
+
+
+def load_audio(path: Optional[str], seconds: float) -> np.ndarray:
+    """WAV (16kHz mono 16bit) または生PCMを読み込む - 未指定なら合成音声"""
+    if path is None:
+        return synthesize(seconds, SAMPLE_RATE)
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError("WAVは16kHz mono 16bitである必要があります")
+            return np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    return np.fromfile(path, dtype=np.int16)
+
+
+def utterance_end_samples(audio: np.ndarray, config: Optional[VADConfig] = None) -> List[int]:
+    """音声ファイル中の各発話の終了位置 (サンプル) をVADで求める"""
+    segmenter = VoiceActivitySegmenter(config)
+    ends = []
+    position = 0
+    batch = SAMPLE_RATE
+    for i in range(0, len(audio), batch):
+        for event in segmenter.process(audio[i:i + batch]):
+            if event.kind == AUDIO:
+                position = int(event.offset_ms * SAMPLE_RATE / 1000) + event.audio.size
+            elif event.kind == SPEECH_END:
+                ends.append(position)
+    if segmenter.in_speech:
+        ends.append(position)
+    return ends
+
+
+@dataclass
+class ClientResult:
+    connected: bool = False
+    completed: bool = False
+    error: Optional[str] = None
+    chunks_sent: int = 0
+    first_partial_ms: List[float] = field(default_factory=list)
+    final_ms: List[float] = field(default_factory=list)
+
+
+async def run_client(url: str, audio: np.ndarray, ends: List[int], frame_samples: int,
+                     pace: float, result_timeout: float, jitter_ms: float = 0.0,
+                     profile: str = DEFAULT_PROFILE) -> ClientResult:
+    result = ClientResult()
+    end_times: Dict[int, float] = {}
+    first_seen: Dict[int, float] = {}
+    done = asyncio.Event()
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            result.connected = True
+            await ws.send(json.dumps({
+                "type": "start_session", "mode": "streaming", "protocol": "binary", "profile": profile,
+            }))
+
+            async def reader():
+                utterance = 0
+                async for raw in ws:
+                    message = json.loads(raw)
+                    now = time.perf_counter()
+                    kind = message.get("type")
+                    if kind in PARTIAL_TYPES or kind in FINAL_TYPES:
+                        first_seen.setdefault(utterance, now)
+                    if kind in FINAL_TYPES:
+                        if utterance in end_times:
+                            result.first_partial_ms.append((first_seen[utterance] - end_times[utterance]) * 1000)
+                            result.final_ms.append((now - end_times[utterance]) * 1000)
+                        utterance += 1
+                    elif kind == "error":
+                        result.error = message.get("message")
+                    elif kind == "session_ended":
+                        done.set()
+                        return
+
+            reader_task = asyncio.create_task(reader())
+            started = time.perf_counter()
+            next_end = 0
+            for sequence, offset in enumerate(range(0, len(audio), frame_samples)):
+                frame = audio[offset:offset + frame_samples]
+                await ws.send(build_audio_frame(frame.tobytes(), sequence, time.time() * 1000))
+                result.chunks_sent += 1
+                sent_until = offset + frame.size
+                while next_end < len(ends) and ends[next_end] <= sent_until:
+                    end_times[next_end] = time.perf_counter()
+                    next_end += 1
+                if pace > 0:
+                    # ネットワークの揺らぎの代わりに、送信時刻を最大 jitter_ms 遅らせる
+                    target = started + sent_until / SAMPLE_RATE / pace + random.uniform(0, jitter_ms) / 1000
+                    await asyncio.sleep(max(0.0, target - time.perf_counter()))
+
+            await ws.send(json.dumps({"type": "end_session"}))
+            await asyncio.wait_for(done.wait(), timeout=result_timeout)
+            result.completed = result.error is None
+            reader_task.cancel()
+    except Exception as e:
+        result.error = result.error or f"{type(e).__name__}: {e}"
+    return result
+
+
+class ProcessSampler:
+    """/proc からサーバープロセスのCPU時間とRSSを取得 (Linuxのみ)"""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid
+        self.peak_rss = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def available(self) -> bool:
+        return self.pid is not None and os.path.exists(f"/proc/{self.pid}/stat")
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.pid}/stat") as f:
+            parts = f.read().rsplit(")", 1)[1].split()
+        return (int(parts[11]) + int(parts[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss_bytes(self) -> int:
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    async def _sample(self):
+        while True:
+            self.peak_rss = max(self.peak_rss, self.rss_bytes())
+            await asyncio.sleep(0.2)
+
+    def start(self):
+        if self.available():
+            self._task = asyncio.create_task(self._sample())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def upstream_sends(url: str) -> Optional[float]:
+    """サーバーの /metrics からアップストリームへの送信回数を読む"""
+    metrics_url = url.replace("ws://", "http://", 1).replace("wss://", "https://", 1).rsplit("/ws/", 1)[0] + "/metrics"
+    try:
+        with urllib.request.urlopen(metrics_url, timeout=5) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    for line in text.splitlines():
+        if line.startswith("transcribe_upstream_sends_total "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "count": len(values)}
+
+
+async def run_load(args, server_pid: Optional[int]) -> Dict:
+    audio = load_audio(args.audio, args.seconds)
+    ends = utterance_end_samples(audio, PROFILES[args.profile].vad)
+    frame_samples = SAMPLE_RATE * args.frame_ms // 1000
+
+    sampler = ProcessSampler(server_pid)
+    cpu_before = sampler.cpu_seconds() if sampler.available() else None
+    rss_before = sampler.rss_bytes() if sampler.available() else None
+    sampler.start()
+    sends_before = upstream_sends(args.url)
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(args.clients):
+        tasks.append(asyncio.create_task(
+            run_client(args.url, audio, ends, frame_samples, args.pace, args.result_timeout, args.jitter_ms,
+                       args.profile)
+        ))
+        if args.ramp > 0:
+            await asyncio.sleep(args.ramp / args.clients)
+    results: List[ClientResult] = await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    await sampler.stop()
+    sends_after = upstream_sends(args.url)
+
+    sustained = sum(1 for r in results if r.completed)
+    chunks = sum(r.chunks_sent for r in results)
+    report = {
+        "config": {
+            "clients": args.clients,
+            "pace": args.pace,
+            "frame_ms": args.frame_ms,
+            "jitter_ms": args.jitter_ms,
+            "upstream_frame_ms": args.upstream_frame_ms,
+            "profile": args.profile,
+            "audio_seconds": len(audio) / SAMPLE_RATE,
+            "utterances_per_client": len(ends),
+        },
+        "wall_seconds": wall,
+        "connections_sustained": sustained,
+        "connection_errors": [r.error for r in results if r.error][:10],
+        "chunks_per_second": chunks / wall if wall else 0.0,
+        "upstream_sends_per_client": None,
+        "time_to_first_partial_ms": percentiles([v for r in results for v in r.first_partial_ms]),
+        "time_to_final_ms": percentiles([v for r in results for v in r.final_ms]),
+        "server_cpu_seconds_per_connection": None,
+        "server_rss_bytes_per_connection": None,
+    }
+    if sends_before is not None and sends_after is not None:
+        report["upstream_sends_per_client"] = (sends_after - sends_before) / max(1, args.clients)
+    if cpu_before is not None and sampler.available():
+        connections = max(1, args.clients)
+        report["server_cpu_seconds_per_connection"] = (sampler.cpu_seconds() - cpu_before) / connections
+        report["server_rss_bytes_per_connection"] = max(0, sampler.peak_rss - rss_before) / connections
+    return report
+
+
+def lookup(report: Dict, path: str):
+    value = report
+    for key in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """ベースラインより tolerance 以上悪化した指標を列挙"""
+    regressions = []
+    for path, higher_is_worse in REGRESSION_METRICS.items():
+        current, previous = lookup(report, path), lookup(baseline, path)
+        if current is None or previous is None or previous == 0:
+            continue
+        change = (current - previous) / abs(previous)
+        if (change > tolerance) if higher_is_worse else (change < -tolerance):
+            regressions.append(f"{path}: {previous:.3f} -> {current:.3f} ({change:+.1%})")
+    return regressions
+
+
+def spawn_server(port: int, fake_env: Dict[str, str]) -> subprocess.Popen:
+    """偽Liveサーバーを使うバックエンドを別プロセスで起動"""
+    env = dict(os.environ, TRANSCRIPTION_BACKEND="fake", **fake_env)
+    backend_dir = os.path.join(os.path.dirname(__file__), "..")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=backend_dir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("サーバーの起動に失敗しました")
+
+
+def print_report(report: Dict):
+    print("📊 負荷試験結果")
+    print(f"  接続維持: {report['connections_sustained']}/{report['config']['clients']}")
+    print(f"  チャンク/秒: {report['chunks_per_second']:.1f}")
+    if report.get("upstream_sends_per_client") is not None:
+        print(f"  アップストリームへの送信/接続: {report['upstream_sends_per_client']:.0f}回")
+    for key, label in (("time_to_first_partial_ms", "最初の部分結果"), ("time_to_final_ms", "最終結果")):
+        stats = report[key]
+        if stats["count"]:
+            print(f"  {label}: p50 {stats['p50']:.0f}ms / p95 {stats['p95']:.0f}ms / p99 {stats['p99']:.0f}ms ({stats['count']}件)")
+    if report["server_cpu_seconds_per_connection"] is not None:
+        print(f"  サーバーCPU/接続: {report['server_cpu_seconds_per_connection'] * 1000:.1f}ms")
+        print(f"  サーバーRSS/接続: {report['server_rss_bytes_per_connection'] / 1024:.0f}KiB")
+    for error in report["connection_errors"]:
+        print(f"  ❌ {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/ws/transcribe 負荷試験")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws/transcribe")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--audio", help="16kHz mono 16bit のWAVまたは生PCM (未指定なら合成音声)")
+    parser.add_argument("--seconds", type=float, default=12.0, help="合成音声の長さ")
+    parser.add_argument("--pace", type=float, default=1.0, help="1.0=実時間, 4=4倍速, 0=待ちなし")
+    parser.add_argument("--frame-ms", type=int, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="送信時刻の揺らぎの最大値")
+    parser.add_argument("--ramp", type=float, default=0.0, help="全クライアントが接続するまでの秒数")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE, help="start_session で指定する文字起こしプロファイル")
+    parser.add_argument("--result-timeout", type=float, default=30.0)
+    parser.add_argument("--spawn-server", action="store_true", help="偽Liveサーバーでサーバーを起動して計測")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server-pid", type=int, help="既存サーバーのPID (CPU/RSS計測用)")
+    parser.add_argument("--upstream-frame-ms", help="起動するサーバーの UPSTREAM_FRAME_MS (0 で受信したまま送る)")
+    parser.add_argument("--fake-first-token-latency", default="0.3")
+    parser.add_argument("--fake-token-interval", default="0.05")
+    parser.add_argument("--output", help="結果をJSONで保存")
+    parser.add_argument("--baseline", help="比較するベースラインのJSON")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="回帰とみなす悪化率")
+    args = parser.parse_args()
+
+    process = None
+    db_dir = None
+    server_pid = args.server_pid
+    if args.spawn_server:
+        # 文字起こしストアは計測ごとの一時ディレクトリに書く (backend/transcripts.db を汚さない)
+        db_dir = tempfile.TemporaryDirectory(prefix="load_test-")
+        server_env = {
+            "FAKE_FIRST_TOKEN_LATENCY": args.fake_first_token_latency,
+            "FAKE_TOKEN_INTERVAL": args.fake_token_interval,
+            "TRANSCRIPT_DB": os.path.join(db_dir.name, "transcripts.db"),
+        }
+        if args.upstream_frame_ms is not None:
+            server_env["UPSTREAM_FRAME_MS"] = args.upstream_frame_ms
+        process = spawn_server(args.port, server_env)
+        server_pid = process.pid
+        args.url = f"ws://127.0.0.1:{args.port}/ws/transcribe"
+
+    try:
+        report = asyncio.run(run_load(args, server_pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if db_dir is not None:
+            db_dir.cleanup()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("⚠️ ベースラインからの回帰:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("✅ ベースラインからの回帰なし")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+文字起こしストアの書き込みスループット (同時セッション数ごと)
+
+多数のセッションが同時に確定結果を追記する状況をイベントループ上で再現し、
+以下を出力する。
+
+- コミットされた発話数/秒
+- キューに積んでからコミットされるまでの時間 (p50/p99, ヒストグラムのバケット上限による近似)
+- イベントループの最大遅延 (書き込みがループを止めていないことの確認)
+
+バッチサイズ 1 (1件ずつコミット) と比べると、まとめて書く効果が分かる。
+
+実行: uv run python -m benchmarks.store_benchmark [--sessions 10 100 1000] [--utterances 50]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from src.metrics import Trace, metrics
+from src.transcript_store import DEFAULT_BATCH_SIZE, TranscriptStore
+
+TEXT = "本日の会議では新しい機能について確認します。次回までに資料を準備してください。"
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """interval ごとに起きて、予定からの遅れの最大値を返す"""
+    worst = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+async def session(store: TranscriptStore, index: int, utterances: int, interval: float):
+    session_id = f"bench-{index}"
+    store.start_session(session_id, "streaming")
+    for n in range(utterances):
+        trace = Trace(f"{session_id}-{n}")
+        trace.mark("first_partial")
+        trace.mark("turn_complete")
+        store.append(session_id, {"utterance_id": f"{session_id}-{n}", "text": TEXT, "offset_ms": n * 3000.0}, trace)
+        await asyncio.sleep(interval)
+    store.end_session(session_id)
+
+
+async def run(sessions: int, utterances: int, batch_size: int, interval: float):
+    with tempfile.TemporaryDirectory() as directory:
+        store = TranscriptStore(os.path.join(directory, "bench.db"), batch_size=batch_size)
+        store.start()
+        metrics.histograms.pop(("transcribe_store_commit_ms", ""), None)
+
+        stop = asyncio.Event()
+        lag = asyncio.create_task(loop_lag(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(session(store, i, utterances, interval) for i in range(sessions)))
+        await asyncio.to_thread(store.close)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        worst_lag = await lag
+
+        commit = metrics.histograms.get(("transcribe_store_commit_ms", ""))
+        p50 = commit.quantile(0.5) if commit else 0.0
+        p99 = commit.quantile(0.99) if commit else 0.0
+        print(
+            f"  {sessions:>6} {batch_size:>6} {store.written / elapsed:>12,.0f} "
+            f"{store.written / max(store.batches, 1):>10.1f} {p50:>9.1f} {p99:>9.1f} "
+            f"{worst_lag * 1000:>9.1f} {store.dropped:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字起こしストアの書き込みスループット")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--utterances", type=int, default=50, help="1セッションあたりの発話数")
+    parser.add_argument("--interval", type=float, default=0.0, help="セッションごとの発話の間隔 (秒)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, DEFAULT_BATCH_SIZE])
+    args = parser.parse_args()
+
+    print(f"📊 文字起こしストア: 1セッションあたり {args.utterances} 発話")
+    print(f"  {'sessions':>6} {'batch':>6} {'rows/s':>12} {'rows/txn':>10} {'p50 ms':>9} {'p99 ms':>9} "
+          f"{'lag ms':>9} {'dropped':>8}")
+    for sessions in args.sessions:
+        for batch_size in args.batch_sizes:
+            asyncio.run(run(sessions, args.utterances, batch_size, args.interval))
+
+
+if __name__ == "__main__":
+    main()
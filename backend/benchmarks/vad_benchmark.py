@@ -0,0 +1,60 @@
+"""
+サーバー側VADのスループット計測 (1コアあたりのフレーム数/秒)
+
+実行: uv run python -m benchmarks.vad_benchmark [--seconds 600] [--batch-ms 100]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.vad import AUDIO, VADConfig, VoiceActivitySegmenter
+
+
+def synthesize(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """無音 (ノイズ) と有声 (倍音付きの正弦波) が交互に続く合成音声"""
+    rng = np.random.default_rng(seed)
+    samples = int(seconds * sample_rate)
+    audio = rng.normal(0, 8, samples)
+    t = np.arange(samples) / sample_rate
+    voiced = (np.floor(t / 1.5) % 2) == 1
+    tone = 2000 * np.sin(2 * np.pi * 180 * t) + 800 * np.sin(2 * np.pi * 540 * t)
+    audio[voiced] += tone[voiced]
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def run(seconds: float, batch_ms: int, config: VADConfig):
+    audio = synthesize(seconds, config.sample_rate)
+    batch = config.sample_rate * batch_ms // 1000
+    payloads = [audio[i:i + batch].tobytes() for i in range(0, len(audio), batch)]
+
+    segmenter = VoiceActivitySegmenter(config)
+    forwarded = 0
+    start = time.process_time()
+    for payload in payloads:
+        for event in segmenter.process(payload):
+            if event.kind == AUDIO:
+                forwarded += event.audio.size
+    segmenter.flush()
+    elapsed = time.process_time() - start
+
+    frames = segmenter.frames_total
+    print(f"📊 VADベンチマーク: {seconds:.0f}秒の音声, バッチ {batch_ms}ms, フレーム {config.frame_ms}ms")
+    print(f"  処理フレーム数: {frames}")
+    print(f"  CPU時間: {elapsed:.3f}s")
+    print(f"  スループット: {frames / elapsed:,.0f} frames/s/core (実時間の {seconds / elapsed:,.0f} 倍)")
+    print(f"  有声フレーム率: {segmenter.frames_voiced / frames:.1%}")
+    print(f"  アップストリーム送信量: {forwarded * 2:,} / {audio.nbytes:,} bytes ({forwarded / audio.size:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VADスループット計測")
+    parser.add_argument("--seconds", type=float, default=600.0)
+    parser.add_argument("--batch-ms", type=int, default=100)
+    parser.add_argument("--frame-ms", type=int, default=20)
+    args = parser.parse_args()
+    run(args.seconds, args.batch_ms, VADConfig(frame_ms=args.frame_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -86,18 +86,25 @@ async def test_with_microphone():
                 print("📤 音声データ送信中...")
                 await websocket.send(json.dumps(audio_message))
                 
-                # 文字起こし結果待機
+                # 文字起こし結果待機 (部分結果 transcription_partial のあとに最終結果 transcription_final が届く)
                 print("⏳ 文字起こし結果待機...")
                 try:
-                    response = await asyncio.wait_for(websocket.recv(), timeout=20.0)
-                    result = json.loads(response)
-                    
-                    if result["type"] == "transcription_result":
-                        print("=" * 50)
-                        print(f"📝 文字起こし結果: '{result['text']}'")
-                        print("=" * 50)
-                    else:
-                        print(f"📥 応答: {response}")
+                    while True:
+                        response = await asyncio.wait_for(websocket.recv(), timeout=20.0)
+                        result = json.loads(response)
+                        
+                        if result["type"] == "transcription_partial":
+                            print(f"✏️ 部分結果: '{result['text']}'")
+                        elif result["type"] == "transcription_final":
+                            print("=" * 50)
+                            print(f"📝 文字起こし結果: '{result['text']}'")
+                            print("=" * 50)
+                            break
+                        elif result["type"] == "error":
+                            print(f"❌ エラー応答: {response}")
+                            break
+                        else:
+                            print(f"📥 応答: {response}")
                         
                 except asyncio.TimeoutError:
                     print("⏰ タイムアウト: 文字起こし結果が返されませんでした")
@@ -112,7 +119,11 @@ async def test_with_microphone():
             
             # セッション終了
             await websocket.send(json.dumps({"type": "end_session"}))
-            final_response = await websocket.recv()
+            while True:
+                final_response = await asyncio.wait_for(websocket.recv(), timeout=10.0)
+                if json.loads(final_response)["type"] == "session_ended":
+                    break
+                print(f"📥 応答: {final_response}")
             print(f"🔚 終了応答: {final_response}")
             
     except ConnectionRefusedError:
@@ -0,0 +1,223 @@
+"""アップストリーム処理のアドミッション制御
+
+プロセス全体で1つの UpstreamScheduler が、Liveセッションの利用 (チャンク1つ、または
+ストリーミングセッション1つ) を次の条件で許可する。
+
+- APIキーごとのトークンバケット (利用開始のレート制限)
+- 同時に使用するアップストリームセッション数の上限
+- 接続ごとの待ち行列をラウンドロビンで処理し、1つの接続が他を待たせ続けないようにする
+
+待ち行列が満杯、または max_wait 秒以内に許可されない場合は AdmissionError を送出する。
+
+上限のうち reserved 枠はストリーミングセッションの入れ替え (すでに1枠を使っている接続が
+次のセッションを裏で開く間だけ使う) 用に残しておき、飽和していても入れ替えられるようにする。
+予約枠は待ち行列に並ばず、空いていなければすぐに AdmissionError になる。
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Hashable, Optional, Tuple
+
+from .metrics import metrics
+
+DEFAULT_MAX_CONCURRENT = 8
+# APIキーごとの利用開始レート (回/秒) とバースト
+DEFAULT_RATE = 10.0
+DEFAULT_BURST = 20
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_MAX_WAIT = 10.0
+DEFAULT_RESERVED = 1
+
+
+class AdmissionError(RuntimeError):
+    """アップストリームが飽和しているため処理できない"""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """トークンを1つ消費 - 足りなければ消費せず、補充されるまでの秒数を返す"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class UpstreamScheduler:
+    def __init__(
+        self,
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        reserved: int = 0,
+    ):
+        if not 0 <= reserved < max_concurrent:
+            raise ValueError("reserved は 0 以上 max_concurrent 未満にしてください")
+        self.max_concurrent = max_concurrent
+        self.reserved = reserved
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._buckets: Dict[str, TokenBucket] = {}
+        # 接続 (owner) ごとの待ち行列 - 先頭の接続から1件ずつ許可し、末尾へ回す
+        self._waiters: "OrderedDict[Hashable, Deque[Tuple[asyncio.Future, str]]]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.active = 0
+        self.queued = 0
+
+        # メトリクス
+        self.granted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.reserved_granted = 0
+        self.reserved_rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    @property
+    def limit(self) -> int:
+        """予約枠を除いた同時利用数の上限"""
+        return self.max_concurrent - self.reserved
+
+    @property
+    def saturated(self) -> bool:
+        """待ち行列が満杯 - 新しい接続は受け付けない"""
+        return self.queued >= self.max_queue
+
+    @asynccontextmanager
+    async def slot(self, owner: Hashable, key: str = "default", reserved: bool = False):
+        """アップストリームの処理枠を確保するコンテキストマネージャ (reserved=True で予約枠から)"""
+        if reserved:
+            self.acquire_reserved(key)
+        else:
+            await self.acquire(owner, key)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, owner: Hashable, key: str = "default"):
+        started = time.perf_counter()
+        if not self._waiters and self.active < self.limit and self._bucket(key).take() == 0:
+            self.active += 1
+            self._record_wait(started)
+            return
+
+        if self.saturated:
+            self.rejected += 1
+            metrics.inc("transcribe_admission_rejected_total")
+            raise AdmissionError("サーバーが混雑しています。しばらくしてから再試行してください")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(owner, deque()).append((future, key))
+        self.queued += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            self._remove(owner, future)
+            self.timeouts += 1
+            metrics.inc("transcribe_admission_timeouts_total")
+            raise AdmissionError(f"{self.max_wait:g}秒以内に処理枠を確保できませんでした") from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 許可と同時にキャンセルされた - 枠を返す
+                self.release()
+            else:
+                self._remove(owner, future)
+            raise
+        self._record_wait(started)
+
+    def acquire_reserved(self, key: str = "default"):
+        """予約枠を含めて空きがあればすぐに確保する - なければ待たずに AdmissionError"""
+        if self.active >= self.max_concurrent or self._bucket(key).take() > 0:
+            self.reserved_rejected += 1
+            metrics.inc("transcribe_admission_reserved_rejected_total")
+            raise AdmissionError("予約枠に空きがありません")
+        self.active += 1
+        self.reserved_granted += 1
+
+    def release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "reserved": self.reserved,
+            "max_queue": self.max_queue,
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "reserved_granted": self.reserved_granted,
+            "reserved_rejected": self.reserved_rejected,
+            "avg_wait_ms": self.total_wait / self.granted * 1000 if self.granted else 0.0,
+            "max_wait_ms": self.max_wait_seen * 1000,
+        }
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def _record_wait(self, started: float):
+        wait = time.perf_counter() - started
+        self.granted += 1
+        self.total_wait += wait
+        self.max_wait_seen = max(self.max_wait_seen, wait)
+        metrics.observe("transcribe_admission_wait_ms", wait * 1000)
+
+    def _remove(self, owner: Hashable, future: asyncio.Future):
+        waiters = self._waiters.get(owner)
+        if waiters is None:
+            return
+        for entry in waiters:
+            if entry[0] is future:
+                waiters.remove(entry)
+                self.queued -= 1
+                break
+        if not waiters:
+            del self._waiters[owner]
+
+    def _dispatch(self):
+        while self._waiters and self.active < self.limit:
+            owner, waiters = next(iter(self._waiters.items()))
+            future, key = waiters[0]
+            if future.done():
+                # タイムアウト・キャンセル済み (呼び出し側の後始末より先に回ってきた)
+                self._remove(owner, future)
+                continue
+
+            wait = self._bucket(key).take()
+            if wait > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(wait, self._on_timer)
+                return
+
+            waiters.popleft()
+            self.queued -= 1
+            del self._waiters[owner]
+            if waiters:
+                self._waiters[owner] = waiters
+            self.active += 1
+            future.set_result(None)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
@@ -0,0 +1,292 @@
+"""音声のデコードとリサンプリング
+
+クライアントはキャプチャしたままのレート (44.1kHz / 48kHz など) と形式
+(int16 / float32 / μ-law / IMA ADPCM) で音声を送り、サーバー側でアップストリームが
+要求する 16kHz mono int16 に正規化する。
+
+- μ-law: 256要素のテーブル参照でデコード
+- IMA ADPCM: ステップ幅と予測値を飽和付きの累積和として、倍々に合成するスキャンでまとめて求める
+- リサンプリング: 窓付きsincのポリフェーズFIRを、出力サンプル単位でまとめて畳み込む
+
+16kHz int16 の入力はコピーせずそのまま返す。
+"""
+import struct
+from functools import lru_cache
+from math import gcd
+from typing import Optional, Tuple, Union
+
+import numpy as np
+
+from .protocol import SAMPLE_ALIGNMENT, FrameError, SampleFormat
+
+TARGET_SAMPLE_RATE = 16000
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 96000
+
+# start_session の "encoding" で指定できる値
+ENCODINGS = {
+    "pcm_s16le": SampleFormat.PCM_S16LE,
+    "pcm_f32le": SampleFormat.PCM_F32LE,
+    "mulaw": SampleFormat.MULAW,
+    "ima_adpcm": SampleFormat.IMA_ADPCM,
+}
+
+# ポリフェーズ1相あたりのタップ数とKaiser窓のβ
+RESAMPLER_TAPS = 48
+RESAMPLER_BETA = 6.0
+# 通過域の端 (出力ナイキスト周波数に対する比)
+RESAMPLER_ROLLOFF = 0.9
+
+ADPCM_HEADER = struct.Struct("<hBx")
+
+ADPCM_INDEX_TABLE = np.array([-1, -1, -1, -1, 2, 4, 6, 8] * 2, dtype=np.int64)
+
+ADPCM_STEP_TABLE = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487,
+    12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+], dtype=np.int64)
+
+MULAW_BIAS = 0x84
+MULAW_CLIP = 32635
+
+
+class AudioFormatError(ValueError):
+    """未対応の音声形式・サンプルレート"""
+
+
+def _build_mulaw_table() -> np.ndarray:
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa << 3) + MULAW_BIAS) << exponent) - MULAW_BIAS
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+MULAW_TABLE = _build_mulaw_table()
+
+
+def decode_mulaw(data: Union[bytes, memoryview]) -> np.ndarray:
+    return MULAW_TABLE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def encode_mulaw(samples: np.ndarray) -> bytes:
+    """int16 → μ-law (G.711)"""
+    x = samples.astype(np.int32)
+    sign = (x < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(x), MULAW_CLIP) + MULAW_BIAS
+    # magnitude は 132..32767 なのでビット長 8..15 が指数 0..7 に対応する
+    exponent = np.frexp(magnitude)[1] - 8
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def _clamped_accumulate(start: int, deltas: np.ndarray, low: int, high: int) -> np.ndarray:
+    """start から deltas を順に加算した系列 (各ステップで [low, high] に飽和)
+
+    1ステップ x → min(high, max(low, x + d)) を合成しても x → min(hi, max(lo, x + s)) の形の
+    ままなので、前から i 番目までを合成した (s, lo, hi) を倍々に合成するスキャン
+    (log2(n) 回のベクトル演算) で求める。飽和が何回起きても Python のループにはならない。
+    """
+    raw = start + np.cumsum(deltas)
+    if raw.size == 0 or (raw.min() >= low and raw.max() <= high):
+        # 一度も飽和しなければ累積和そのもの
+        return raw
+    shift = deltas.astype(np.int64)
+    lo = np.full(shift.size, low, dtype=np.int64)
+    hi = np.full(shift.size, high, dtype=np.int64)
+    step = 1
+    while step < shift.size:
+        # i 番目までの合成 = (i - step 番目までの合成) の後に (i - step + 1 〜 i 番目の合成)
+        later_shift, later_lo, later_hi = shift[step:], lo[step:], hi[step:]
+        merged_lo = np.clip(lo[:-step] + later_shift, later_lo, later_hi)
+        merged_hi = np.clip(hi[:-step] + later_shift, later_lo, later_hi)
+        merged_shift = shift[:-step] + later_shift
+        shift[step:], lo[step:], hi[step:] = merged_shift, merged_lo, merged_hi
+        step *= 2
+    return np.clip(start + shift, lo, hi)
+
+
+def decode_ima_adpcm(block: Union[bytes, memoryview]) -> np.ndarray:
+    """モノラルIMA ADPCMブロック1つをデコード
+
+    ブロックは predictor (i16) | step_index (u8) | 予約 (u8) | 4bitコード (下位ニブルが先)。
+    """
+    view = memoryview(block).cast("B")
+    if len(view) < ADPCM_HEADER.size:
+        raise FrameError(f"ADPCMブロックが短すぎます: {len(view)} bytes")
+    predictor, index = ADPCM_HEADER.unpack_from(view)
+    if index >= ADPCM_STEP_TABLE.size:
+        raise FrameError(f"ADPCMのステップインデックスが不正です: {index}")
+
+    data = np.frombuffer(view[ADPCM_HEADER.size:], dtype=np.uint8)
+    codes = np.empty(data.size * 2, dtype=np.int64)
+    codes[0::2] = data & 0x0F
+    codes[1::2] = data >> 4
+
+    # 各コードを復号する時点のステップ幅 (インデックスの飽和があるため逐次計算)
+    indices = np.empty(codes.size, dtype=np.int64)
+    if codes.size:
+        indices[0] = index
+        indices[1:] = _clamped_accumulate(index, ADPCM_INDEX_TABLE[codes[:-1]], 0, ADPCM_STEP_TABLE.size - 1)
+    steps = ADPCM_STEP_TABLE[indices]
+
+    diff = (steps >> 3) + np.where(codes & 4, steps, 0) + np.where(codes & 2, steps >> 1, 0) \
+        + np.where(codes & 1, steps >> 2, 0)
+    diff = np.where(codes & 8, -diff, diff)
+
+    samples = np.empty(codes.size + 1, dtype=np.int16)
+    samples[0] = predictor
+    samples[1:] = _clamped_accumulate(predictor, diff, -32768, 32767)
+    return samples
+
+
+def encode_ima_adpcm(samples: np.ndarray, index: int = 0) -> Tuple[bytes, int]:
+    """int16 → モノラルIMA ADPCMブロック1つ (ベンチマーク・クライアント用)
+
+    ブロックのサンプル数は奇数 (先頭1サンプル + 2の倍数) なので、偶数の場合は末尾を複製する。
+    次のブロックに引き継ぐステップインデックスも返す。
+    """
+    values = samples.astype(np.int64).tolist()
+    if len(values) % 2 == 0:
+        values.append(values[-1] if values else 0)
+    predictor = values[0]
+    header = ADPCM_HEADER.pack(predictor, index)
+
+    steps = ADPCM_STEP_TABLE.tolist()
+    index_table = ADPCM_INDEX_TABLE.tolist()
+    codes = []
+    for sample in values[1:]:
+        step = steps[index]
+        diff = sample - predictor
+        code = 8 if diff < 0 else 0
+        diff = abs(diff)
+        delta = step >> 3
+        if diff >= step:
+            code |= 4
+            diff -= step
+            delta += step
+        if diff >= step >> 1:
+            code |= 2
+            diff -= step >> 1
+            delta += step >> 1
+        if diff >= step >> 2:
+            code |= 1
+            delta += step >> 2
+        predictor = max(-32768, min(32767, predictor - delta if code & 8 else predictor + delta))
+        index = max(0, min(len(steps) - 1, index + index_table[code]))
+        codes.append(code)
+
+    packed = np.array(codes, dtype=np.uint8).reshape(-1, 2)
+    return header + (packed[:, 0] | (packed[:, 1] << 4)).astype(np.uint8).tobytes(), index
+
+
+@lru_cache(maxsize=None)
+def design_polyphase_filter(up: int, down: int, taps: int = RESAMPLER_TAPS,
+                            beta: float = RESAMPLER_BETA) -> np.ndarray:
+    """窓付きsincのローパスを (位相, タップ) に並べ替えたもの - 各相の係数和はほぼ1"""
+    length = up * taps
+    cutoff = RESAMPLER_ROLLOFF * 0.5 / max(up, down)
+    n = np.arange(length) - (length - 1) / 2
+    prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta)
+    prototype *= up / prototype.sum()
+    # phases[p, k] = prototype[p + k * up]
+    return prototype.reshape(taps, up).T.astype(np.float32).copy()
+
+
+class PolyphaseResampler:
+    """有理数比のストリーミングリサンプラー
+
+    出力サンプル m は、アップサンプル後の位置 m * down に対応する位相の係数と
+    直近 taps 個の入力の内積。チャンクをまたぐ分の入力は履歴として保持する。
+    """
+
+    def __init__(self, source_rate: int, target_rate: int = TARGET_SAMPLE_RATE, taps: int = RESAMPLER_TAPS):
+        divisor = gcd(source_rate, target_rate)
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.up = target_rate // divisor
+        self.down = source_rate // divisor
+        self.taps = taps
+        self.phases = design_polyphase_filter(self.up, self.down, taps)
+        self._offsets = np.arange(taps)
+        self._history = np.zeros(taps - 1, dtype=np.float32)
+        self._consumed = 0
+        self._produced = 0
+
+    @property
+    def delay(self) -> float:
+        """フィルタの群遅延 (秒)"""
+        return (self.up * self.taps - 1) / 2 / (self.up * self.source_rate)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        buffer = np.concatenate((self._history, samples.astype(np.float32, copy=False)))
+        # buffer[0] に対応する入力サンプルの通し番号
+        start = self._consumed - self._history.size
+        self._consumed += samples.size
+
+        end = -(-self._consumed * self.up // self.down)
+        outputs = np.arange(self._produced, end, dtype=np.int64)
+        self._produced = end
+        self._history = buffer[buffer.size - (self.taps - 1):]
+        if outputs.size == 0:
+            return np.empty(0, dtype=np.float32)
+
+        position = outputs * self.down
+        base = position // self.up - start
+        window = buffer[base[:, None] - self._offsets]
+        return np.einsum("nk,nk->n", window, self.phases[position % self.up])
+
+    def reset(self):
+        self._history[:] = 0
+        self._consumed = 0
+        self._produced = 0
+
+
+class AudioDecoder:
+    """接続ごとの音声デコーダ - 受信した音声を 16kHz int16 PCM に正規化"""
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, encoding: str = "pcm_s16le",
+                 target_rate: int = TARGET_SAMPLE_RATE):
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise AudioFormatError(f"未対応のサンプルレート: {sample_rate}")
+        if encoding not in ENCODINGS:
+            raise AudioFormatError(f"未対応のエンコーディング: {encoding}")
+        self.sample_rate = sample_rate
+        self.encoding = encoding
+        self.sample_format = ENCODINGS[encoding]
+        self.target_rate = target_rate
+        self._resampler: Optional[PolyphaseResampler] = None
+        if sample_rate != target_rate:
+            self._resampler = PolyphaseResampler(sample_rate, target_rate)
+
+    def decode(self, payload: Union[bytes, memoryview],
+               sample_format: Optional[SampleFormat] = None) -> Union[bytes, memoryview]:
+        """ペイロードを 16kHz int16 PCM に変換 (変換不要ならそのまま返す)"""
+        sample_format = self.sample_format if sample_format is None else sample_format
+        if len(payload) % SAMPLE_ALIGNMENT[sample_format]:
+            raise FrameError(f"データ長がサンプル境界に揃っていません: {sample_format.name}")
+        if sample_format == SampleFormat.PCM_S16LE and self._resampler is None:
+            return payload
+
+        if sample_format == SampleFormat.PCM_S16LE:
+            samples = np.frombuffer(payload, dtype=np.int16)
+        elif sample_format == SampleFormat.PCM_F32LE:
+            samples = np.frombuffer(payload, dtype=np.float32)
+            if not np.isfinite(samples).all():
+                # NaN / ±inf はリサンプラーの履歴に残ると以降の出力がすべて壊れる
+                samples = np.nan_to_num(samples, nan=0.0, posinf=1.0, neginf=-1.0)
+            samples = samples * 32768
+        elif sample_format == SampleFormat.MULAW:
+            samples = decode_mulaw(payload)
+        elif sample_format == SampleFormat.IMA_ADPCM:
+            samples = decode_ima_adpcm(payload)
+
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        if samples.dtype != np.int16:
+            samples = np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+        return memoryview(samples).cast("B")
@@ -0,0 +1,165 @@
+"""文字起こし結果の配信 (読み取り専用の購読者)
+
+音声を送る接続 (プロデューサー) 1つのアップストリームのセッションの結果を、
+/ws/subscribe/{session_id} で接続した任意の数の購読者へそのまま配る。
+
+- 結果メッセージはプロデューサーの writer で1回だけシリアライズし、同じテキストを全員に送る
+- 購読者ごとに有界のバッファと送信タスクを持ち、遅い購読者がプロデューサーや他の購読者を
+  待たせることはない
+- バッファが満杯になったら、後の結果で置き換わる部分結果から捨てる。確定結果しか残って
+  いなければ最も古いものを捨てる。捨てた後の最初のメッセージの前に
+  subscriber_lagged (捨てた件数) を送る (message_seq の欠番でも分かる)
+- 購読前の確定結果は GET /sessions/{session_id}/transcript で取得できる
+"""
+import asyncio
+import json
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Optional, Set, Tuple
+
+from .metrics import logger, metrics
+
+if TYPE_CHECKING:
+    from fastapi import WebSocket
+
+DEFAULT_SUBSCRIBER_BUFFER = 256
+DEFAULT_MAX_SUBSCRIBERS = 1024
+
+# 購読者へ配るメッセージの種類 (session_token を含む session_started やエラーは配らない)
+PUBLISHED_TYPES = frozenset({
+    "speech_started", "speech_ended", "transcription_partial", "transcription_final", "session_ended",
+})
+FINAL_TYPES = frozenset({"transcription_final", "session_ended"})
+
+
+class Subscriber:
+    """購読者1人分の送信バッファと送信タスク"""
+
+    def __init__(self, websocket: "WebSocket", capacity: int = DEFAULT_SUBSCRIBER_BUFFER):
+        self.websocket = websocket
+        self.capacity = capacity
+        # (確定結果か, シリアライズ済みのJSONテキスト)
+        self._buffer: Deque[Tuple[bool, str]] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._lagged = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self):
+        self._task = asyncio.create_task(self._sender())
+
+    def push(self, final: bool, payload: str):
+        """プロデューサーから呼ばれる - 待たない"""
+        if len(self._buffer) >= self.capacity:
+            self._drop()
+        self._buffer.append((final, payload))
+        self._ready.set()
+
+    def _drop(self):
+        for index, (final, _) in enumerate(self._buffer):
+            if not final:
+                del self._buffer[index]
+                break
+        else:
+            self._buffer.popleft()
+        self.dropped += 1
+        self._lagged += 1
+        metrics.inc("transcribe_subscriber_dropped_total")
+
+    def finish(self):
+        """バッファに残っている分を送り終えたら接続を閉じる"""
+        self._closing = True
+        self._ready.set()
+
+    async def wait_closed(self):
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _sender(self):
+        try:
+            while True:
+                if not self._buffer:
+                    if self._closing:
+                        break
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+                if self._lagged:
+                    lagged, self._lagged = self._lagged, 0
+                    await self.websocket.send_text(json.dumps({"type": "subscriber_lagged", "dropped": lagged}))
+                _, payload = self._buffer.popleft()
+                await self.websocket.send_text(payload)
+                self.sent += 1
+            await self.websocket.close()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 購読者が切断した - 受信ループ側の unsubscribe で後始末する
+            logger.debug(f"購読者への送信エラー: {e}")
+
+
+class BroadcastHub:
+    """session_id ごとの購読者"""
+
+    def __init__(self, buffer_size: int = DEFAULT_SUBSCRIBER_BUFFER, max_subscribers: int = DEFAULT_MAX_SUBSCRIBERS):
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._channels: Dict[str, Set[Subscriber]] = {}
+        self.subscribers = 0
+        self.published = 0
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._channels
+
+    @property
+    def full(self) -> bool:
+        return bool(self.max_subscribers) and self.subscribers >= self.max_subscribers
+
+    def open(self, session_id: str):
+        """プロデューサーのセッション開始"""
+        self._channels.setdefault(session_id, set())
+
+    def close(self, session_id: str):
+        """プロデューサーのセッション終了 - 購読者には送り終えてから切断する"""
+        for subscriber in self._channels.pop(session_id, ()):
+            subscriber.finish()
+
+    def publish(self, session_id: str, message_type: str, payload: str):
+        """プロデューサーの writer から呼ばれる - 購読者ごとのバッファに積むだけ"""
+        channel = self._channels.get(session_id)
+        if not channel or message_type not in PUBLISHED_TYPES:
+            return
+        final = message_type in FINAL_TYPES
+        for subscriber in channel:
+            subscriber.push(final, payload)
+        self.published += 1
+        metrics.inc("transcribe_broadcast_deliveries_total", len(channel))
+
+    def subscribe(self, session_id: str, websocket: "WebSocket") -> Optional[Subscriber]:
+        channel = self._channels.get(session_id)
+        if channel is None:
+            return None
+        subscriber = Subscriber(websocket, self.buffer_size)
+        subscriber.start()
+        channel.add(subscriber)
+        self.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, session_id: str, subscriber: Subscriber):
+        channel = self._channels.get(session_id)
+        if channel is not None:
+            channel.discard(subscriber)
+        subscriber.cancel()
+        self.subscribers -= 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "channels": len(self._channels),
+            "subscribers": self.subscribers,
+            "published": self.published,
+        }
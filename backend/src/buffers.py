@@ -0,0 +1,50 @@
+"""音声サンプルのバッファ
+
+CLI のキャプチャ (capture.py) とサーバーのフレーム化 (framing.py) の両方で使う。
+"""
+import threading
+
+import numpy as np
+
+
+class RingBuffer:
+    """int16 サンプルの固定長リングバッファ (書き込み1スレッド・読み出し1スレッド)"""
+
+    def __init__(self, capacity: int):
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self._read = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.overflow_samples = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, samples: np.ndarray):
+        """書き込む - 入りきらない分は古い音声から捨てる"""
+        if samples.size > self.capacity:
+            self.overflow_samples += samples.size - self.capacity
+            samples = samples[-self.capacity:]
+        with self._lock:
+            overflow = self._size + samples.size - self.capacity
+            if overflow > 0:
+                self._read = (self._read + overflow) % self.capacity
+                self._size -= overflow
+                self.overflow_samples += overflow
+            start = (self._read + self._size) % self.capacity
+            first = min(samples.size, self.capacity - start)
+            self._buffer[start:start + first] = samples[:first]
+            self._buffer[:samples.size - first] = samples[first:]
+            self._size += samples.size
+
+    def read_into(self, out: np.ndarray) -> int:
+        """out の長さまで読み出し、読んだサンプル数を返す"""
+        with self._lock:
+            count = min(out.size, self._size)
+            first = min(count, self.capacity - self._read)
+            out[:first] = self._buffer[self._read:self._read + first]
+            out[first:count] = self._buffer[:count - first]
+            self._read = (self._read + count) % self.capacity
+            self._size -= count
+        return count
@@ -0,0 +1,457 @@
+"""録音済みファイルの一括文字起こし
+
+WAV / 生PCM ファイルをメモリマップで開き、無音の位置で区切ったセグメントを
+最大 workers 個の Liveセッションで並行して文字起こしする。
+
+- ファイル全体は読み込まない (区切り位置の検出も変換もセグメント1つ分ずつ)
+- 結果はセグメントの順番どおりに、先頭から揃ったものを順次返す
+- 結果を書き出す JSON Lines ファイルがそのままチェックポイントになり、
+  途中で止めても続きから再開できる
+- 処理した音声の秒数 / 経過秒 (実時間の何倍で処理できたか) を報告する
+
+実行: uv run python -m src.bulk recording.wav [-o recording.jsonl] [--workers 4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, replace
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .admission import AdmissionError, UpstreamScheduler
+from .hedging import HedgePolicy, UpstreamTimeoutError
+from .audio_codec import TARGET_SAMPLE_RATE, PolyphaseResampler
+from .metrics import logger, metrics
+from .profiles import DEFAULT_PROFILE, PROFILES, TranscriptionProfile
+from .session_pool import LiveSessionPool
+from .transcribe_service import TranscribeService
+from .upstream import TranscriptionBackend
+from .vad import VADConfig, VoiceActivitySegmenter
+
+DEFAULT_WORKERS = 4
+# アップストリームが混雑・応答しない場合の再試行
+RETRIES = 5
+RETRY_DELAY = 1.0
+
+WAV_FORMAT_PCM = 1
+WAV_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class BulkFormatError(ValueError):
+    """読み込めない音声ファイル、または別のファイルのチェックポイント"""
+
+
+@dataclass(frozen=True)
+class BulkConfig:
+    workers: int = DEFAULT_WORKERS
+    # セグメントの長さ - この範囲で最も長い無音の中央で区切る (無音がなければ max で切る)
+    max_segment_s: float = 30.0
+    min_segment_s: float = 5.0
+    min_silence_ms: int = 300
+    # これ以上続く無音ではアップストリームがターンを終え、その後の音声の結果が返らないため、
+    # セグメントの長さに関わらず必ず区切る (None ならプロファイルの silence_duration_ms)
+    max_pause_ms: Optional[int] = None
+    # 順番待ちを含めて同時に抱えるセグメント数 (workers の何倍か)
+    lookahead: int = 2
+
+
+@dataclass(frozen=True)
+class AudioFile:
+    path: str
+    # (フレーム数, チャンネル数) の int16 メモリマップ
+    samples: np.ndarray
+    sample_rate: int
+    channels: int
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate
+
+    @classmethod
+    def open(cls, path: str, sample_rate: int = TARGET_SAMPLE_RATE, channels: int = 1) -> "AudioFile":
+        """WAV (16bit PCM) はヘッダーの形式、それ以外は生の int16 PCM として開く"""
+        offset, size = 0, os.path.getsize(path)
+        with open(path, "rb") as f:
+            if f.read(4) == b"RIFF":
+                sample_rate, channels, offset, size = _parse_wav(f, size)
+        if channels < 1 or sample_rate <= 0:
+            raise BulkFormatError(f"不正な音声形式: {sample_rate}Hz, {channels}ch")
+        frames = size // (2 * channels)
+        if frames == 0:
+            raise BulkFormatError("音声データがありません")
+        samples = np.memmap(path, dtype=np.int16, mode="r", offset=offset, shape=(frames, channels))
+        return cls(path, samples, sample_rate, channels)
+
+
+def _parse_wav(f, file_size: int) -> Tuple[int, int, int, int]:
+    """RIFFチャンクをたどり (サンプルレート, チャンネル数, dataの位置, dataのサイズ) を返す"""
+    f.seek(12)
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise BulkFormatError("WAVファイルに data チャンクがありません")
+        chunk_id, chunk_size = struct.unpack("<4sI", header)
+        if chunk_id == b"fmt ":
+            fmt = struct.unpack("<HHIIHH", f.read(16))
+            f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise BulkFormatError("WAVファイルの fmt チャンクが data より後にあります")
+            audio_format, channels, sample_rate, _, _, bits = fmt
+            if audio_format not in (WAV_FORMAT_PCM, WAV_FORMAT_EXTENSIBLE) or bits != 16:
+                raise BulkFormatError(f"未対応のWAV形式: format={audio_format}, {bits}bit (16bit PCMのみ)")
+            offset = f.tell()
+            # 書き込み途中・ストリーミング録音のWAVはサイズが 0 / 0xFFFFFFFF のことがある
+            available = file_size - offset
+            size = chunk_size if 0 < chunk_size <= available else available
+            return sample_rate, channels, offset, size
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+@dataclass(frozen=True)
+class Segment:
+    index: int
+    # 元ファイルのフレーム位置 [start, end)
+    start: int
+    end: int
+    voiced: bool
+
+
+def mono(block: np.ndarray) -> np.ndarray:
+    """(n, channels) → (n,) - モノラルならコピーせずそのまま"""
+    if block.shape[1] == 1:
+        return block[:, 0]
+    return block.mean(axis=1, dtype=np.float32)
+
+
+def _silence_cut(voiced: np.ndarray, min_frames: int, min_run: int) -> int:
+    """min_frames 以降で最も長い無音区間の中央 (同じ長さなら後ろ側) - なければ末尾"""
+    silent = np.concatenate(([0], (~voiced).view(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(silent))
+    starts, ends = edges[::2], edges[1::2]
+    lengths = ends - starts
+    centers = (starts + ends) // 2
+    scores = np.where((lengths >= min_run) & (centers >= min_frames), lengths, 0)
+    if scores.size == 0 or scores.max() == 0:
+        return voiced.size
+    return int(centers[scores.size - 1 - np.argmax(scores[::-1])])
+
+
+def _pause_cut(voiced: np.ndarray, pause_run: int) -> Optional[int]:
+    """pause_run フレーム以上続く最初の無音区間の中央 - なければ None
+
+    先頭の無音 (前のセグメントで区切った無音の後半) は発話より前なのでターンを終えない。
+    """
+    silent = np.concatenate(([0], (~voiced).view(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(silent))
+    starts, ends = edges[::2], edges[1::2]
+    centers = (starts + ends) // 2
+    long_runs = np.flatnonzero((ends - starts >= pause_run) & (starts > 0))
+    if long_runs.size == 0:
+        return None
+    return int(centers[long_runs[0]])
+
+
+def find_segments(audio: AudioFile, config: Optional[BulkConfig] = None,
+                  start: int = 0, first_index: int = 0) -> Iterator[Segment]:
+    """無音の位置でファイルを区切る
+
+    max_pause_ms 以上の無音があればそこで必ず区切り、なければ min_segment_s〜max_segment_s の
+    範囲で最も長い無音の中央で区切る。
+    判定は VoiceActivitySegmenter.classify でフレーム単位に一括で行い、区切った後ろの
+    判定結果は次のセグメントに持ち越す。区切り位置は start からの音声だけで決まるため、
+    同じ start から始めれば再開しても同じ位置で区切られる。
+    """
+    config = config or BulkConfig()
+    vad = VoiceActivitySegmenter(VADConfig(sample_rate=audio.sample_rate))
+    frame_ms = vad.config.frame_ms
+    fs = vad.config.frame_samples
+    max_frames = max(1, int(config.max_segment_s * 1000) // frame_ms)
+    min_frames = max(1, int(config.min_segment_s * 1000) // frame_ms)
+    min_run = max(1, config.min_silence_ms // frame_ms)
+    max_pause_ms = config.max_pause_ms or PROFILES[DEFAULT_PROFILE].silence_duration_ms
+    pause_run = max(1, max_pause_ms // frame_ms)
+
+    # start からのフレームの有声/無声
+    voiced = np.empty(0, dtype=bool)
+    index = first_index
+    while start < audio.frames:
+        limit = min(start + max_frames * fs, audio.frames)
+        judged = start + voiced.size * fs
+        n = (limit - judged) // fs
+        if n > 0:
+            block = mono(audio.samples[judged:judged + n * fs])
+            voiced = np.concatenate((voiced, vad.classify(block.reshape(n, fs))))
+
+        cut = _pause_cut(voiced, pause_run)
+        if cut is not None:
+            end = start + cut * fs
+        elif limit < audio.frames:
+            cut = _silence_cut(voiced, min_frames, min_run)
+            end = start + cut * fs
+        else:
+            cut = voiced.size
+            end = audio.frames
+        yield Segment(index, start, end, bool(voiced[:cut].any()))
+        voiced = voiced[cut:]
+        start = end
+        index += 1
+
+
+def segment_pcm(audio: AudioFile, segment: Segment) -> bytes:
+    """セグメントを 16kHz mono int16 PCM に変換"""
+    samples = mono(audio.samples[segment.start:segment.end])
+    if audio.sample_rate != TARGET_SAMPLE_RATE:
+        # セグメントは無音で始まるため、フィルタの状態は引き継がなくてよい
+        samples = PolyphaseResampler(audio.sample_rate).process(samples)
+    if samples.dtype != np.int16:
+        samples = np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+    return samples.tobytes()
+
+
+class BulkTranscriber:
+    def __init__(self, backend: TranscriptionBackend, config: Optional[BulkConfig] = None,
+                 pool: Optional[LiveSessionPool] = None, scheduler: Optional[UpstreamScheduler] = None,
+                 hedging: Optional[HedgePolicy] = None, profile: Optional[TranscriptionProfile] = None):
+        profile = profile or PROFILES[DEFAULT_PROFILE]
+        config = config or BulkConfig()
+        if config.max_pause_ms is None:
+            config = replace(config, max_pause_ms=profile.silence_duration_ms)
+        self.config = config
+        # セグメントは transcribe_audio_chunk と同じ経路 (プール・アドミッション制御・ヘッジ) で処理する
+        self.service = TranscribeService(backend, pool=pool, scheduler=scheduler, hedging=hedging, profile=profile)
+        self.audio_seconds = 0.0
+        self.segments = 0
+        self.elapsed = 0.0
+
+    @property
+    def realtime_factor(self) -> float:
+        """処理した音声の秒数 / 経過秒"""
+        return self.audio_seconds / self.elapsed if self.elapsed else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "segments": self.segments,
+            "audio_seconds": round(self.audio_seconds, 3),
+            "elapsed_seconds": round(self.elapsed, 3),
+            "realtime_factor": round(self.realtime_factor, 2),
+        }
+
+    async def run(self, audio: AudioFile, start: int = 0, first_index: int = 0) -> AsyncIterator[Dict[str, Any]]:
+        """セグメントの結果を順番どおりに返す"""
+        semaphore = asyncio.Semaphore(self.config.workers)
+        limit = self.config.workers * max(1, self.config.lookahead)
+        pending: Deque[asyncio.Task] = deque()
+        started = time.perf_counter()
+        try:
+            for segment in find_segments(audio, self.config, start, first_index):
+                pending.append(asyncio.create_task(self._transcribe(audio, segment, semaphore)))
+                while pending and (len(pending) >= limit or pending[0].done()):
+                    yield self._completed(audio, await pending.popleft(), started)
+            while pending:
+                yield self._completed(audio, await pending.popleft(), started)
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.elapsed = time.perf_counter() - started
+
+    def _completed(self, audio: AudioFile, record: Dict[str, Any], started: float) -> Dict[str, Any]:
+        seconds = (record["end_sample"] - record["start_sample"]) / audio.sample_rate
+        self.segments += 1
+        self.audio_seconds += seconds
+        self.elapsed = time.perf_counter() - started
+        metrics.inc("transcribe_bulk_segments_total")
+        metrics.inc("transcribe_bulk_audio_seconds_total", seconds)
+        logger.info(
+            f"📈 {record['end_sample'] / audio.frames:.1%} 処理済み "
+            f"({self.audio_seconds:.0f}秒の音声, {self.realtime_factor:.1f}x 実時間)"
+        )
+        return record
+
+    async def _transcribe(self, audio: AudioFile, segment: Segment, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        text, error = None, None
+        if segment.voiced:
+            async with semaphore:
+                started = time.perf_counter()
+                pcm = await asyncio.to_thread(segment_pcm, audio, segment)
+                for attempt in range(RETRIES):
+                    try:
+                        text = await self.service.transcribe_audio_chunk(pcm)
+                        error = None
+                        break
+                    except (AdmissionError, UpstreamTimeoutError) as e:
+                        error = str(e)
+                    except Exception as e:
+                        metrics.inc("transcribe_errors_total")
+                        error = str(e)
+                    if attempt < RETRIES - 1:
+                        logger.warning(f"⏳ セグメント {segment.index} を再試行します: {error}")
+                        await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+                else:
+                    # 全体は止めず、失敗したセグメントとして記録する
+                    logger.error(f"❌ セグメント {segment.index} の文字起こしに失敗しました: {error}")
+                    metrics.inc("transcribe_bulk_failed_segments_total")
+                metrics.observe("transcribe_bulk_segment_ms", (time.perf_counter() - started) * 1000)
+        record = {
+            "type": "segment",
+            "index": segment.index,
+            "start": round(segment.start / audio.sample_rate, 3),
+            "end": round(segment.end / audio.sample_rate, 3),
+            "start_sample": segment.start,
+            "end_sample": segment.end,
+            "text": text or "",
+        }
+        if text is None and error is not None:
+            record["error"] = error
+        return record
+
+
+def checkpoint_header(audio: AudioFile, config: BulkConfig) -> Dict[str, Any]:
+    """チェックポイントの対象 - 区切り位置に関わる設定が同じ場合だけ再開できる"""
+    segmentation = asdict(config)
+    del segmentation["workers"], segmentation["lookahead"]
+    return {
+        "type": "header",
+        "file": os.path.basename(audio.path),
+        "frames": audio.frames,
+        "sample_rate": audio.sample_rate,
+        "channels": audio.channels,
+        "segmentation": segmentation,
+    }
+
+
+def load_checkpoint(path: str, header: Dict[str, Any]) -> Tuple[int, int, bool]:
+    """(再開するフレーム位置, 次のセグメント番号, 完了済みか) - 書きかけの最終行は切り詰める"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0, 0, False
+    start, index, complete = 0, 0, False
+    valid = 0
+    with open(path, "rb") as f:
+        for number, line in enumerate(f):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            if number == 0:
+                if record != header:
+                    raise BulkFormatError(f"{path} は別のファイルまたは設定のチェックポイントです")
+            elif record.get("type") == "segment":
+                start, index = record["end_sample"], record["index"] + 1
+            elif record.get("type") == "summary":
+                complete = True
+            valid += len(line)
+    if valid == 0:
+        raise BulkFormatError(f"{path} はチェックポイントではありません")
+    if valid < os.path.getsize(path):
+        os.truncate(path, valid)
+    return start, index, complete
+
+
+def format_time(seconds: float) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:04.1f}"
+
+
+async def transcribe_file(audio: AudioFile, output: str, transcriber: BulkTranscriber) -> bool:
+    """結果を output に追記しながら文字起こし - 途中まで処理済みなら続きから"""
+    header = checkpoint_header(audio, transcriber.config)
+    fresh = not os.path.exists(output) or os.path.getsize(output) == 0
+    start, index, complete = load_checkpoint(output, header)
+    if complete:
+        logger.info(f"✅ {output} は処理済みです")
+        return False
+    if start:
+        logger.info(f"⏯️ チェックポイントから再開: {format_time(start / audio.sample_rate)} 以降")
+
+    with open(output, "a", encoding="utf-8") as f:
+        def write(record: Dict[str, Any]):
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        if fresh:
+            write(header)
+        async for record in transcriber.run(audio, start, index):
+            write(record)
+            if record["text"]:
+                print(f"[{format_time(record['start'])} - {format_time(record['end'])}] {record['text']}", flush=True)
+        write({"type": "summary", **transcriber.stats()})
+    return True
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    from dotenv import load_dotenv
+
+    from .metrics import configure_logging
+    from .upstream import create_backend
+
+    load_dotenv()
+    configure_logging()
+    try:
+        audio = AudioFile.open(args.input, args.sample_rate, args.channels)
+        backend = create_backend(args.backend)
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ {e}")
+        return 1
+
+    config = BulkConfig(
+        workers=args.workers,
+        max_segment_s=args.max_segment,
+        min_segment_s=args.min_segment,
+        min_silence_ms=args.min_silence_ms,
+    )
+    transcriber = BulkTranscriber(backend, config, profile=PROFILES[args.profile])
+    output = args.output or os.path.splitext(args.input)[0] + ".jsonl"
+    logger.info(f"📂 {args.input}: {format_time(audio.duration)}, {audio.sample_rate}Hz, {audio.channels}ch → {output}")
+    try:
+        processed = await transcribe_file(audio, output, transcriber)
+    except BulkFormatError as e:
+        logger.error(f"❌ {e}")
+        return 1
+    if processed:
+        logger.info(
+            f"✅ 完了: {transcriber.audio_seconds:.0f}秒の音声を {transcriber.elapsed:.1f}秒で処理 "
+            f"({transcriber.realtime_factor:.1f}x 実時間)"
+        )
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="録音ファイルの一括文字起こし (中断しても続きから再開できる)")
+    parser.add_argument("input", help="WAV (16bit PCM) または生の int16 PCM ファイル")
+    parser.add_argument("-o", "--output", help="結果の JSON Lines (チェックポイントを兼ねる, 既定: 入力名.jsonl)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="同時に使う Liveセッション数")
+    parser.add_argument("--sample-rate", type=int, default=TARGET_SAMPLE_RATE, help="生PCMのサンプルレート")
+    parser.add_argument("--channels", type=int, default=1, help="生PCMのチャンネル数")
+    parser.add_argument("--max-segment", type=float, default=BulkConfig.max_segment_s)
+    parser.add_argument("--min-segment", type=float, default=BulkConfig.min_segment_s)
+    parser.add_argument("--min-silence-ms", type=int, default=BulkConfig.min_silence_ms)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="文字起こしプロファイル (この無音時間以上の無音では必ず区切る)")
+    parser.add_argument("--backend", help="TRANSCRIPTION_BACKEND の代わりに指定")
+    args = parser.parse_args()
+    try:
+        sys.exit(asyncio.run(main_async(args)))
+    except KeyboardInterrupt:
+        logger.info("⏸️ 中断しました - 同じコマンドで続きから再開できます")
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
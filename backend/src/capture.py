@@ -0,0 +1,213 @@
+"""CLI 用の音声キャプチャ
+
+音声ソース (マイク / ファイル) が別スレッドから渡してくる音声を、事前に確保した
+NumPy のリングバッファへ書き込み、イベントループ側は frames() で一定長のフレームを
+ブロックせずに受け取る。
+
+- マイクは PyAudio のコールバックモードで読む (イベントループで stream.read しない)
+- 送信が追いつかずバッファが満杯になったら古い音声から捨て、捨てたサンプル数を
+  overflow として数える (遅れを溜め込まない)
+- 音声ソースからフレーム2つ分の時間を過ぎても次の音声が届かなければ underrun として数える
+- FileSource は録音ファイルを実時間のペースで流すので、マイクのない環境でも同じ経路を試せる
+"""
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from .audio_codec import TARGET_SAMPLE_RATE, PolyphaseResampler
+from .buffers import RingBuffer
+
+DEFAULT_FRAME_MS = 100
+DEFAULT_BUFFER_SECONDS = 10.0
+# マイクから1回のコールバックで受け取るサンプル数 (20ms)
+MIC_FRAMES_PER_BUFFER = 320
+# FileSource が1回に流す長さ
+FILE_BLOCK_MS = 20
+
+AudioCallback = Callable[[np.ndarray], None]
+
+
+class AudioSource(ABC):
+    """16kHz mono int16 の音声を別スレッドから callback に渡す"""
+
+    sample_rate = TARGET_SAMPLE_RATE
+
+    @abstractmethod
+    def start(self, callback: AudioCallback, on_end: Callable[[], None]):
+        """音声の取り込みを開始 (音声ソースが終わったら on_end を呼ぶ)"""
+
+    @abstractmethod
+    def stop(self):
+        """音声の取り込みを止める"""
+
+
+class MicrophoneSource(AudioSource):
+    """PyAudio のコールバックモードでマイクから読む"""
+
+    def __init__(self, device_index: Optional[int] = None, frames_per_buffer: int = MIC_FRAMES_PER_BUFFER):
+        self.device_index = device_index
+        self.frames_per_buffer = frames_per_buffer
+        self._audio = None
+        self._stream = None
+        # PyAudio が報告した入力オーバーフロー (ドライバ側で音声が欠けた回数)
+        self.input_overflows = 0
+
+    def start(self, callback: AudioCallback, on_end: Callable[[], None]):
+        import pyaudio
+
+        def on_audio(data, frame_count, time_info, status):
+            if status & pyaudio.paInputOverflow:
+                self.input_overflows += 1
+            callback(np.frombuffer(data, dtype=np.int16))
+            return None, pyaudio.paContinue
+
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=on_audio,
+        )
+        self._stream.start_stream()
+
+    def stop(self):
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+            except Exception:
+                pass
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+
+class FileSource(AudioSource):
+    """録音ファイル (WAV / 生PCM) を実時間のペースで流す - マイクのない環境での試験用"""
+
+    def __init__(self, path: str, realtime: bool = True, loop: bool = False):
+        from .bulk import AudioFile
+
+        self.audio = AudioFile.open(path)
+        self.realtime = realtime
+        self.loop = loop
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, callback: AudioCallback, on_end: Callable[[], None]):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(callback, on_end), name="file-source", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, callback: AudioCallback, on_end: Callable[[], None]):
+        from .bulk import mono
+
+        audio = self.audio
+        block = audio.sample_rate * FILE_BLOCK_MS // 1000
+        interval = FILE_BLOCK_MS / 1000 if self.realtime else 0.0
+        next_at = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                resampler = PolyphaseResampler(audio.sample_rate) if audio.sample_rate != self.sample_rate else None
+                for start in range(0, audio.frames, block):
+                    if self._stop.is_set():
+                        return
+                    samples = mono(audio.samples[start:start + block])
+                    if resampler is not None:
+                        samples = resampler.process(samples)
+                    if samples.dtype != np.int16:
+                        samples = np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+                    callback(samples)
+                    # 遅れても詰めて流さず、次の予定時刻から数え直す (実時間より速くしない)
+                    next_at = max(next_at + interval, time.perf_counter())
+                    self._stop.wait(next_at - time.perf_counter())
+                if not self.loop:
+                    return
+        finally:
+            on_end()
+
+
+class CaptureEngine:
+    """音声ソース → リングバッファ → frame_ms ごとのフレーム"""
+
+    def __init__(self, source: AudioSource, frame_ms: int = DEFAULT_FRAME_MS,
+                 buffer_seconds: float = DEFAULT_BUFFER_SECONDS):
+        self.source = source
+        self.frame_samples = source.sample_rate * frame_ms // 1000
+        self.frame_seconds = frame_ms / 1000
+        self.ring = RingBuffer(int(source.sample_rate * buffer_seconds))
+        self._frame = np.zeros(self.frame_samples, dtype=np.int16)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready = asyncio.Event()
+        self._ended = False
+
+        self.captured_samples = 0
+        self.frames = 0
+        self.underruns = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.source.start(self._on_audio, self._on_end)
+
+    def stop(self):
+        self.source.stop()
+
+    # --- 音声ソースのスレッドから呼ばれる ---
+
+    def _on_audio(self, samples: np.ndarray):
+        self.ring.write(samples)
+        self.captured_samples += samples.size
+        if len(self.ring) >= self.frame_samples:
+            self._loop.call_soon_threadsafe(self._ready.set)
+
+    def _on_end(self):
+        self._ended = True
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    # --- イベントループ側 ---
+
+    async def read_frames(self):
+        """frame_ms ごとの int16 PCM (bytes) - 音声ソースが終わると残りを返して終了"""
+        while True:
+            if len(self.ring) >= self.frame_samples:
+                self.ring.read_into(self._frame)
+                self.frames += 1
+                yield self._frame.tobytes()
+                continue
+            if self._ended:
+                count = self.ring.read_into(self._frame)
+                if count:
+                    self.frames += 1
+                    yield self._frame[:count].tobytes()
+                return
+            self._ready.clear()
+            if len(self.ring) >= self.frame_samples or self._ended:
+                continue
+            try:
+                await asyncio.wait_for(self._ready.wait(), self.frame_seconds * 2)
+            except asyncio.TimeoutError:
+                # 音声ソースからの音声が途切れている
+                self.underruns += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "captured_seconds": round(self.captured_samples / self.source.sample_rate, 2),
+            "frames": self.frames,
+            "buffered_ms": round(len(self.ring) * 1000 / self.source.sample_rate, 1),
+            "overflow_ms": round(self.ring.overflow_samples * 1000 / self.source.sample_rate, 1),
+            "underruns": self.underruns,
+        }
@@ -0,0 +1,198 @@
+"""オフライン用の偽Liveサーバー
+
+Gemini Live API と同じストリーミングの約束事を実装し、負荷試験や回帰試験を
+APIキーやクォータなしで実行できるようにする。
+
+- 音声の無音が silence_duration_ms (プロファイルを指定して接続した場合はその値) 続くか
+  end_audio_stream でターンを区切る
+- 最初のトークンまでの遅延とトークン間隔を設定可能 (0 にすれば全速で動作)
+- 入力音声のハッシュから決定的にテキストを生成する
+- エラーとタイムアウト (応答しないターン) を確率で注入できる
+- セッションの上限時間 (session_duration 秒) を過ぎると音声を受け付けなくなる
+"""
+import asyncio
+import hashlib
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, fields, replace
+from typing import AsyncIterator, Dict, Optional, Set, Union
+
+import numpy as np
+
+from .profiles import TranscriptionProfile
+from .upstream import BACKEND_FAKE, LiveResponse, LiveSession, TranscriptionBackend
+
+VOCABULARY = (
+    "本日", "の", "会議", "では", "新しい", "機能", "について", "確認", "します",
+    "音声", "認識", "の", "精度", "が", "向上", "しました", "次回", "までに",
+    "資料", "を", "準備", "して", "ください", "よろしく", "お願いします",
+)
+
+
+class FakeUpstreamError(RuntimeError):
+    """注入されたアップストリームエラー"""
+
+
+@dataclass(frozen=True)
+class FakeLiveConfig:
+    connect_latency: float = 0.0
+    first_token_latency: float = 0.3
+    token_interval: float = 0.05
+    sample_rate: int = 16000
+    silence_duration_ms: int = 1500
+    silence_threshold: float = 60.0
+    # 音声何ミリ秒ごとに1トークン生成するか
+    ms_per_token: int = 250
+    error_rate: float = 0.0
+    stall_rate: float = 0.0
+    connect_error_rate: float = 0.0
+    # セッションの上限時間 (秒, 0 で無制限)
+    session_duration: float = 0.0
+    seed: int = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeLiveConfig":
+        """FAKE_<フィールド名> 環境変数から設定を読み込む (例: FAKE_FIRST_TOKEN_LATENCY=0)"""
+        values = {}
+        for field in fields(cls):
+            raw = os.environ.get(f"FAKE_{field.name.upper()}")
+            if raw is not None:
+                values[field.name] = type(field.default)(raw)
+        return cls(**values)
+
+
+def fake_transcript(audio: bytes, config: FakeLiveConfig) -> list:
+    """音声内容から決定的にトークン列を生成"""
+    duration_ms = len(audio) // 2 * 1000 // config.sample_rate
+    count = max(1, duration_ms // config.ms_per_token)
+    rng = random.Random(hashlib.blake2b(audio, digest_size=8).digest())
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+class FakeLiveSession(LiveSession):
+    def __init__(self, config: FakeLiveConfig, rng: random.Random):
+        self.config = config
+        self._rng = rng
+        self._audio = bytearray()
+        self._voiced = False
+        self._silence_ms = 0.0
+        self._responses: asyncio.Queue = asyncio.Queue()
+        self._turn_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self.closed = False
+        self.turns = 0
+        self.opened_at = time.monotonic()
+
+    async def send_audio(self, audio_data: Union[bytes, memoryview]):
+        if self.closed:
+            raise FakeUpstreamError("セッションは閉じられています")
+        if self.config.session_duration and time.monotonic() - self.opened_at >= self.config.session_duration:
+            self.closed = True
+            raise FakeUpstreamError("セッションの上限時間を超えました")
+        view = memoryview(audio_data).cast("B")
+        samples = np.frombuffer(view[: len(view) // 2 * 2], dtype=np.int16)
+        if samples.size == 0:
+            return
+        self._audio += view
+
+        level = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+        if level >= self.config.silence_threshold:
+            self._voiced = True
+            self._silence_ms = 0.0
+            return
+
+        self._silence_ms += samples.size * 1000 / self.config.sample_rate
+        if self._voiced and self._silence_ms >= self.config.silence_duration_ms:
+            self._finish_turn()
+
+    async def end_audio_stream(self):
+        if self._voiced:
+            self._finish_turn()
+
+    async def receive(self) -> AsyncIterator[LiveResponse]:
+        while True:
+            item = await self._responses.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+            if item.turn_complete:
+                return
+
+    def is_alive(self) -> bool:
+        return not self.closed
+
+    async def close(self):
+        self.closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        self._tasks.clear()
+
+    def _finish_turn(self):
+        audio = bytes(self._audio)
+        self._audio.clear()
+        self._voiced = False
+        self._silence_ms = 0.0
+        self.turns += 1
+
+        outcome = self._rng.random()
+        if outcome < self.config.error_rate:
+            response = "error"
+        elif outcome < self.config.error_rate + self.config.stall_rate:
+            # 応答しないターン - 呼び出し側のタイムアウト処理を試すため
+            return
+        else:
+            response = "ok"
+
+        task = asyncio.create_task(self._respond(audio, response))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _respond(self, audio: bytes, response: str):
+        # ターンの応答は順番に返す
+        async with self._turn_lock:
+            await asyncio.sleep(self.config.first_token_latency)
+            if response == "error":
+                await self._responses.put(FakeUpstreamError("注入されたアップストリームエラー"))
+                return
+
+            tokens = fake_transcript(audio, self.config)
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(self.config.token_interval)
+                await self._responses.put(LiveResponse(text=token))
+            await self._responses.put(LiveResponse(turn_complete=True))
+
+
+class FakeLiveBackend(TranscriptionBackend):
+    name = BACKEND_FAKE
+
+    def __init__(self, config: Optional[FakeLiveConfig] = None):
+        self.config = config or FakeLiveConfig()
+        self._rng = random.Random(self.config.seed)
+        self.connections = 0
+        # プロファイルごとのセッション設定 (接続ごとに作り直さない)
+        self._profile_configs: Dict[TranscriptionProfile, FakeLiveConfig] = {}
+
+    def session_config(self, profile: Optional[TranscriptionProfile] = None) -> FakeLiveConfig:
+        if profile is None:
+            return self.config
+        config = self._profile_configs.get(profile)
+        if config is None:
+            config = self._profile_configs[profile] = replace(self.config, silence_duration_ms=profile.silence_duration_ms)
+        return config
+
+    @asynccontextmanager
+    async def connect(self, profile: Optional[TranscriptionProfile] = None):
+        if self.config.connect_latency:
+            await asyncio.sleep(self.config.connect_latency)
+        if self._rng.random() < self.config.connect_error_rate:
+            raise FakeUpstreamError("注入された接続エラー")
+
+        self.connections += 1
+        session = FakeLiveSession(self.session_config(profile), random.Random(self._rng.random()))
+        try:
+            yield session
+        finally:
+            await session.close()
@@ -0,0 +1,137 @@
+"""アップストリームへ送る音声の固定長フレーム化とペース調整
+
+クライアントが送ってくる音声の長さはまちまち (フロントエンドは無音で区切った可変長、
+mic_test.py は5秒まとめて、など) なので、ストリーミングモードではいったん接続ごとの
+リングバッファ (事前確保、bytes の連結なし) に溜め、frame_ms ごとの固定長フレームにして送る。
+
+- フレームは1フレーム分の時間ごとに一定のペースで送る。届く間隔の揺らぎ (ジッタ) は
+  バッファが吸収する
+- 溜まった音声が jitter_ms を超えたら最大 max_speedup 倍速で追いつく
+- 送信が止まっている状態で最初のフレームが揃ったら待たずに送る (発話の頭で遅らせない)
+- 発話の終わり (drain) では、残りのフレームと端数をすぐに送る
+- バッファが満杯の間は push が空きを待つ (取り込みキューのバックプレッシャーに任せる)
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple, Union
+
+import numpy as np
+
+from .audio_codec import TARGET_SAMPLE_RATE
+from .buffers import RingBuffer
+
+DEFAULT_FRAME_MS = 50
+DEFAULT_JITTER_MS = 200
+DEFAULT_MAX_SPEEDUP = 4.0
+DEFAULT_BUFFER_MS = 5000
+
+# フレーム (16kHz int16 PCM), 先頭の音声を受信した時刻, セッション開始からの位置 (ms)
+FrameSender = Callable[[bytes, float, float], Awaitable[None]]
+
+
+class FramePacer:
+    def __init__(
+        self,
+        send: FrameSender,
+        frame_ms: int = DEFAULT_FRAME_MS,
+        jitter_ms: int = DEFAULT_JITTER_MS,
+        max_speedup: float = DEFAULT_MAX_SPEEDUP,
+        buffer_ms: int = DEFAULT_BUFFER_MS,
+        sample_rate: int = TARGET_SAMPLE_RATE,
+    ):
+        self.send = send
+        self.frame_ms = frame_ms
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.jitter_samples = sample_rate * jitter_ms // 1000
+        self.max_speedup = max_speedup
+        self.sample_rate = sample_rate
+        self._ring = RingBuffer(max(sample_rate * buffer_ms // 1000, 2 * self.frame_samples))
+        self._frame = np.zeros(self.frame_samples, dtype=np.int16)
+        # 書き込んだ音声の (先頭サンプルの通し番号, 受信時刻, セッション開始からの位置)
+        self._marks: Deque[Tuple[int, float, float]] = deque()
+        self._written = 0
+        self._sent = 0
+        self._send_lock = asyncio.Lock()
+        self._data = asyncio.Event()
+        self._space = asyncio.Event()
+        self._next_due = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+        self.frames_sent = 0
+        self.catchup_frames = 0
+
+    @property
+    def buffered_ms(self) -> float:
+        return len(self._ring) * 1000 / self.sample_rate
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    async def push(self, audio: Union[bytes, memoryview, np.ndarray], received_at: float, offset_ms: float):
+        """音声を溜める - バッファに空きがなければ送信を待つ"""
+        samples = audio if isinstance(audio, np.ndarray) else np.frombuffer(audio, dtype=np.int16)
+        self._marks.append((self._written, received_at, offset_ms))
+        while samples.size:
+            space = self._ring.capacity - len(self._ring)
+            if space == 0:
+                self._space.clear()
+                await self._space.wait()
+                continue
+            self._ring.write(samples[:space])
+            self._written += min(space, samples.size)
+            samples = samples[space:]
+            self._data.set()
+
+    async def drain(self):
+        """溜まっている音声を (端数も含めて) すぐに送る - 発話の終わりに呼ぶ"""
+        async with self._send_lock:
+            while len(self._ring):
+                await self._send_frame()
+
+    async def _run(self):
+        while True:
+            if len(self._ring) < self.frame_samples:
+                self._data.clear()
+                await self._data.wait()
+                continue
+
+            now = time.perf_counter()
+            interval = self.frame_ms / 1000
+            if len(self._ring) > self.jitter_samples:
+                # 溜まりすぎている - 速めて追いつく
+                interval /= self.max_speedup
+                self.catchup_frames += 1
+            if self._next_due < now - interval:
+                # 送信が止まっていた - 最初のフレームは待たずに送る
+                self._next_due = now
+            elif self._next_due > now:
+                await asyncio.sleep(self._next_due - now)
+            self._next_due += interval
+
+            async with self._send_lock:
+                # 待っている間に drain で送られていることがある
+                if len(self._ring) >= self.frame_samples:
+                    await self._send_frame()
+
+    async def _send_frame(self):
+        count = self._ring.read_into(self._frame)
+        start = self._sent
+        self._sent += count
+        # フレーム先頭のサンプルを含む書き込みの受信時刻と位置
+        while len(self._marks) > 1 and self._marks[1][0] <= start:
+            self._marks.popleft()
+        written_at, received_at, offset_ms = self._marks[0]
+        offset_ms += (start - written_at) * 1000 / self.sample_rate
+        self._space.set()
+        self.frames_sent += 1
+        await self.send(self._frame[:count].tobytes(), received_at, offset_ms)
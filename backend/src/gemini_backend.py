@@ -0,0 +1,103 @@
+"""Gemini Live API バックエンド"""
+import hashlib
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Dict, Optional, Union
+
+from google import genai
+from google.genai import types
+
+from .profiles import DEFAULT_PROFILE, PROFILES, SENSITIVITY_HIGH, SENSITIVITY_LOW, TranscriptionProfile
+from .upstream import BACKEND_GEMINI, LiveResponse, LiveSession, TranscriptionBackend
+
+SENSITIVITIES = {
+    SENSITIVITY_HIGH: (types.StartSensitivity.START_SENSITIVITY_HIGH, types.EndSensitivity.END_SENSITIVITY_HIGH),
+    SENSITIVITY_LOW: (types.StartSensitivity.START_SENSITIVITY_LOW, types.EndSensitivity.END_SENSITIVITY_LOW),
+}
+
+
+@lru_cache(maxsize=None)
+def live_config(profile: TranscriptionProfile) -> types.LiveConnectConfig:
+    """プロファイルの Live API 設定 - 接続ごとに作り直さないよう、プロファイルごとに1度だけ構築する"""
+    return types.LiveConnectConfig(
+        response_modalities=["TEXT"],
+        system_instruction=types.Content(
+            parts=[types.Part(text=profile.system_instruction)],
+        ),
+        realtime_input_config=types.RealtimeInputConfig(
+            automatic_activity_detection=types.AutomaticActivityDetection(
+                disabled=False,
+                start_of_speech_sensitivity=SENSITIVITIES[profile.start_sensitivity][0],
+                end_of_speech_sensitivity=SENSITIVITIES[profile.end_sensitivity][1],
+                silence_duration_ms=profile.silence_duration_ms,
+                prefix_padding_ms=profile.prefix_padding_ms,
+            )
+        ),
+    )
+
+
+AUDIO_MIME_TYPE = "audio/pcm;rate=16000"
+
+_clients: Dict[str, genai.Client] = {}
+
+
+def get_client(api_key: str) -> genai.Client:
+    """APIキーごとにプロセス全体で1つの genai.Client を共有"""
+    client = _clients.get(api_key)
+    if client is None:
+        client = genai.Client(api_key=api_key)
+        _clients[api_key] = client
+    return client
+
+
+class GeminiLiveSession(LiveSession):
+    def __init__(self, session):
+        self._session = session
+
+    async def send_audio(self, audio_data: Union[bytes, memoryview]):
+        # SDKの Blob は bytes のみ受け付けるため、memoryview は境界で一度だけ bytes 化する
+        if isinstance(audio_data, memoryview):
+            audio_data = audio_data.tobytes()
+        await self._session.send_realtime_input(
+            audio=types.Blob(
+                data=audio_data,
+                mime_type=AUDIO_MIME_TYPE
+            )
+        )
+
+    async def end_audio_stream(self):
+        await self._session.send_realtime_input(audio_stream_end=True)
+
+    async def receive(self) -> AsyncIterator[LiveResponse]:
+        async for response in self._session.receive():
+            server_content = response.server_content
+            yield LiveResponse(
+                text=response.text,
+                turn_complete=bool(server_content and server_content.turn_complete),
+            )
+
+    def is_alive(self) -> bool:
+        """下位のWebSocketが閉じられていないか"""
+        ws = getattr(self._session, "_ws", None)
+        if ws is None:
+            return True
+        return getattr(ws, "close_code", None) is None
+
+
+class GeminiBackend(TranscriptionBackend):
+    name = BACKEND_GEMINI
+
+    def __init__(self, api_key: str):
+        self.client = get_client(api_key)
+        # APIキーそのものはメトリクスやログに出さない
+        self._quota_key = f"{BACKEND_GEMINI}:{hashlib.sha256(api_key.encode()).hexdigest()[:8]}"
+
+    @property
+    def quota_key(self) -> str:
+        return self._quota_key
+
+    @asynccontextmanager
+    async def connect(self, profile: Optional[TranscriptionProfile] = None):
+        profile = profile or PROFILES[DEFAULT_PROFILE]
+        async with self.client.aio.live.connect(model=profile.model, config=live_config(profile)) as session:
+            yield GeminiLiveSession(session)
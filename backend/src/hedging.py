@@ -0,0 +1,174 @@
+"""チャンクモードの応答期限とヘッジ
+
+最初の部分結果が届くまでの遅延 (接続・送信を含む) を直近の一定数だけ記録し、
+その分位点から1リクエストごとの期限を決める。
+
+- hedge_delay: p95 を過ぎても最初の部分結果が届かなければ、同じ音声を別の
+  Liveセッションにも送り (ヘッジ)、先に応答した方を使ってもう一方は取り消す
+- timeout: p99 の timeout_multiplier 倍 (min_timeout〜max_timeout) を過ぎても
+  どちらも応答しなければ UpstreamTimeoutError
+
+遅延はヘッジで応答したかどうかに関わらずリクエストの開始から測る。期限を過ぎた
+リクエストは期限ちょうどの値として記録する (打ち切られた値を捨てると分位点が低く偏り、
+アップストリームが遅くなるほど期限が短くなってタイムアウトが増えてしまう)。
+
+ヘッジはリクエスト数の budget_ratio 倍までに抑え、アドミッション制御の待ち行列が
+ある時 (アップストリームが飽和している時) は行わない。
+記録が min_samples 件に満たない間は既定値を使う。
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .admission import UpstreamScheduler
+
+DEFAULT_HEDGE_PERCENTILE = 95.0
+DEFAULT_TIMEOUT_PERCENTILE = 99.0
+DEFAULT_BUDGET_RATIO = 0.05
+DEFAULT_HEDGE_DELAY = 2.0
+DEFAULT_MIN_HEDGE_DELAY = 0.2
+DEFAULT_MIN_TIMEOUT = 3.0
+DEFAULT_MAX_TIMEOUT = 10.0
+DEFAULT_TIMEOUT_MULTIPLIER = 3.0
+DEFAULT_WINDOW = 512
+DEFAULT_MIN_SAMPLES = 20
+# 分位点を計算し直す間隔 (記録件数)
+QUANTILE_REFRESH = 16
+# ヘッジ予算の上限 (連続してヘッジできる回数)
+BUDGET_BURST = 10.0
+
+
+class UpstreamTimeoutError(RuntimeError):
+    """期限内にアップストリームから応答がなかった"""
+
+
+class UpstreamClosedError(ConnectionError):
+    """アップストリームが結果もターンの終了も返さずに応答を終えた (ヘッジの対象になる失敗)"""
+
+
+class LatencyTracker:
+    """直近 window 件の遅延 (秒) - 分位点は一定件数ごとにまとめて計算し直す"""
+
+    def __init__(self, window: int = DEFAULT_WINDOW):
+        self._samples = np.zeros(window, dtype=np.float64)
+        self._next = 0
+        self.count = 0
+        self._quantiles: Dict[float, float] = {}
+        self._stale = 0
+
+    def observe(self, seconds: float):
+        self._samples[self._next] = seconds
+        self._next = (self._next + 1) % self._samples.size
+        self.count += 1
+        self._stale += 1
+        if self._stale >= QUANTILE_REFRESH:
+            self._quantiles.clear()
+            self._stale = 0
+
+    def quantile(self, percentile: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        value = self._quantiles.get(percentile)
+        if value is None:
+            value = float(np.percentile(self._samples[:min(self.count, self._samples.size)], percentile))
+            self._quantiles[percentile] = value
+        return value
+
+
+class HedgeBudget:
+    """リクエストごとに budget_ratio ずつ貯まり、ヘッジ1回で1消費するトークン"""
+
+    def __init__(self, ratio: float = DEFAULT_BUDGET_RATIO, burst: float = BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+
+    def record_request(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class HedgePolicy:
+    def __init__(
+        self,
+        hedge_percentile: float = DEFAULT_HEDGE_PERCENTILE,
+        budget_ratio: float = DEFAULT_BUDGET_RATIO,
+        min_timeout: float = DEFAULT_MIN_TIMEOUT,
+        max_timeout: float = DEFAULT_MAX_TIMEOUT,
+        timeout_multiplier: float = DEFAULT_TIMEOUT_MULTIPLIER,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        window: int = DEFAULT_WINDOW,
+    ):
+        self.hedge_percentile = hedge_percentile
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.min_samples = min_samples
+        self.tracker = LatencyTracker(window)
+        self.budget = HedgeBudget(budget_ratio)
+
+        # メトリクス
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+        self.timeouts = 0
+
+    @property
+    def warmed_up(self) -> bool:
+        return self.tracker.count >= self.min_samples
+
+    def hedge_delay(self) -> float:
+        """最初の部分結果をこの秒数待っても届かなければヘッジする"""
+        if not self.warmed_up:
+            return min(DEFAULT_HEDGE_DELAY, self.timeout())
+        return max(DEFAULT_MIN_HEDGE_DELAY, self.tracker.quantile(self.hedge_percentile))
+
+    def timeout(self) -> float:
+        """最初の部分結果を待つ期限 (秒)"""
+        if not self.warmed_up:
+            return self.max_timeout
+        p99 = self.tracker.quantile(DEFAULT_TIMEOUT_PERCENTILE)
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
+    def record_request(self):
+        self.requests += 1
+        self.budget.record_request()
+
+    def observe_first_token(self, seconds: float):
+        """リクエストの開始から最初の部分結果までの秒数"""
+        self.tracker.observe(seconds)
+
+    def observe_timeout(self, deadline: float):
+        """期限切れ - 実際の遅延は期限以上なので、期限の値として記録する"""
+        self.timeouts += 1
+        self.tracker.observe(deadline)
+
+    def allow_hedge(self, scheduler: Optional[UpstreamScheduler] = None) -> bool:
+        """予算が残っていて、アップストリームに待ち行列がなければヘッジしてよい"""
+        if (scheduler is not None and scheduler.queued > 0) or not self.budget.try_spend():
+            self.denied += 1
+            return False
+        self.hedges += 1
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        quantiles = {
+            f"first_token_p{p:g}_ms": round((self.tracker.quantile(p) or 0.0) * 1000, 1)
+            for p in (50.0, self.hedge_percentile, DEFAULT_TIMEOUT_PERCENTILE)
+        }
+        return {
+            **quantiles,
+            "hedge_delay_ms": round(self.hedge_delay() * 1000, 1),
+            "timeout_ms": round(self.timeout() * 1000, 1),
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedges_denied": self.denied,
+            "timeouts": self.timeouts,
+        }
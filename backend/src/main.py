@@ -1,17 +1,134 @@
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from dotenv import load_dotenv
 import json
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from contextlib import asynccontextmanager
 import base64
+import binascii
+import tempfile
+import time
+import uuid
 
-from .transcribe_service import TranscribeService
+from .admission import (
+    DEFAULT_BURST,
+    DEFAULT_MAX_CONCURRENT,
+    DEFAULT_MAX_QUEUE,
+    DEFAULT_MAX_WAIT,
+    DEFAULT_RESERVED,
+    DEFAULT_RATE,
+    AdmissionError,
+    UpstreamScheduler,
+)
+from .metrics import configure_logging, logger, metrics
+from .transcribe_service import (
+    DEFAULT_ROTATE_AFTER,
+    DEFAULT_ROTATION_OVERLAP_MS,
+    DEFAULT_ROTATION_WAIT,
+    TranscribeService,
+    Utterance,
+)
+from .upstream import BackendConfigError, TranscriptionBackend, create_backend
+from .session_pool import DEFAULT_MAX_AGE, DEFAULT_MIN_SIZE, LiveSessionPool
+from .pipeline import BackpressurePolicy, ConnectionPipeline, final_message, partial_message
+from .audio_codec import TARGET_SAMPLE_RATE, AudioDecoder
+from .hedging import (
+    DEFAULT_BUDGET_RATIO,
+    DEFAULT_HEDGE_PERCENTILE,
+    DEFAULT_MAX_TIMEOUT,
+    DEFAULT_MIN_TIMEOUT,
+    HedgePolicy,
+)
+from .profiles import DEFAULT_PROFILE, PROFILES, ProfileError, get_profile
+from .framing import DEFAULT_FRAME_MS, DEFAULT_JITTER_MS
+from .broadcast import DEFAULT_MAX_SUBSCRIBERS, DEFAULT_SUBSCRIBER_BUFFER, BroadcastHub
+from .transcript_store import DEFAULT_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, TranscriptStore
+from .bulk import DEFAULT_WORKERS, AudioFile, BulkConfig, BulkTranscriber
+from .resumable import DEFAULT_GRACE_PERIOD, DEFAULT_REPLAY_SIZE, ClientSession, SessionRegistry
+from .protocol import (
+    PROTOCOL_BINARY,
+    PROTOCOL_JSON,
+    SUPPORTED_PROTOCOLS,
+    FrameError,
+    MessageError,
+    parse_audio_frame,
+    parse_control_message,
+)
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+configure_logging()
+
+# 取り込みキューが満杯になった時の挙動 (drop_oldest / coalesce / signal)
+BACKPRESSURE_POLICY = BackpressurePolicy(os.environ.get("BACKPRESSURE_POLICY", BackpressurePolicy.DROP_OLDEST.value))
+
+# start_session で profile を指定しなかった場合のプロファイル (セッションプールもこのプロファイルで待機させる)
+TRANSCRIPTION_PROFILE = get_profile(os.environ.get("TRANSCRIPTION_PROFILE", DEFAULT_PROFILE))
+
+# サーバー側VADで無声区間をアップストリームへ送らない ("0" で無効化)
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "1") != "0"
+
+# ストリーミングモードでアップストリームへ送るフレームの長さ (0 で受信したまま送る) と、等速で送る間に溜めてよい音声
+UPSTREAM_FRAME_MS = int(os.environ.get("UPSTREAM_FRAME_MS", DEFAULT_FRAME_MS))
+UPSTREAM_JITTER_MS = int(os.environ.get("UPSTREAM_JITTER_MS", DEFAULT_JITTER_MS))
+
+# アップストリームのアドミッション制御 (同時利用数・APIキーごとのレート・待ち行列)
+UPSTREAM_MAX_CONCURRENT = int(os.environ.get("UPSTREAM_MAX_CONCURRENT", DEFAULT_MAX_CONCURRENT))
+UPSTREAM_RATE = float(os.environ.get("UPSTREAM_RATE", DEFAULT_RATE))
+UPSTREAM_BURST = int(os.environ.get("UPSTREAM_BURST", DEFAULT_BURST))
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", DEFAULT_MAX_QUEUE))
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", DEFAULT_MAX_WAIT))
+
+# 接続済みLiveセッションのプール (SESSION_POOL_MAX=0 で無効化)
+# ストリーミングの接続は接続中ずっとセッションを1つ使うため、上限は同時利用数の上限以上にする
+SESSION_POOL_MIN = int(os.environ.get("SESSION_POOL_MIN", DEFAULT_MIN_SIZE))
+SESSION_POOL_MAX = int(os.environ.get("SESSION_POOL_MAX", UPSTREAM_MAX_CONCURRENT))
+SESSION_POOL_MAX_AGE = float(os.environ.get("SESSION_POOL_MAX_AGE", DEFAULT_MAX_AGE))
+# 切断されたセッションを再開できるよう保持する秒数 (0 で無効) と、再送用に残すメッセージ数
+SESSION_RESUME_GRACE = float(os.environ.get("SESSION_RESUME_GRACE", DEFAULT_GRACE_PERIOD))
+SESSION_REPLAY_SIZE = int(os.environ.get("SESSION_REPLAY_SIZE", DEFAULT_REPLAY_SIZE))
+# ストリーミング中のLiveセッションを入れ替えるまでの秒数 (0 で無効)、発話の区切りを待つ秒数、重ねて送る音声
+UPSTREAM_ROTATE_AFTER = float(os.environ.get("UPSTREAM_ROTATE_AFTER", DEFAULT_ROTATE_AFTER))
+UPSTREAM_ROTATION_WAIT = float(os.environ.get("UPSTREAM_ROTATION_WAIT", DEFAULT_ROTATION_WAIT))
+UPSTREAM_ROTATION_OVERLAP_MS = int(os.environ.get("UPSTREAM_ROTATION_OVERLAP_MS", DEFAULT_ROTATION_OVERLAP_MS))
+# 同時利用数の上限のうち、入れ替え・閉じたセッションの開き直し用に残しておく枠 (飽和していても入れ替えられるように)
+UPSTREAM_ROTATION_RESERVE = int(os.environ.get(
+    "UPSTREAM_ROTATION_RESERVE",
+    min(DEFAULT_RESERVED, UPSTREAM_MAX_CONCURRENT - 1) if UPSTREAM_ROTATE_AFTER > 0 else 0,
+))
+
+# チャンクモードの応答期限とヘッジ (最初の部分結果の遅延の分位点から決める)
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE))
+HEDGE_BUDGET_RATIO = float(os.environ.get("HEDGE_BUDGET_RATIO", DEFAULT_BUDGET_RATIO))
+UPSTREAM_MIN_TIMEOUT = float(os.environ.get("UPSTREAM_MIN_TIMEOUT", DEFAULT_MIN_TIMEOUT))
+UPSTREAM_MAX_TIMEOUT = float(os.environ.get("UPSTREAM_MAX_TIMEOUT", DEFAULT_MAX_TIMEOUT))
 
-app = FastAPI(title="Realtime Transcription API", version="1.0.0")
+# 確定した文字起こし結果を保存する SQLite ファイル (空文字で無効)
+TRANSCRIPT_DB = os.environ.get("TRANSCRIPT_DB", "transcripts.db")
+
+# 購読者 (/ws/subscribe) ごとの送信バッファのメッセージ数と、全体の購読者数の上限 (0 で無制限)
+SUBSCRIBER_BUFFER_SIZE = int(os.environ.get("SUBSCRIBER_BUFFER_SIZE", DEFAULT_SUBSCRIBER_BUFFER))
+MAX_SUBSCRIBERS = int(os.environ.get("MAX_SUBSCRIBERS", DEFAULT_MAX_SUBSCRIBERS))
+
+# ファイル一括文字起こし: 1ファイルあたりの同時セッション数とアップロードの上限 (MB)
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", DEFAULT_WORKERS))
+BULK_MAX_UPLOAD_MB = int(os.environ.get("BULK_MAX_UPLOAD_MB", 2048))
+
+# 同時WebSocket接続数の上限 (0 で無制限)
+MAX_CONNECTIONS = int(os.environ.get("MAX_CONNECTIONS", 256))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await manager.start()
+    try:
+        yield
+    finally:
+        await manager.shutdown()
+
+app = FastAPI(title="Realtime Transcription API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,30 +140,166 @@ app.add_middleware(
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[WebSocket, TranscribeService] = {}
+        self.active_connections: Dict[WebSocket, ClientSession] = {}
+        self.sessions = SessionRegistry(SESSION_RESUME_GRACE)
+        self.backend: Optional[TranscriptionBackend] = None
+        self.pool: Optional[LiveSessionPool] = None
+        self.scheduler = UpstreamScheduler(
+            max_concurrent=UPSTREAM_MAX_CONCURRENT,
+            rate=UPSTREAM_RATE,
+            burst=UPSTREAM_BURST,
+            max_queue=ADMISSION_MAX_QUEUE,
+            max_wait=ADMISSION_MAX_WAIT,
+            reserved=UPSTREAM_ROTATION_RESERVE,
+        )
+        self.store: Optional[TranscriptStore] = TranscriptStore(TRANSCRIPT_DB) if TRANSCRIPT_DB else None
+        self.hub = BroadcastHub(SUBSCRIBER_BUFFER_SIZE, MAX_SUBSCRIBERS)
+        self.hedging = HedgePolicy(
+            hedge_percentile=HEDGE_PERCENTILE,
+            budget_ratio=HEDGE_BUDGET_RATIO,
+            min_timeout=UPSTREAM_MIN_TIMEOUT,
+            max_timeout=UPSTREAM_MAX_TIMEOUT,
+        )
+
+    def get_backend(self) -> TranscriptionBackend:
+        """TRANSCRIPTION_BACKEND に従ってプロセス共通のバックエンドを生成"""
+        if self.backend is None:
+            self.backend = create_backend()
+        return self.backend
 
-    async def connect(self, websocket: WebSocket):
+    async def start(self):
+        """文字起こしストアとプロセス共通のLiveセッションプールを起動"""
+        if self.store is not None:
+            self.store.start()
+        try:
+            backend = self.get_backend()
+        except BackendConfigError as e:
+            logger.warning(f"⚠️ バックエンド未設定: {e}")
+            return
+        if SESSION_POOL_MAX <= 0:
+            return
+        if SESSION_POOL_MAX < UPSTREAM_MAX_CONCURRENT:
+            # 処理枠を確保した接続がプールの空きを待つことになる
+            raise ValueError(
+                f"SESSION_POOL_MAX ({SESSION_POOL_MAX}) は UPSTREAM_MAX_CONCURRENT ({UPSTREAM_MAX_CONCURRENT}) 以上にしてください"
+            )
+        self.pool = LiveSessionPool(
+            backend,
+            min_size=SESSION_POOL_MIN,
+            max_size=SESSION_POOL_MAX,
+            max_age=SESSION_POOL_MAX_AGE,
+            profile=TRANSCRIPTION_PROFILE,
+            max_wait=ADMISSION_MAX_WAIT,
+        )
+        await self.pool.start()
+        logger.info(f"📢 Liveセッションプール起動: 最小{SESSION_POOL_MIN} / 最大{SESSION_POOL_MAX}")
+
+    async def shutdown(self):
+        await self.sessions.close()
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        if self.store is not None:
+            # 残りの書き込みを待つ
+            await asyncio.to_thread(self.store.close)
+
+    def saturated(self) -> bool:
+        """新しい接続を受け付けられないほど混雑しているか"""
+        if MAX_CONNECTIONS and len(self.active_connections) >= MAX_CONNECTIONS:
+            return True
+        return self.scheduler.saturated
+
+    async def connect(self, websocket: WebSocket) -> bool:
+        """接続を受け付ける - 混雑時・バックエンド未設定の時は断って False
+
+        接続ごとの状態 (パイプライン・TranscribeService) はまだ作らない。最初のメッセージが
+        resume_session なら保持しているセッションを引き継ぎ、それ以外なら open() で作る。
+        """
         await websocket.accept()
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        if not api_key:
+        if self.saturated():
+            # 待ち行列に積んでから失敗させるより、接続時点で断る
+            metrics.inc("transcribe_connections_rejected_total")
             await websocket.send_text(json.dumps({
                 "type": "error",
-                "message": "APIキーが設定されていません",
+                "message": "サーバーが混雑しています。しばらくしてから再接続してください",
+                "code": "server_busy"
+            }, ensure_ascii=False))
+            await websocket.close(code=1013)
+            return False
+        try:
+            self.get_backend()
+        except BackendConfigError as e:
+            await websocket.send_text(json.dumps({
+                "type": "error",
+                "message": str(e),
                 "code": "missing_api_key"
-            }))
+            }, ensure_ascii=False))
             await websocket.close()
-            return
-        
-        transcribe_service = TranscribeService(api_key)
-        self.active_connections[websocket] = transcribe_service
-        print(f"🔗 WebSocket接続確立: {len(self.active_connections)}個の接続")
+            return False
+        return True
+
+    def open(self, websocket: WebSocket) -> ClientSession:
+        """新しいセッション用に接続ごとの状態を作る"""
+        backend = self.get_backend()
+        client = ClientSession(websocket, SESSION_REPLAY_SIZE)
+        client.store = self.store
+        client.hub = self.hub
+
+        async def on_partial(utterance: Utterance):
+            await pipeline.emit(partial_message(utterance))
+
+        async def on_result(utterance: Utterance):
+            await pipeline.emit(final_message(utterance), utterance.trace)
+
+        transcribe_service = TranscribeService(
+            backend,
+            on_result=on_result,
+            pool=self.pool,
+            on_partial=on_partial,
+            scheduler=self.scheduler,
+            rotate_after=UPSTREAM_ROTATE_AFTER,
+            rotation_wait=UPSTREAM_ROTATION_WAIT,
+            rotation_overlap_ms=UPSTREAM_ROTATION_OVERLAP_MS,
+            hedging=self.hedging,
+            profile=TRANSCRIPTION_PROFILE,
+        )
+        pipeline = ConnectionPipeline(
+            transcribe_service,
+            client.send,
+            policy=BACKPRESSURE_POLICY,
+            vad_config=TRANSCRIPTION_PROFILE.vad if VAD_ENABLED else None,
+            on_final=client.store_final,
+            publish=client.publish,
+            frame_ms=UPSTREAM_FRAME_MS,
+            jitter_ms=UPSTREAM_JITTER_MS,
+        )
+        pipeline.start()
+        client.transcribe_service = transcribe_service
+        client.pipeline = pipeline
+        self.active_connections[websocket] = client
+        logger.info(f"🔗 WebSocket接続確立: {len(self.active_connections)}個の接続")
+        return client
+
+    async def resume(self, websocket: WebSocket, token: Optional[str]) -> Optional[ClientSession]:
+        """保持しているセッションをこの接続に引き継ぐ"""
+        client = self.sessions.resume(token)
+        if client is None:
+            return None
+        fresh = self.active_connections.get(websocket)
+        if fresh is not None and fresh is not client:
+            await fresh.close()
+        self.active_connections[websocket] = client
+        return client
 
     async def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            transcribe_service = self.active_connections[websocket]
-            await transcribe_service.cleanup()
-            del self.active_connections[websocket]
-        print(f"🔗 WebSocket接続終了: {len(self.active_connections)}個の接続")
+        client = self.active_connections.pop(websocket, None)
+        if client is not None:
+            if client.resumable and SESSION_RESUME_GRACE > 0:
+                # 再接続に備えてアップストリームのセッションごと保持する
+                self.sessions.park(client)
+            else:
+                await client.close()
+        logger.info(f"🔗 WebSocket接続終了: {len(self.active_connections)}個の接続")
 
     async def send_message(self, websocket: WebSocket, message: Dict[str, Any]):
         try:
@@ -56,49 +309,213 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+async def resume_client(websocket: WebSocket, message: Dict[str, Any]) -> bool:
+    """resume_session - 保持しているセッションをこの接続に引き継ぐ
+
+    音声はサーバーに残していないため、クライアントは session_resumed の last_audio_sequence
+    より後に送った音声フレームを送り直す。
+    """
+    resumed = await manager.resume(websocket, message.get("session_token"))
+    if resumed is None:
+        return False
+    # 未受信のメッセージを再送してから、新しい接続で送信を再開する
+    replayed, complete = await resumed.attach(websocket, message.get("last_message_seq", 0))
+    await resumed.pipeline.emit({
+        "type": "session_resumed",
+        "session_token": resumed.token,
+        "last_audio_sequence": resumed.sequences.last,
+        "replayed": replayed,
+        "replay_complete": complete
+    })
+    return True
+
+async def session_expired(pipeline: ConnectionPipeline):
+    await pipeline.emit({
+        "type": "error",
+        "message": "再開できるセッションがありません (期限切れ、または不正なトークン)",
+        "code": "session_expired"
+    })
+
 @app.websocket("/ws/transcribe")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """読み取り専用ループ - 音声はパイプラインに渡し、文字起こしの完了は待たない"""
+    if not await manager.connect(websocket):
+        return
     
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
-            
-            if websocket not in manager.active_connections:
-                break
-                
-            transcribe_service = manager.active_connections[websocket]
+            raw = await websocket.receive()
+            if raw["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(raw.get("code", 1000))
             
+            message = None
+            invalid = None
+            if raw.get("text") is not None:
+                try:
+                    message = parse_control_message(raw["text"])
+                except MessageError as e:
+                    invalid = e
+            client = manager.active_connections.get(websocket)
+            if client is None:
+                # 再接続なら、接続ごとの状態を作らずに保持しているセッションを引き継ぐ
+                resuming = message is not None and message.get("type") == "resume_session"
+                if resuming and await resume_client(websocket, message):
+                    continue
+                client = manager.open(websocket)
+                if resuming:
+                    await session_expired(client.pipeline)
+                    continue
+            transcribe_service = client.transcribe_service
+            pipeline = client.pipeline
+
+            if invalid is not None:
+                # 不正な制御メッセージは接続を切らずにエラーを返して読み飛ばす
+                await pipeline.emit({
+                    "type": "error",
+                    "message": str(invalid),
+                    "code": "invalid_message"
+                })
+                continue
+
+            if raw.get("bytes") is not None:
+                # start_session で "binary" が合意されるまではJSON(base64)のみ受け付ける
+                if client.protocol != PROTOCOL_BINARY:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": "バイナリフレームを送る前に start_session で protocol=binary を指定してください",
+                        "code": "protocol_not_negotiated"
+                    })
+                    continue
+
+                received_at = time.perf_counter()
+                metrics.inc("transcribe_audio_bytes_in_total", len(raw["bytes"]))
+                try:
+                    frame = parse_audio_frame(raw["bytes"])
+                    if not client.accept_sequence(frame.sequence):
+                        # 再接続後に送り直された受信済みのフレーム
+                        continue
+                    pcm = client.decoder.decode(frame.payload, frame.sample_format)
+                except FrameError as e:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": str(e),
+                        "code": "invalid_frame"
+                    })
+                    continue
+
+                metrics.observe("transcribe_frame_decode_ms", (time.perf_counter() - received_at) * 1000)
+                await pipeline.submit(pcm, timestamp=frame.timestamp, sequence=frame.sequence,
+                                      received_at=received_at)
+                continue
+
             if message["type"] == "audio_chunk":
-                audio_data = base64.b64decode(message["data"])
-                
-                # 音声チャンクを転写サービスに送信
-                result = await transcribe_service.transcribe_audio_chunk(audio_data)
-                
-                if result:
-                    await manager.send_message(websocket, {
-                        "type": "transcription_result",
-                        "text": result,
-                        "timestamp": message.get("timestamp")
+                received_at = time.perf_counter()
+                sequence = message.get("sequence")
+                if not client.accept_sequence(sequence):
+                    continue
+                try:
+                    encoded = base64.b64decode(message.get("data", ""))
+                    metrics.inc("transcribe_audio_bytes_in_total", len(encoded))
+                    audio_data = client.decoder.decode(encoded)
+                except (binascii.Error, TypeError, FrameError) as e:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": str(e),
+                        "code": "invalid_frame"
                     })
+                    continue
+                metrics.observe("transcribe_frame_decode_ms", (time.perf_counter() - received_at) * 1000)
+                await pipeline.submit(audio_data, timestamp=message.get("timestamp"), sequence=sequence,
+                                      received_at=received_at)
             
             elif message["type"] == "start_session":
-                await transcribe_service.start_session()
-                await manager.send_message(websocket, {
-                    "type": "session_started"
-                })
+                requested = message.get("protocol", PROTOCOL_JSON)
+                if requested not in SUPPORTED_PROTOCOLS:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": f"未対応のプロトコル: {requested}",
+                        "code": "unsupported_protocol"
+                    })
+                    continue
+
+                try:
+                    profile = get_profile(message.get("profile", TRANSCRIPTION_PROFILE.name))
+                except ProfileError as e:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": str(e),
+                        "code": "unknown_profile"
+                    })
+                    continue
+
+                # クライアントのキャプチャレート・形式のまま受け取り、サーバー側で16kHz int16へ変換する
+                try:
+                    session_decoder = AudioDecoder(
+                        int(message.get("sample_rate", TARGET_SAMPLE_RATE)),
+                        message.get("encoding", "pcm_s16le"),
+                    )
+                except (TypeError, ValueError) as e:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": str(e),
+                        "code": "unsupported_audio_format"
+                    })
+                    continue
+                client.protocol = requested
+                client.decoder = session_decoder
+
+                # trace_id を指定するか trace=true で、結果に段階別の所要時間を付ける
+                trace_id = message.get("trace_id")
+                if trace_id is None and message.get("trace"):
+                    trace_id = uuid.uuid4().hex[:16]
+
+                mode = message.get("mode", "chunk")
+                try:
+                    await transcribe_service.start_session(streaming=(mode == "streaming"), trace_id=trace_id,
+                                                           profile=profile)
+                except AdmissionError as e:
+                    await pipeline.emit({
+                        "type": "error",
+                        "message": str(e),
+                        "code": "server_busy"
+                    })
+                    continue
+                if VAD_ENABLED:
+                    pipeline.configure_vad(profile.vad)
+                client.begin(uuid.uuid4().hex, uuid.uuid4().hex, mode)
+                response = {
+                    "type": "session_started",
+                    "mode": mode,
+                    "profile": profile.name,
+                    "protocol": client.protocol,
+                    "sample_rate": client.decoder.sample_rate,
+                    "encoding": client.decoder.encoding,
+                    "backpressure_policy": pipeline.policy.value,
+                    "session_token": client.token,
+                    "session_id": client.session_id
+                }
+                if trace_id is not None:
+                    response["trace_id"] = trace_id
+                await pipeline.emit(response)
             
             elif message["type"] == "end_session":
+                # 取り込み済みの音声を処理し終えてからセッションを閉じる
+                await pipeline.drain()
+                await pipeline.flush()
                 await transcribe_service.end_session()
-                await manager.send_message(websocket, {
+                client.end()
+                await pipeline.emit({
                     "type": "session_ended"
                 })
+
+            elif message["type"] == "resume_session":
+                if not await resume_client(websocket, message):
+                    await session_expired(pipeline)
                 
     except WebSocketDisconnect:
         pass
     except Exception as e:
-        print(f"❌ WebSocketエラー: {e}")
+        logger.error(f"❌ WebSocketエラー: {e}")
         await manager.send_message(websocket, {
             "type": "error",
             "message": str(e),
@@ -107,9 +524,172 @@ async def websocket_endpoint(websocket: WebSocket):
     finally:
         await manager.disconnect(websocket)
 
+@app.websocket("/ws/subscribe/{session_id}")
+async def subscribe_endpoint(websocket: WebSocket, session_id: str):
+    """読み取り専用の購読 - session_id のセッションの文字起こし結果を受け取る"""
+    await websocket.accept()
+    if session_id not in manager.hub:
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "message": "配信中のセッションがありません",
+            "code": "session_not_found"
+        }, ensure_ascii=False))
+        await websocket.close(code=1008)
+        return
+    if manager.hub.full:
+        metrics.inc("transcribe_connections_rejected_total")
+        await websocket.send_text(json.dumps({
+            "type": "error",
+            "message": "購読者数が上限に達しています",
+            "code": "server_busy"
+        }, ensure_ascii=False))
+        await websocket.close(code=1013)
+        return
+
+    subscriber = manager.hub.subscribe(session_id, websocket)
+    subscriber.push(True, json.dumps({"type": "subscribed", "session_id": session_id}))
+    logger.info(f"👀 購読開始: {manager.hub.subscribers}人")
+    try:
+        # 購読者からのメッセージは使わない - 切断の検出のためだけに読む
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        manager.hub.unsubscribe(session_id, subscriber)
+        logger.info(f"👀 購読終了: {manager.hub.subscribers}人")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "Realtime Transcription API is running"}
+    response = {"status": "healthy", "message": "Realtime Transcription API is running"}
+    if manager.backend is not None:
+        response["backend"] = manager.backend.name
+    if manager.pool is not None:
+        response["session_pool"] = manager.pool.metrics()
+    response["admission"] = manager.scheduler.metrics()
+    response["resumable_sessions"] = manager.sessions.metrics()
+    response["hedging"] = manager.hedging.metrics()
+    response["broadcast"] = manager.hub.metrics()
+    if manager.store is not None:
+        response["transcript_store"] = manager.store.metrics()
+    return response
+
+@app.get("/profiles")
+async def list_profiles():
+    """start_session で指定できるプロファイルと発話の区切り方"""
+    return {
+        "default": TRANSCRIPTION_PROFILE.name,
+        "profiles": {
+            name: {
+                "silence_duration_ms": profile.silence_duration_ms,
+                "prefix_padding_ms": profile.prefix_padding_ms,
+                "end_sensitivity": profile.end_sensitivity,
+                "vad_hangover_ms": profile.vad.hangover_ms,
+            }
+            for name, profile in PROFILES.items()
+        },
+    }
+
+@app.post("/transcribe/file")
+async def transcribe_file(request: Request, sample_rate: int = TARGET_SAMPLE_RATE, channels: int = 1,
+                          start_sample: int = 0, first_index: int = 0):
+    """録音ファイルの一括文字起こし - 結果をセグメントの順番どおりに NDJSON で返す
+
+    リクエストボディは WAV (16bit PCM) または生の int16 PCM (sample_rate / channels で形式を指定)。
+    途中で切れた場合は、最後に受け取った結果の end_sample と index + 1 を start_sample /
+    first_index に指定して送り直せば続きから処理する。
+    """
+    if manager.backend is None:
+        return JSONResponse({"error": "文字起こしバックエンドが設定されていません"}, status_code=503)
+
+    # アップロードはメモリに溜めず一時ファイルへ書き出し、メモリマップで読む
+    limit = BULK_MAX_UPLOAD_MB * 1024 * 1024
+    upload = tempfile.NamedTemporaryFile(prefix="bulk-", suffix=".audio", delete=False)
+    error = None
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > limit:
+                error = JSONResponse({"error": f"ファイルが大きすぎます (上限 {BULK_MAX_UPLOAD_MB}MB)"}, status_code=413)
+                break
+            await asyncio.to_thread(upload.write, chunk)
+        upload.close()
+        if error is None:
+            audio = AudioFile.open(upload.name, sample_rate, channels)
+    except ValueError as e:
+        error = JSONResponse({"error": str(e)}, status_code=400)
+    except BaseException:
+        upload.close()
+        os.unlink(upload.name)
+        raise
+    if error is not None:
+        upload.close()
+        os.unlink(upload.name)
+        return error
+
+    # セグメントは通常のチャンクより長く遅延の分布が違うため、ヘッジの統計はジョブごとに持つ
+    transcriber = BulkTranscriber(
+        manager.backend, BulkConfig(workers=BULK_WORKERS), pool=manager.pool, scheduler=manager.scheduler,
+        profile=TRANSCRIPTION_PROFILE,
+    )
+
+    def cleanup():
+        try:
+            os.unlink(upload.name)
+        except FileNotFoundError:
+            pass
+
+    async def results():
+        try:
+            async for record in transcriber.run(audio, start_sample, first_index):
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+            yield json.dumps({"type": "summary", **transcriber.stats()}) + "\n"
+        finally:
+            cleanup()
+
+    logger.info(f"📂 ファイル文字起こし開始: {audio.duration:.0f}秒, {audio.sample_rate}Hz, {audio.channels}ch")
+    # 送信前にクライアントが切断するとジェネレータが始まらず finally も走らないため、
+    # レスポンス終了後のバックグラウンドタスクでも一時ファイルを消す
+    return StreamingResponse(results(), media_type="application/x-ndjson", background=BackgroundTask(cleanup))
+
+@app.get("/sessions/{session_id}/transcript")
+async def get_transcript(session_id: str, after_id: int = 0, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=DEFAULT_PAGE_SIZE)):
+    """セッションの確定した発話を順に返す (after_id で続きから取得)"""
+    if manager.store is None:
+        return JSONResponse({"error": "文字起こしストアが無効です"}, status_code=503)
+    transcript = await asyncio.to_thread(manager.store.get_session, session_id, after_id, limit)
+    if transcript is None:
+        return JSONResponse({"error": "セッションが見つかりません"}, status_code=404)
+    return transcript
+
+@app.get("/transcripts/search")
+async def search_transcripts(q: str, session_id: Optional[str] = None,
+                             limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=DEFAULT_PAGE_SIZE)):
+    """セッションをまたいで発話のテキストを検索 (新しい順)"""
+    if manager.store is None:
+        return JSONResponse({"error": "文字起こしストアが無効です"}, status_code=503)
+    if not q:
+        return JSONResponse({"error": "検索語を指定してください"}, status_code=400)
+    results = await asyncio.to_thread(manager.store.search, q, session_id, limit)
+    return {"query": q, "results": results}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus テキスト形式のメトリクス"""
+    metrics.set_gauge("transcribe_active_connections", len(manager.active_connections))
+    metrics.set_gauge("transcribe_ingest_queue_depth",
+                      sum(client.pipeline.queue_depth for client in manager.active_connections.values()))
+    metrics.set_gauge("transcribe_parked_sessions", len(manager.sessions))
+    metrics.set_gauge("transcribe_subscribers", manager.hub.subscribers)
+    if manager.store is not None:
+        metrics.set_gauge("transcribe_store_pending", manager.store.pending)
+    if manager.pool is not None:
+        for name, value in manager.pool.metrics().items():
+            metrics.set_gauge(f"transcribe_pool_{name}", value)
+    for name, value in manager.scheduler.metrics().items():
+        metrics.set_gauge(f"transcribe_admission_{name}", value)
+    for name, value in manager.hedging.metrics().items():
+        metrics.set_gauge(f"transcribe_hedging_{name}", value)
+    return metrics.render_prometheus()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,142 @@
+"""レイテンシ計測とメトリクス
+
+ホットパスでは print を使わず、段階ごとの所要時間をヒストグラムに記録する。
+/metrics エンドポイントは Prometheus のテキスト形式で出力する。
+
+段階 (発話の最初の音声を受信した時刻からの経過ms):
+
+- upstream_connect: アップストリームのセッション確保
+- first_byte_sent: 最初の音声をアップストリームへ送信完了
+- first_partial: 最初の部分結果を受信
+- turn_complete: ターン完了を受信
+- result_delivered: 結果をクライアントへ送信完了
+
+frame_decode はフレーム1つのデコード時間 (ms) を記録する。
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+STAGES = ("upstream_connect", "first_byte_sent", "first_partial", "turn_complete", "result_delivered")
+
+DEFAULT_BUCKETS_MS = (
+    0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000,
+)
+
+logger = logging.getLogger("transcribe")
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: Optional[str] = None):
+    """ログ出力を別スレッドに任せ、イベントループでの標準出力への書き込みを避ける"""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.Queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(level or os.environ.get("LOG_LEVEL", "INFO"))
+    logger.propagate = False
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS_MS):
+        self.buckets: Tuple[float, ...] = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """バケット上限による近似分位点"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.gauges: Dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, stage: str = ""):
+        key = (name, stage)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(value)
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def render_prometheus(self) -> str:
+        lines = []
+        for name in sorted(self.counters):
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {self.counters[name]}")
+        for name in sorted(self.gauges):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {self.gauges[name]}")
+
+        declared = set()
+        for (name, stage), histogram in sorted(self.histograms.items()):
+            if name not in declared:
+                lines.append(f"# TYPE {name} histogram")
+                declared.add(name)
+            label = f'stage="{stage}",' if stage else ""
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label}le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{label}le="+Inf"}} {histogram.count}')
+            suffix = f"{{{label.rstrip(',')}}}" if label else ""
+            lines.append(f"{name}_sum{suffix} {histogram.sum}")
+            lines.append(f"{name}_count{suffix} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class Trace:
+    """1発話の段階ごとの経過時間"""
+
+    __slots__ = ("trace_id", "started", "marks")
+
+    def __init__(self, trace_id: Optional[str] = None, started: Optional[float] = None):
+        self.trace_id = trace_id
+        self.started = started if started is not None else time.perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, stage: str):
+        """段階の到達時刻を記録 (最初の1回のみ)"""
+        if stage not in self.marks:
+            self.marks[stage] = (time.perf_counter() - self.started) * 1000
+
+    def record(self, registry: MetricsRegistry = metrics):
+        for stage, elapsed in self.marks.items():
+            registry.observe("transcribe_stage_latency_ms", elapsed, stage=stage)
+
+    def timings(self) -> Dict[str, float]:
+        return {stage: round(elapsed, 1) for stage, elapsed in self.marks.items()}
@@ -0,0 +1,386 @@
+"""接続ごとの音声処理パイプライン
+
+WebSocketの読み取り (reader) と文字起こし処理を切り離すため、接続ごとに
+以下の構成を持つ。
+
+    reader (websocket_endpoint) -> 取り込みキュー (有界) -> ワーカー -> 並べ替えバッファ -> writer
+
+取り込みキューが満杯になった場合の挙動は BackpressurePolicy で明示的に指定し、
+過負荷状態に入った時と解消した時に "backpressure" メッセージでクライアントへ通知する。
+
+文字起こし結果は発話ごとに、部分結果 "transcription_partial" (届くたびに revision が増える)
+と最終結果 "transcription_final" で返す。どちらも同じ utterance_id を持ち、text は
+その時点までの発話全体のテキスト。
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from .admission import AdmissionError
+from .framing import DEFAULT_JITTER_MS, FramePacer
+from .hedging import UpstreamTimeoutError
+from .metrics import Trace, logger, metrics
+from .transcribe_service import TranscribeService, Utterance
+from .vad import AUDIO, SPEECH_END, SPEECH_START, VADConfig, VoiceActivitySegmenter, trim_silence
+
+# シリアライズ済みのJSONテキストを message_seq とともに送信する
+SendCallback = Callable[[int, str], Awaitable[None]]
+# 確定した結果メッセージとそのトレース
+FinalCallback = Callable[[Dict[str, Any], Optional[Trace]], None]
+# 送信するメッセージの種類とシリアライズ済みのJSONテキスト (購読者への配信用)
+PublishCallback = Callable[[str, str], None]
+
+DEFAULT_QUEUE_SIZE = 32
+# チャンクモードで同時に処理するチャンク数 (結果は並べ替えて順番通りに返す)
+DEFAULT_CHUNK_WORKERS = 2
+
+
+def partial_message(utterance: Utterance) -> Dict[str, Any]:
+    return {
+        "type": "transcription_partial",
+        "utterance_id": utterance.utterance_id,
+        "revision": utterance.revision,
+        "text": utterance.text,
+    }
+
+
+def final_message(utterance: Utterance) -> Dict[str, Any]:
+    message = {
+        "type": "transcription_final",
+        "utterance_id": utterance.utterance_id,
+        "revision": utterance.revision,
+        "text": utterance.text,
+    }
+    if utterance.offset_ms is not None:
+        message["offset_ms"] = utterance.offset_ms
+    return message
+
+
+class BackpressurePolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"  # 最も古いチャンクを破棄
+    COALESCE = "coalesce"  # 末尾のチャンクに結合
+    SIGNAL = "signal"  # クライアントに減速を要求し、空きが出るまで読み取りを止める
+
+
+@dataclass
+class AudioItem:
+    ticket: int
+    data: Union[bytes, memoryview]
+    timestamp: Optional[float] = None
+    sequence: Optional[int] = None
+    received_at: float = 0.0
+    # セッション開始からの音声の位置
+    offset_ms: float = 0.0
+
+
+class ConnectionPipeline:
+    def __init__(
+        self,
+        transcribe_service: TranscribeService,
+        send: SendCallback,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        policy: BackpressurePolicy = BackpressurePolicy.DROP_OLDEST,
+        chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+        vad_config: Optional[VADConfig] = None,
+        on_final: Optional[FinalCallback] = None,
+        publish: Optional[PublishCallback] = None,
+        frame_ms: int = 0,
+        jitter_ms: int = DEFAULT_JITTER_MS,
+    ):
+        self.transcribe_service = transcribe_service
+        self.send = send
+        self.max_queue = max_queue
+        self.low_watermark = max_queue // 2
+        self.policy = policy
+        self.chunk_workers = chunk_workers
+        # 指定された場合は無声区間をアップストリームへ送らない
+        self.vad_config = vad_config
+        self.vad = VoiceActivitySegmenter(vad_config) if vad_config else None
+        # 確定した結果ごとに呼ぶ (永続化など、ブロックしない処理に限る)
+        self.on_final = on_final
+        # シリアライズしたメッセージごとに呼ぶ (購読者への配信 - ブロックしない処理に限る)
+        self.publish = publish
+        # ストリーミングモードでアップストリームへ送る音声を frame_ms ごとの固定長フレームにする (0 でそのまま)
+        self.pacer = FramePacer(self._send_frame, frame_ms, jitter_ms) if frame_ms > 0 else None
+
+        self._queue: Deque[AudioItem] = deque()
+        self._queue_changed = asyncio.Event()
+        self._output: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+        self._next_ticket = 0
+        self._next_delivery = 0
+        self._completed: Dict[int, Tuple[Optional[Dict[str, Any]], Optional[Trace]]] = {}
+        # 取り出しとストリーミング送信をまとめて直列化し、送信順序を保つ
+        self._dispatch_lock = asyncio.Lock()
+        self._in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.overloaded = False
+        self.dropped = 0
+        self.coalesced = 0
+        # 送信メッセージの通し番号 (再接続時の再送に使う)
+        self.message_seq = 0
+        # 取り込んだ音声の長さ (16kHz int16) - flush でセッションの区切りとしてリセット
+        self._audio_ms = 0.0
+
+    def start(self):
+        """ワーカーとwriterを起動"""
+        self._tasks.append(asyncio.create_task(self._writer()))
+        if self.pacer is not None:
+            self.pacer.start()
+        for _ in range(self.chunk_workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def configure_vad(self, config: VADConfig):
+        """セッション開始時にVADの設定を切り替える (プロファイルごとの発話の区切り方)"""
+        if config != self.vad_config:
+            self.vad_config = config
+            self.vad = VoiceActivitySegmenter(config)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    async def emit(self, message: Dict[str, Any], trace: Optional[Trace] = None):
+        """順序付け不要なメッセージ (制御応答・ストリーミング結果) をwriterへ渡す"""
+        self._enqueue(message, trace)
+
+    def _enqueue(self, message: Dict[str, Any], trace: Optional[Trace]):
+        # 確定した結果はセッションの終了処理より前 (writerへ渡す時点) に通知する
+        if self.on_final is not None and message["type"] == "transcription_final":
+            self.on_final(message, trace)
+        self._output.put_nowait((message, trace))
+
+    async def submit(self, data: Union[bytes, memoryview], timestamp: Optional[float] = None,
+                     sequence: Optional[int] = None, received_at: Optional[float] = None):
+        """音声データを取り込みキューへ追加 - 満杯時はポリシーに従う"""
+        item = AudioItem(
+            ticket=self._next_ticket,
+            data=data,
+            timestamp=timestamp,
+            sequence=sequence,
+            received_at=received_at if received_at is not None else time.perf_counter(),
+            offset_ms=self._audio_ms,
+        )
+        self._next_ticket += 1
+        self._audio_ms += memoryview(data).nbytes / 32
+
+        if len(self._queue) >= self.max_queue:
+            await self._set_overloaded(True)
+
+            if self.policy == BackpressurePolicy.DROP_OLDEST:
+                oldest = self._queue.popleft()
+                self.dropped += 1
+                metrics.inc("transcribe_chunks_dropped_total")
+                self._complete(oldest.ticket, None)
+
+            elif self.policy == BackpressurePolicy.COALESCE:
+                last = self._queue[-1]
+                last.data = bytes(last.data) + bytes(item.data)
+                self.coalesced += 1
+                metrics.inc("transcribe_chunks_coalesced_total")
+                self._complete(item.ticket, None)
+                return
+
+            elif self.policy == BackpressurePolicy.SIGNAL:
+                while len(self._queue) >= self.max_queue:
+                    self._queue_changed.clear()
+                    await self._queue_changed.wait()
+
+        self._queue.append(item)
+        self._idle.clear()
+        self._queue_changed.set()
+
+    async def drain(self):
+        """キューと処理中のチャンクがすべて完了するまで待機"""
+        await self._idle.wait()
+
+    async def flush(self):
+        """ストリーム終了時にVADの状態を確定させる (発話中なら発話終了を通知)"""
+        self._audio_ms = 0.0
+        async with self._dispatch_lock:
+            if self.vad is not None:
+                if self.transcribe_service.is_streaming:
+                    await self._handle_vad_events(self.vad.flush(), time.perf_counter())
+                else:
+                    self.vad.reset()
+            if self.pacer is not None:
+                await self.pacer.drain()
+
+    async def close(self):
+        """パイプライン停止"""
+        if self.pacer is not None:
+            await self.pacer.close()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+
+    async def _set_overloaded(self, overloaded: bool):
+        if overloaded == self.overloaded:
+            return
+        self.overloaded = overloaded
+        await self.emit({
+            "type": "backpressure",
+            "state": "overloaded" if overloaded else "recovered",
+            "policy": self.policy.value,
+            "queue_depth": len(self._queue),
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        })
+
+    def _complete(self, ticket: int, message: Optional[Dict[str, Any]], trace: Optional[Trace] = None):
+        """チャンクの処理完了を記録し、順番が来たものからwriterへ渡す"""
+        self._completed[ticket] = (message, trace)
+        while self._next_delivery in self._completed:
+            ready, ready_trace = self._completed.pop(self._next_delivery)
+            self._next_delivery += 1
+            if ready is not None:
+                self._enqueue(ready, ready_trace)
+
+    async def _wait_for_item(self):
+        while not self._queue:
+            self._queue_changed.clear()
+            await self._queue_changed.wait()
+
+    async def _next_item(self) -> Optional[AudioItem]:
+        if not self._queue:
+            return None
+        item = self._queue.popleft()
+        self._in_flight += 1
+        self._queue_changed.set()
+        if self.overloaded and len(self._queue) <= self.low_watermark:
+            await self._set_overloaded(False)
+        return item
+
+    async def _worker(self):
+        while True:
+            message, trace = None, None
+            # 待機中はロックを持たない (flush がロックを取れるように)
+            await self._wait_for_item()
+            async with self._dispatch_lock:
+                item = await self._next_item()
+                if item is None:
+                    continue
+                streamed = self.transcribe_service.is_streaming
+                if streamed:
+                    message, trace = await self._process(item, streamed)
+
+            if not streamed:
+                # チャンクモードは並行して処理し、結果は _complete で並べ替える
+                message, trace = await self._process(item, streamed)
+
+            self._complete(item.ticket, message, trace)
+            if not self._queue and self._in_flight == 0:
+                self._idle.set()
+
+    async def _process(self, item: AudioItem, streamed: bool) -> Tuple[Optional[Dict[str, Any]], Optional[Trace]]:
+        try:
+            if streamed:
+                if self.vad is None:
+                    await self._send_audio(item.data, item.received_at, item.offset_ms)
+                else:
+                    await self._handle_vad_events(self.vad.process(item.data), item.received_at)
+                return None, None
+
+            if self.vad_config is not None:
+                audio_data = trim_silence(item.data, self.vad_config)
+                if audio_data is None:
+                    # 無声チャンクはアップストリームに送らない
+                    return None, None
+            else:
+                audio_data = bytes(item.data)
+
+            utterance = self.transcribe_service.new_utterance(item.received_at, item.offset_ms)
+            result = await self.transcribe_service.transcribe_audio_chunk(audio_data, utterance)
+            if not result:
+                return None, None
+            message = final_message(utterance)
+            message["timestamp"] = item.timestamp
+            if item.sequence is not None:
+                message["sequence"] = item.sequence
+            return message, utterance.trace
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return self._error_message(e), None
+        finally:
+            self._in_flight -= 1
+
+    @staticmethod
+    def _error_message(e: Exception) -> Dict[str, Any]:
+        if isinstance(e, AdmissionError):
+            code = "server_busy"
+        elif isinstance(e, UpstreamTimeoutError):
+            code = "upstream_timeout"
+        else:
+            code = "transcription_error"
+            metrics.inc("transcribe_errors_total")
+            logger.error(f"❌ パイプライン処理エラー: {e}")
+        return {
+            "type": "error",
+            "message": str(e),
+            "code": code,
+        }
+
+    async def _send_audio(self, audio: Union[bytes, memoryview], received_at: float, offset_ms: float):
+        """ストリーミングセッションへ送る音声 - フレーム化する場合はペース調整のバッファへ"""
+        if self.pacer is None:
+            await self.transcribe_service.send_audio(audio, received_at, offset_ms)
+        else:
+            await self.pacer.push(audio, received_at, offset_ms)
+
+    async def _send_frame(self, frame: bytes, received_at: float, offset_ms: float):
+        """FramePacer からフレームごとに呼ばれる - エラーはクライアントへ通知して続ける"""
+        try:
+            await self.transcribe_service.send_audio(frame, received_at, offset_ms)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._enqueue(self._error_message(e), None)
+
+    async def _handle_vad_events(self, events, received_at: float):
+        """VADの出力に従って有声音声のみ送信し、発話境界をクライアントへ通知"""
+        for event in events:
+            if event.kind == AUDIO:
+                await self._send_audio(memoryview(event.audio), received_at, event.offset_ms)
+            elif event.kind == SPEECH_START:
+                await self.emit({"type": "speech_started", "offset_ms": event.offset_ms})
+            elif event.kind == SPEECH_END:
+                # 無声区間を送らないため、アップストリームには明示的に発話終了を伝える
+                if self.pacer is not None:
+                    await self.pacer.drain()
+                await self.transcribe_service.end_utterance()
+                await self.emit({"type": "speech_ended", "offset_ms": event.offset_ms})
+
+    async def _writer(self):
+        while True:
+            message, trace = await self._output.get()
+            if trace is not None and trace.trace_id is not None:
+                message["trace_id"] = trace.trace_id
+                message["timings_ms"] = trace.timings()
+            self.message_seq += 1
+            message["message_seq"] = self.message_seq
+            payload = json.dumps(message, ensure_ascii=False)
+            if self.publish is not None:
+                self.publish(message["type"], payload)
+            try:
+                await self.send(self.message_seq, payload)
+            except Exception as e:
+                # 送信できない場合は接続が切れている - 後始末は reader 側の切断処理に任せる
+                logger.warning(f"❌ 送信エラー: {e}")
+                return
+            metrics.inc("transcribe_bytes_out_total", len(payload))
+            if trace is not None:
+                trace.mark("result_delivered")
+                trace.record()
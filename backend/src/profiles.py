@@ -0,0 +1,93 @@
+"""文字起こしプロファイル
+
+発話の区切り方 (どれだけ無音が続いたら発話の終わりとみなすか) は、遅延と精度の
+トレードオフになる。クライアントは start_session の profile で用途に合うものを選ぶ。
+
+- default: これまでの設定 (無音 1.5秒で区切る / サーバー側VADのハングオーバー 300ms)
+- dictation: 短い無音で区切り、結果を早く返す (音声入力・コマンド向け)
+- meeting: 長めの無音まで1つの発話として扱い、文の途中で区切らない (会議の書き起こし向け)
+
+ストリーミングモードではサーバー側VADも silence_duration_ms の無音で発話を区切る
+(ハングオーバーは無音をどこまで送るかだけを決める)。
+
+プロファイルは変更できない値として1度だけ作り、アップストリームへ渡す設定オブジェクトも
+各バックエンドがプロファイルごとにキャッシュする (接続ごとに作り直さない)。
+"""
+from dataclasses import dataclass, replace
+from typing import Dict
+
+from .vad import VADConfig
+
+MODEL = "gemini-2.0-flash-live-001"
+
+SYSTEM_INSTRUCTION = """
+あなたは正確な音声文字起こしシステムです。聞こえた音声を正確に文字起こししてください。
+会話や応答は不要で、聞こえた内容を書き起こすだけです。
+ただし、えー、あのー、などのフィラー音は削除して回答してください。
+重複や冗長な表現があれば自然な日本語に修正してください。
+"""
+
+SENSITIVITY_HIGH = "high"
+SENSITIVITY_LOW = "low"
+
+
+class ProfileError(ValueError):
+    """未定義のプロファイル"""
+
+
+@dataclass(frozen=True)
+class TranscriptionProfile:
+    name: str
+    # アップストリームの発話検出
+    silence_duration_ms: int
+    prefix_padding_ms: int
+    start_sensitivity: str
+    end_sensitivity: str
+    # サーバー側VAD (ストリーミングモードで発話の終わりをアップストリームへ伝える)
+    vad: VADConfig
+    model: str = MODEL
+    system_instruction: str = SYSTEM_INSTRUCTION
+
+    def __post_init__(self):
+        # アップストリームと同じ長さの無音でサーバー側VADも発話を区切る
+        object.__setattr__(self, "vad", replace(self.vad, turn_end_ms=self.silence_duration_ms))
+
+
+DEFAULT_PROFILE = "default"
+
+PROFILES: Dict[str, TranscriptionProfile] = {
+    profile.name: profile
+    for profile in (
+        TranscriptionProfile(
+            name="default",
+            silence_duration_ms=1500,
+            prefix_padding_ms=300,
+            start_sensitivity=SENSITIVITY_HIGH,
+            end_sensitivity=SENSITIVITY_LOW,  # 発話終了を遅めに検出
+            vad=VADConfig(),
+        ),
+        TranscriptionProfile(
+            name="dictation",
+            silence_duration_ms=500,
+            prefix_padding_ms=200,
+            start_sensitivity=SENSITIVITY_HIGH,
+            end_sensitivity=SENSITIVITY_HIGH,
+            vad=VADConfig(hangover_ms=200, preroll_ms=200),
+        ),
+        TranscriptionProfile(
+            name="meeting",
+            silence_duration_ms=2000,
+            prefix_padding_ms=300,
+            start_sensitivity=SENSITIVITY_HIGH,
+            end_sensitivity=SENSITIVITY_LOW,
+            vad=VADConfig(hangover_ms=1000),
+        ),
+    )
+}
+
+
+def get_profile(name: str) -> TranscriptionProfile:
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise ProfileError(f"未定義のプロファイル: {name} ({', '.join(PROFILES)})")
+    return profile
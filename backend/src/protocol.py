@@ -0,0 +1,117 @@
+"""WebSocket バイナリ音声フレームの定義
+
+バイナリフレームは固定長ヘッダーと生のPCMデータで構成される。
+
+    version (u8) | sample_format (u8) | flags (u16) | sequence (u32) | timestamp_ms (f64) | PCM...
+
+すべてリトルエンディアン。制御メッセージは従来通りJSONテキストで送受信する。
+サンプルレートは start_session の sample_rate で指定し (既定 16000)、sample_format が
+16kHz int16 以外の場合はサーバー側でデコード・リサンプリングする (src/audio_codec.py)。
+"""
+import json
+import struct
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Dict, Union
+
+FRAME_VERSION = 1
+
+FRAME_HEADER = struct.Struct("<BBHId")
+
+# start_session の "protocol" フィールドで指定できる値
+PROTOCOL_JSON = "json"
+PROTOCOL_BINARY = "binary"
+SUPPORTED_PROTOCOLS = (PROTOCOL_JSON, PROTOCOL_BINARY)
+
+
+class SampleFormat(IntEnum):
+    PCM_S16LE = 1
+    PCM_S16LE_16K = 1  # 互換用の別名
+    PCM_F32LE = 2
+    MULAW = 3
+    # WAV形式と同じモノラルIMA ADPCMブロック (フレームごとに独立してデコードできる)
+    IMA_ADPCM = 4
+
+
+# ペイロード長が揃っている必要があるバイト数
+SAMPLE_ALIGNMENT = {
+    SampleFormat.PCM_S16LE: 2,
+    SampleFormat.PCM_F32LE: 4,
+    SampleFormat.MULAW: 1,
+    SampleFormat.IMA_ADPCM: 1,
+}
+
+
+class FrameError(ValueError):
+    """不正なバイナリフレーム"""
+
+
+class MessageError(ValueError):
+    """不正な制御メッセージ"""
+
+
+@dataclass
+class AudioFrame:
+    sequence: int
+    timestamp: float
+    sample_format: SampleFormat
+    flags: int
+    payload: memoryview
+
+
+def parse_audio_frame(data: Union[bytes, bytearray, memoryview]) -> AudioFrame:
+    """バイナリフレームを解析 - PCM部分はコピーせず memoryview で返す"""
+    view = memoryview(data)
+    if len(view) < FRAME_HEADER.size:
+        raise FrameError(f"フレームが短すぎます: {len(view)} bytes")
+
+    version, sample_format, flags, sequence, timestamp = FRAME_HEADER.unpack_from(view)
+    if version != FRAME_VERSION:
+        raise FrameError(f"未対応のフレームバージョン: {version}")
+    try:
+        sample_format = SampleFormat(sample_format)
+    except ValueError:
+        raise FrameError(f"未対応のサンプル形式: {sample_format}") from None
+
+    payload = view[FRAME_HEADER.size:]
+    if len(payload) % SAMPLE_ALIGNMENT[sample_format]:
+        raise FrameError(f"データ長がサンプル境界に揃っていません: {sample_format.name}")
+
+    return AudioFrame(
+        sequence=sequence,
+        timestamp=timestamp,
+        sample_format=sample_format,
+        flags=flags,
+        payload=payload,
+    )
+
+
+def build_audio_frame(
+    payload: bytes,
+    sequence: int,
+    timestamp: float,
+    sample_format: SampleFormat = SampleFormat.PCM_S16LE,
+    flags: int = 0,
+) -> bytes:
+    """バイナリフレームを構築 (テスト・クライアント用)"""
+    header = FRAME_HEADER.pack(FRAME_VERSION, sample_format, flags, sequence & 0xFFFFFFFF, timestamp)
+    return header + payload
+
+
+def parse_control_message(text: str) -> Dict[str, Any]:
+    """JSONの制御メッセージを解析 - 形式や数値フィールドが不正なら MessageError"""
+    try:
+        message = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise MessageError(f"JSONとして解析できません: {e}") from None
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise MessageError("制御メッセージは type を持つJSONオブジェクトにしてください")
+
+    if "last_message_seq" in message:
+        try:
+            message["last_message_seq"] = int(message["last_message_seq"])
+        except (TypeError, ValueError):
+            raise MessageError(f"last_message_seq が整数ではありません: {message['last_message_seq']!r}") from None
+        if message["last_message_seq"] < 0:
+            raise MessageError("last_message_seq は0以上にしてください")
+    return message
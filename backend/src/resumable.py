@@ -0,0 +1,237 @@
+"""再開可能なセッション
+
+start_session 済みのセッションは WebSocket が切れても猶予時間のあいだ保持し、
+アップストリームのセッションと処理中の音声はそのまま処理を続ける。
+
+- session_started で session_token を発行する
+- サーバーからのメッセージには通し番号 message_seq を付け、直近のものをリングバッファに残す
+- 音声フレームのシーケンス番号を直近の一定数だけ覚えておき、重複したフレームは捨てる
+
+再接続したクライアントは resume_session で session_token と受信済みの最後の
+message_seq を送る。サーバーはそれより後のメッセージだけを再送し、session_resumed で
+受信済みの最後の音声シーケンス番号 (last_audio_sequence) を返す。クライアントはそれより
+後の音声だけを送り直せばよい。
+
+音声はサーバーには残さない (受信済みの音声は切断中も処理を続けるので、失われるのは
+サーバーに届かなかった音声だけ)。そのため送り直せるように保持しておくのはクライアントの
+責任で、少なくとも猶予時間 (SESSION_RESUME_GRACE) ぶんの送信済みフレームを
+シーケンス番号付きで残しておく必要がある (frontend/src/hooks/useWebSocket.ts 参照)。
+保持が足りずに送り直せなかった区間の音声は文字起こしされない。
+
+再接続した接続は最初のメッセージが resume_session なら、接続ごとの状態を作らずに
+保持しているセッションを引き継ぐ。
+"""
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set, Tuple
+
+from .audio_codec import AudioDecoder
+from .metrics import Trace, logger, metrics
+from .protocol import PROTOCOL_JSON
+
+if TYPE_CHECKING:
+    from fastapi import WebSocket
+    from .broadcast import BroadcastHub
+    from .pipeline import ConnectionPipeline
+    from .transcribe_service import TranscribeService
+    from .transcript_store import TranscriptStore
+
+DEFAULT_GRACE_PERIOD = 30.0
+DEFAULT_REPLAY_SIZE = 256
+DEFAULT_SEQUENCE_WINDOW = 1024
+
+
+class ReplayBuffer:
+    """送信済みメッセージの直近分 (message_seq, JSONテキスト)"""
+
+    def __init__(self, capacity: int = DEFAULT_REPLAY_SIZE):
+        self._messages: Deque[Tuple[int, str]] = deque(maxlen=capacity)
+
+    def append(self, seq: int, payload: str):
+        self._messages.append((seq, payload))
+
+    def since(self, last_seq: int) -> Tuple[List[str], bool]:
+        """last_seq より後のメッセージと、欠けなく再送できるかどうか"""
+        if not self._messages:
+            return [], True
+        complete = self._messages[0][0] <= last_seq + 1
+        return [payload for seq, payload in self._messages if seq > last_seq], complete
+
+
+class SequenceWindow:
+    """直近に受信した音声フレームのシーケンス番号 - 再送による重複の検出用"""
+
+    def __init__(self, capacity: int = DEFAULT_SEQUENCE_WINDOW):
+        self.capacity = capacity
+        self._order: Deque[int] = deque()
+        self._seen: Set[int] = set()
+        self.last: Optional[int] = None
+
+    def add(self, sequence: int) -> bool:
+        """新しいシーケンス番号なら記録して True、受信済みなら False"""
+        if sequence in self._seen:
+            return False
+        if self.last is not None and sequence < self.last - self.capacity:
+            # 覚えている範囲より古い - 受信済みとみなす
+            return False
+        self._seen.add(sequence)
+        self._order.append(sequence)
+        if len(self._order) > self.capacity:
+            self._seen.discard(self._order.popleft())
+        if self.last is None or sequence > self.last:
+            self.last = sequence
+        return True
+
+
+class ClientSession:
+    """WebSocket接続をまたいで保持する、クライアント1つ分の状態"""
+
+    def __init__(self, websocket: "WebSocket", replay_size: int = DEFAULT_REPLAY_SIZE):
+        self.websocket: Optional["WebSocket"] = websocket
+        self.transcribe_service: Optional["TranscribeService"] = None
+        self.pipeline: Optional["ConnectionPipeline"] = None
+        self.token: Optional[str] = None
+        # 文字起こしストアのセッションID (session_token と違い、公開してよい識別子)
+        self.session_id: Optional[str] = None
+        self.store: Optional["TranscriptStore"] = None
+        # 購読者への配信 - チャンネルは session_ended を配信し終えるまで開いておく
+        self.hub: Optional["BroadcastHub"] = None
+        self.channel: Optional[str] = None
+        # start_session で合意した送信形式
+        self.protocol = PROTOCOL_JSON
+        self.decoder = AudioDecoder()
+        self.sequences = SequenceWindow()
+        self.replay = ReplayBuffer(replay_size)
+        self._send_lock = asyncio.Lock()
+
+    @property
+    def resumable(self) -> bool:
+        return self.token is not None
+
+    def begin(self, token: str, session_id: str, mode: str):
+        """新しいセッションを開始 - 前のセッションの再送・重複検出の状態は引き継がない"""
+        self.end()
+        self.token = token
+        self.session_id = session_id
+        self.sequences = SequenceWindow(self.sequences.capacity)
+        if self.store is not None:
+            self.store.start_session(session_id, mode)
+        if self.hub is not None:
+            self._close_channel()
+            self.channel = session_id
+            self.hub.open(session_id)
+
+    def end(self):
+        """セッション終了 - 再開できなくなる"""
+        if self.store is not None and self.session_id is not None:
+            self.store.end_session(self.session_id)
+        self.token = None
+        self.session_id = None
+
+    def store_final(self, message: Dict[str, Any], trace: Optional[Trace] = None):
+        """パイプラインの on_final - 確定した結果をストアへ追記"""
+        if self.store is not None and self.session_id is not None:
+            self.store.append(self.session_id, message, trace)
+
+    def publish(self, message_type: str, payload: str):
+        """パイプラインの publish - 購読者へ配信"""
+        if self.channel is None:
+            return
+        self.hub.publish(self.channel, message_type, payload)
+        if message_type == "session_ended":
+            self._close_channel()
+
+    def _close_channel(self):
+        if self.channel is not None:
+            self.hub.close(self.channel)
+            self.channel = None
+
+    def accept_sequence(self, sequence: Optional[int]) -> bool:
+        if sequence is None:
+            return True
+        if self.sequences.add(sequence):
+            return True
+        metrics.inc("transcribe_duplicate_frames_total")
+        return False
+
+    async def send(self, seq: int, payload: str):
+        """パイプラインのwriterから呼ばれる - 切断中もリングバッファには残す"""
+        async with self._send_lock:
+            self.replay.append(seq, payload)
+            if self.websocket is None:
+                return
+            try:
+                await self.websocket.send_text(payload)
+            except Exception as e:
+                logger.warning(f"❌ 送信エラー: {e}")
+                self.websocket = None
+
+    async def attach(self, websocket: "WebSocket", last_seq: int) -> Tuple[int, bool]:
+        """再接続したWebSocketに未受信のメッセージを再送してから切り替える"""
+        async with self._send_lock:
+            payloads, complete = self.replay.since(last_seq)
+            for payload in payloads:
+                await websocket.send_text(payload)
+            self.websocket = websocket
+        return len(payloads), complete
+
+    def detach(self):
+        self.websocket = None
+
+    async def close(self):
+        if self.pipeline is not None:
+            await self.pipeline.close()
+        if self.transcribe_service is not None:
+            await self.transcribe_service.cleanup()
+        self.end()
+        self._close_channel()
+
+
+class SessionRegistry:
+    """切断されたセッションを猶予時間のあいだ保持する"""
+
+    def __init__(self, grace_period: float = DEFAULT_GRACE_PERIOD):
+        self.grace_period = grace_period
+        self._parked: Dict[str, Tuple[ClientSession, asyncio.TimerHandle]] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self.resumed = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._parked)
+
+    def park(self, session: ClientSession):
+        session.detach()
+        handle = asyncio.get_running_loop().call_later(self.grace_period, self._expire, session.token)
+        self._parked[session.token] = (session, handle)
+        logger.info(f"⏸️ セッションを保持: 猶予 {self.grace_period:g}秒")
+
+    def resume(self, token: Optional[str]) -> Optional[ClientSession]:
+        entry = self._parked.pop(token, None) if token else None
+        if entry is None:
+            return None
+        session, handle = entry
+        handle.cancel()
+        self.resumed += 1
+        metrics.inc("transcribe_sessions_resumed_total")
+        return session
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"parked": len(self._parked), "resumed": self.resumed, "expired": self.expired}
+
+    async def close(self):
+        for session, handle in self._parked.values():
+            handle.cancel()
+            await session.close()
+        self._parked.clear()
+
+    def _expire(self, token: str):
+        entry = self._parked.pop(token, None)
+        if entry is None:
+            return
+        self.expired += 1
+        metrics.inc("transcribe_sessions_expired_total")
+        logger.info("⌛ 保持していたセッションの猶予時間が過ぎました")
+        task = asyncio.create_task(entry[0].close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
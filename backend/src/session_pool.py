@@ -0,0 +1,220 @@
+"""接続済みLiveセッションのプール
+
+プロセス全体で1つのバックエンドを共有し、接続済み・未使用のLiveセッションを
+一定数待機させておく。WebSocket接続や新しい発話は待機中のセッションを取得するため、
+アップストリームへの接続待ちがクリティカルパスから外れる。
+
+Liveセッションは会話の文脈を持ち越すため使い回さず、使用後は閉じて補充する。
+
+ストリーミングモードの接続は、接続している間ずっと1つのセッション (上限の1枠) を使う。
+上限に達している時は max_wait 秒まで空きを待ち、空かなければ AdmissionError。
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional
+
+from .admission import DEFAULT_MAX_WAIT, AdmissionError
+from .metrics import logger
+from .profiles import TranscriptionProfile
+from .upstream import LiveSession, TranscriptionBackend
+
+DEFAULT_MIN_SIZE = 1
+DEFAULT_MAX_SIZE = 8
+# Liveセッションの接続時間上限より十分短くする
+DEFAULT_MAX_AGE = 300.0
+DEFAULT_HEALTH_CHECK_INTERVAL = 5.0
+
+
+@dataclass
+class PooledSession:
+    session: LiveSession
+    exit_stack: AsyncExitStack
+    created_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.created_at
+
+    def is_alive(self) -> bool:
+        return self.session.is_alive()
+
+
+class LiveSessionPool:
+    def __init__(
+        self,
+        backend: TranscriptionBackend,
+        min_size: int = DEFAULT_MIN_SIZE,
+        max_size: int = DEFAULT_MAX_SIZE,
+        max_age: float = DEFAULT_MAX_AGE,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL,
+        profile: Optional[TranscriptionProfile] = None,
+        max_wait: float = DEFAULT_MAX_WAIT,
+    ):
+        if min_size > max_size:
+            raise ValueError("min_size は max_size 以下にしてください")
+        self.backend = backend
+        # 待機させるセッションのプロファイル (これ以外のプロファイルはプールを使わずに接続する)
+        self.profile = profile
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self.health_check_interval = health_check_interval
+        self.max_wait = max_wait
+
+        self._idle: Deque[PooledSession] = deque()
+        # 開いているセッション (待機中 + 使用中 + 接続中) の上限
+        self._slots = asyncio.Semaphore(max_size)
+        self._connecting = 0
+        self._in_use = 0
+        self._refill = asyncio.Event()
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self.connect_errors = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    async def start(self):
+        """最小数までセッションを接続し、保守タスクを起動"""
+        await self._fill()
+        self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def close(self):
+        """保守タスクを止め、待機中のセッションをすべて閉じる"""
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._maintenance_task = None
+        while self._idle:
+            await self._discard(self._idle.popleft())
+
+    async def acquire(self) -> PooledSession:
+        """待機中のセッションを取得 - なければ新規接続 (上限到達時は max_wait 秒まで空きを待つ)"""
+        started = time.perf_counter()
+        try:
+            while self._idle:
+                pooled = self._idle.popleft()
+                if self._healthy(pooled):
+                    self.hits += 1
+                    self._in_use += 1
+                    return pooled
+                self.evicted += 1
+                await self._discard(pooled)
+
+            self.misses += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise AdmissionError(f"{self.max_wait:g}秒以内にLiveセッションの空きがありませんでした") from None
+            try:
+                pooled = await self._connect()
+            except Exception:
+                self._slots.release()
+                raise
+            self._in_use += 1
+            return pooled
+        finally:
+            waited = time.perf_counter() - started
+            self.total_wait += waited
+            self.max_wait_seen = max(self.max_wait_seen, waited)
+            self._refill.set()
+
+    async def release(self, pooled: PooledSession):
+        """使用済みセッションを閉じて補充を促す"""
+        self._in_use -= 1
+        await self._discard(pooled)
+        self._refill.set()
+
+    @asynccontextmanager
+    async def session(self):
+        """async with で使えるセッション取得"""
+        pooled = await self.acquire()
+        try:
+            yield pooled.session
+        finally:
+            await self.release(pooled)
+
+    def metrics(self) -> Dict[str, Any]:
+        acquired = self.hits + self.misses
+        return {
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "connecting": self._connecting,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / acquired if acquired else 0.0,
+            "avg_wait_ms": self.total_wait / acquired * 1000 if acquired else 0.0,
+            "max_wait_ms": self.max_wait_seen * 1000,
+            "evicted": self.evicted,
+            "connect_errors": self.connect_errors,
+            "timeouts": self.timeouts,
+        }
+
+    def _healthy(self, pooled: PooledSession) -> bool:
+        return pooled.is_alive() and pooled.age < self.max_age
+
+    async def _connect(self) -> PooledSession:
+        self._connecting += 1
+        exit_stack = AsyncExitStack()
+        try:
+            session = await exit_stack.enter_async_context(self.backend.connect(self.profile))
+        except Exception:
+            self.connect_errors += 1
+            await exit_stack.aclose()
+            raise
+        finally:
+            self._connecting -= 1
+        pooled = PooledSession(session=session, exit_stack=exit_stack)
+        if session.opened_at is None:
+            # プールで待機していた時間もセッションの経過時間に含める
+            session.opened_at = pooled.created_at
+        return pooled
+
+    async def _discard(self, pooled: PooledSession):
+        try:
+            await pooled.exit_stack.aclose()
+        except Exception as e:
+            logger.error(f"❌ プールセッションのクローズエラー: {e}")
+        finally:
+            self._slots.release()
+
+    async def _fill(self):
+        """待機中のセッションを最小数まで補充 (上限に空きがある範囲で)"""
+        while len(self._idle) + self._connecting < self.min_size and not self._slots.locked():
+            await self._slots.acquire()
+            try:
+                pooled = await self._connect()
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"❌ プールセッションの接続エラー: {e}")
+                return
+            self._idle.append(pooled)
+
+    async def _maintain(self):
+        """ヘルスチェック・期限切れセッションの入れ替え・補充"""
+        while True:
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=self.health_check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refill.clear()
+
+            for pooled in list(self._idle):
+                if pooled in self._idle and not self._healthy(pooled):
+                    self._idle.remove(pooled)
+                    self.evicted += 1
+                    await self._discard(pooled)
+
+            await self._fill()
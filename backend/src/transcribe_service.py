@@ -1,117 +1,638 @@
 import asyncio
-import numpy as np
-from google import genai
-from google.genai import types
-from typing import Optional
-import io
+import time
+from collections import deque
+from typing import Deque, List, Optional, Callable, Awaitable, Set, Union
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from .admission import AdmissionError, UpstreamScheduler
+from .hedging import HedgePolicy, UpstreamClosedError, UpstreamTimeoutError
+from .metrics import Trace, logger, metrics
+from .profiles import DEFAULT_PROFILE, PROFILES, TranscriptionProfile
+from .session_pool import LiveSessionPool
+from .upstream import LiveSession, TranscriptionBackend
+
+
+class Utterance:
+    """1発話分の文字起こし - 部分結果が届くたびに revision が増える"""
+
+    __slots__ = ("utterance_id", "trace", "texts", "revision", "seam", "offset_ms", "notified")
+
+    def __init__(self, utterance_id: str, trace: Trace, offset_ms: Optional[float] = None):
+        self.utterance_id = utterance_id
+        self.trace = trace
+        # セッション開始からの音声の位置 (分かる場合のみ)
+        self.offset_ms = offset_ms
+        self.texts: List[str] = []
+        self.revision = 0
+        # セッション入れ替えで途中から引き継いだ場合の、前のセッション側の発話
+        self.seam: Optional["Utterance"] = None
+        # 部分結果をクライアントへ通知したか (通知した発話は空でも最終結果を返す)
+        self.notified = False
+
+    @property
+    def text(self) -> str:
+        text = " ".join(self.texts)
+        if self.seam is not None:
+            text = strip_seam(self.seam.text, text)
+        return text
+
+    def append(self, text: str):
+        self.texts.append(text)
+        self.revision += 1
+
+
+def strip_seam(previous: str, text: str) -> str:
+    """previous の末尾と重なっている text の先頭部分を取り除く (入れ替え時に重ねて送った音声の分)"""
+    limit = min(len(previous), len(text), SEAM_MAX_OVERLAP)
+    for size in range(limit, SEAM_MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+
+# 部分結果・最終結果の通知先
+UtteranceCallback = Callable[[Utterance], Awaitable[None]]
+
+# end_session 時に未完了ターンの結果を待つ最大秒数
+END_SESSION_FLUSH_TIMEOUT = 5.0
+
+# ストリーミングセッションの入れ替え
+# Liveセッションには接続時間の上限があるため、開いてから rotate_after 秒で次のセッションを
+# 裏で開いておき、発話の区切りで切り替える (0 で無効)。区切りが rotation_wait 秒来なければ
+# 発話の途中でも切り替え、直近 overlap_ms ミリ秒の音声を新しいセッションにも送る。
+DEFAULT_ROTATE_AFTER = 480.0
+DEFAULT_ROTATION_WAIT = 30.0
+DEFAULT_ROTATION_OVERLAP_MS = 1000
+# 次のセッションを開けなかった場合に再試行するまでの秒数
+ROTATION_RETRY_INTERVAL = 5.0
+# 継ぎ目で重複を探す文字数の範囲 (2〜3文字の繰り返しは日本語では珍しくないため、それより長い一致のみ)
+SEAM_MIN_OVERLAP = 4
+SEAM_MAX_OVERLAP = 200
+
+
+class LiveStream:
+    """ストリーミングモードで開いている Liveセッション1つと、その応答待ちの発話"""
+
+    def __init__(self, service: "TranscribeService", session: LiveSession, exit_stack: AsyncExitStack):
+        self.service = service
+        self.session = session
+        self.exit_stack = exit_stack
+        self.opened_at = session.opened_at or time.monotonic()
+        # セッション入れ替えで引き継いだストリームか (入れ替え直後の遅延の計測用)
+        self.rotated = False
+        # end_utterance 済みで応答待ちの発話と、まだターンに区切られていない発話
+        self.pending: Deque[Utterance] = deque()
+        self.current: Optional[Utterance] = None
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.receive_task = asyncio.create_task(self._receive_loop())
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.opened_at
+
+    @property
+    def is_alive(self) -> bool:
+        """アップストリームがセッションを閉じていないか"""
+        return not self.receive_task.done() and self.session.is_alive()
+
+    def abandon(self) -> List[Utterance]:
+        """閉じたセッションの応答待ちの発話をすべて取り出す"""
+        utterances = list(self.pending)
+        if self.current is not None:
+            utterances.append(self.current)
+        self.pending.clear()
+        self.current = None
+        self.idle.set()
+        return utterances
+
+    async def send_audio(self, audio_data: Union[bytes, memoryview], received_at: Optional[float] = None,
+                         offset_ms: Optional[float] = None):
+        if self.current is None:
+            self.current = self.service.new_utterance(received_at, offset_ms)
+        utterance = self.current
+        self.idle.clear()
+        await self.session.send_audio(audio_data)
+        utterance.trace.mark("first_byte_sent")
+
+    async def end_utterance(self):
+        if self.current is not None:
+            self.pending.append(self.current)
+            self.current = None
+        await self.session.end_audio_stream()
+
+    async def drain(self, timeout: float = END_SESSION_FLUSH_TIMEOUT):
+        """未完了のターンがあれば結果を待つ"""
+        try:
+            if self.current is not None:
+                await self.end_utterance()
+            if not self.idle.is_set():
+                await asyncio.wait_for(self.idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("transcribe_timeouts_total")
+            logger.warning("⏰ 最終結果の待機がタイムアウトしました")
+        except Exception as e:
+            logger.error(f"❌ セッション終了処理エラー: {e}")
+
+    async def close(self):
+        self.receive_task.cancel()
+        try:
+            await self.receive_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        try:
+            await self.exit_stack.aclose()
+        except Exception as e:
+            logger.error(f"❌ セッションクローズエラー: {e}")
+
+    def _active_utterance(self) -> Utterance:
+        """応答中のターンに対応する発話"""
+        if self.pending:
+            return self.pending[0]
+        if self.current is None:
+            self.current = self.service.new_utterance()
+        return self.current
+
+    def _turn_completed(self) -> Utterance:
+        if self.pending:
+            utterance = self.pending.popleft()
+        else:
+            # アップストリームの発話検出で区切られたターン
+            utterance = self._active_utterance()
+            self.current = None
+        if not self.pending and self.current is None:
+            self.idle.set()
+        return utterance
+
+    async def _receive_loop(self):
+        """Liveセッションの応答を受信し続け、部分結果とターン完了ごとの最終結果を通知"""
+        service = self.service
+        try:
+            while True:
+                received = False
+                # receive() は1ターン分の応答を返すと終了するため繰り返し呼び出す
+                async for response in self.session.receive():
+                    received = True
+                    if response.text is not None:
+                        text = response.text.strip()
+                        if text:
+                            await service._add_partial(self._active_utterance(), text)
+
+                    if response.turn_complete:
+                        await service._finish_utterance(self, self._turn_completed())
+
+                if not received:
+                    logger.info("🔚 Liveセッションが閉じられました")
+                    break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics.inc("transcribe_errors_total")
+            logger.error(f"❌ 受信ループエラー: {e}")
+        finally:
+            self.idle.set()
+
 
 class TranscribeService:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.client = genai.Client(api_key=api_key)
-        self.session = None
-        self.model = "gemini-2.0-flash-live-001"
-        
-        self.system_instruction = """
-        あなたは正確な音声文字起こしシステムです。聞こえた音声を正確に文字起こししてください。
-        会話や応答は不要で、聞こえた内容を書き起こすだけです。
-        ただし、えー、あのー、などのフィラー音は削除して回答してください。
-        重複や冗長な表現があれば自然な日本語に修正してください。
+    def __init__(self, backend: TranscriptionBackend, on_result: Optional[UtteranceCallback] = None,
+                 pool: Optional[LiveSessionPool] = None, on_partial: Optional[UtteranceCallback] = None,
+                 scheduler: Optional[UpstreamScheduler] = None,
+                 rotate_after: float = DEFAULT_ROTATE_AFTER, rotation_wait: float = DEFAULT_ROTATION_WAIT,
+                 rotation_overlap_ms: int = DEFAULT_ROTATION_OVERLAP_MS, hedging: Optional[HedgePolicy] = None,
+                 profile: Optional[TranscriptionProfile] = None):
+        self.backend = backend
+        self.pool = pool
+        # 開くLiveセッションのプロファイル (start_session で切り替えられる)
+        self.profile = profile or PROFILES[DEFAULT_PROFILE]
+        self.scheduler = scheduler
+        # チャンクモードの応答期限とヘッジ (プロセス全体で共有する場合は外から渡す)
+        self.hedging = hedging or HedgePolicy()
+        self.on_result = on_result
+        self.on_partial = on_partial
+        # ストリーミングモードで使用中のセッション
+        self._stream: Optional[LiveStream] = None
+        # 発話ごとのIDとトレース (trace_prefix が指定された場合のみトレースIDを付ける)
+        self.trace_prefix: Optional[str] = None
+        self._utterance_count = 0
+
+        # セッションの入れ替え: 裏で開いた次のセッションと、結果を待って閉じる前のセッション
+        self.rotate_after = rotate_after
+        self.rotation_wait = rotation_wait
+        self._standby: Optional[LiveStream] = None
+        self._standby_task: Optional[asyncio.Task] = None
+        self._standby_ready_at = 0.0
+        self._rotation_retry_at = 0.0
+        self._retiring: Set[asyncio.Task] = set()
+        # 発話途中で切り替える時に新しいセッションにも送る、直近の音声
+        self._overlap_bytes = rotation_overlap_ms * 16000 * 2 // 1000
+        self._recent_audio: Deque[memoryview] = deque()
+        self._recent_bytes = 0
+
+    @asynccontextmanager
+    async def _connect(self, reserved: bool = False):
+        """Liveセッションを開くコンテキストマネージャ - プールがあれば接続済みのものを使う
+
+        スケジューラーがあれば、先にアップストリームの処理枠を確保する (AdmissionError)。
+        reserved=True (ストリーミングセッションの入れ替え・開き直し) は予約枠を使い、
+        プールの枠も使わずに直接接続する (裏で開くので接続待ちは問題にならない)。
         """
-        
-        self.config = {
-            "response_modalities": ["TEXT"],
-            "system_instruction": types.Content(
-                parts=[types.Part(text=self.system_instruction)],
-            ),
-            "realtime_input_config": {
-                "automatic_activity_detection": {
-                    "disabled": False,
-                    "start_of_speech_sensitivity": types.StartSensitivity.START_SENSITIVITY_HIGH,
-                    "end_of_speech_sensitivity": types.EndSensitivity.END_SENSITIVITY_LOW,
-                    "silence_duration_ms": 1500,
-                    "prefix_padding_ms": 300,
-                }
-            }
-        }
-
-    async def start_session(self):
-        """転写セッション開始 - 実際の処理は transcribe_audio_chunk で行う"""
-        print("📢 文字起こしサービス準備完了")
+        async with AsyncExitStack() as stack:
+            if self.scheduler is not None:
+                await stack.enter_async_context(self.scheduler.slot(self, self.backend.quota_key, reserved))
+            if self.pool is not None and self.pool.profile == self.profile and not reserved:
+                session = await stack.enter_async_context(self.pool.session())
+            else:
+                session = await stack.enter_async_context(self.backend.connect(self.profile))
+            yield session
+
+    def new_utterance(self, started: Optional[float] = None, offset_ms: Optional[float] = None) -> Utterance:
+        """発話1つ分のIDとトレースを作成"""
+        self._utterance_count += 1
+        if self.trace_prefix:
+            utterance_id = f"{self.trace_prefix}-{self._utterance_count}"
+            trace = Trace(utterance_id, started)
+        else:
+            utterance_id = f"u{self._utterance_count}"
+            trace = Trace(None, started)
+        return Utterance(utterance_id, trace, offset_ms)
+
+    async def _add_partial(self, utterance: Utterance, text: str):
+        """部分結果を発話に追加し、すぐに通知する"""
+        utterance.append(text)
+        utterance.trace.mark("first_partial")
+        metrics.inc("transcribe_partials_total")
+        # 継ぎ目の重複を除いて空になった部分結果は通知しない
+        if self.on_partial is not None and utterance.text:
+            utterance.notified = True
+            await self.on_partial(utterance)
+
+    async def _finish_utterance(self, stream: LiveStream, utterance: Utterance):
+        utterance.trace.mark("turn_complete")
+        metrics.inc("transcribe_utterances_total")
+        if stream.rotated:
+            # 入れ替え後の最初の発話 - 入れ替えによる遅延の増加を見るため別に記録
+            stream.rotated = False
+            first_partial = utterance.trace.marks.get("first_partial")
+            if first_partial is not None:
+                metrics.observe("transcribe_rotation_first_partial_ms", first_partial)
+        # 継ぎ目の重複を除いて空になっても、部分結果を通知済みなら最終結果で閉じる
+        if (utterance.text or utterance.notified) and self.on_result:
+            await self.on_result(utterance)
+
+    @property
+    def is_streaming(self) -> bool:
+        """ストリーミングモードのLiveセッションが開いているか"""
+        return self._stream is not None
+
+    async def start_session(self, streaming: bool = False, trace_id: Optional[str] = None,
+                            profile: Optional[TranscriptionProfile] = None):
+        """転写セッション開始
+
+        streaming=False の場合は従来通り transcribe_audio_chunk でチャンクごとに処理する。
+        streaming=True の場合は接続ごとに1つのLiveセッションを開いたまま維持し、
+        ターンの区切りはサーバー側の音声区間検出 (silence_duration_ms / prefix_padding_ms) に任せる。
+        セッションは rotate_after 秒ごとに新しいものへ入れ替える。
+        trace_id を指定すると、結果メッセージに発話ごとのトレースIDと段階別の所要時間を付ける。
+        profile を指定すると、以降に開くLiveセッションをそのプロファイルの設定にする。
+        """
+        self.trace_prefix = trace_id
+        self._utterance_count = 0
+        if profile is not None and profile != self.profile:
+            if self._stream is not None:
+                # 開いているセッションは前のプロファイルの設定のまま - 閉じて開き直す
+                await self.end_session()
+            self.profile = profile
+
+        if not streaming:
+            if self._stream is not None:
+                # ストリーミングからチャンクモードへの切り替え - 開いているLiveセッションを閉じる
+                await self.end_session()
+            logger.info("📢 文字起こしサービス準備完了")
+            return True
+
+        if self._stream is not None:
+            return True
+
+        self._stream = await self._open_stream()
+        self._rotation_retry_at = 0.0
+        logger.info(f"📢 Liveセッション開始 (ストリーミング, {self.backend.name}, {self.profile.name})")
         return True
 
-    async def transcribe_audio_chunk(self, audio_data: bytes) -> Optional[str]:
-        """音声チャンクを文字起こし - 元のtranscribe.pyパターンを使用"""
-        
+    async def _open_stream(self, reserved: bool = False) -> LiveStream:
+        started = time.perf_counter()
+        exit_stack = AsyncExitStack()
         try:
-            print(f"🎤 音声データ受信: {len(audio_data)} bytes")
-            
-            # 新しいセッションで処理（元のパターン）
-            async with self.client.aio.live.connect(model=self.model, config=self.config) as session:
-                print("📢 Gemini Live APIセッション開始")
-                
-                # 音声データを送信
-                await session.send_realtime_input(
-                    audio=types.Blob(
-                        data=audio_data,
-                        mime_type="audio/pcm;rate=16000"
-                    )
-                )
-                print("📤 音声データ送信完了")
-                
-                # 音声ストリーム終了を通知
-                await session.send_realtime_input(audio_stream_end=True)
-                print("🔚 音声ストリーム終了通知")
-                
-                # 転写結果を待機
-                print("⏳ 転写結果待機（最大10秒）...")
-                all_responses = []
-                
-                try:
-                    # asyncio.wait_forでタイムアウトを確実に制御
-                    async def collect_responses():
-                        async for response in session.receive():
-                            print(f"📨 レスポンス受信: {type(response)}")
-                            
-                            if response.text is not None:
-                                text = response.text.strip()
-                                if text:
-                                    all_responses.append(text)
-                                    print(f"📝 部分結果: {text}")
-                            
-                            # サーバーコンテンツをチェック
-                            if hasattr(response, 'server_content') and response.server_content:
-                                print(f"🔍 サーバーコンテンツ: {response.server_content}")
-                                if hasattr(response.server_content, 'turn_complete') and response.server_content.turn_complete:
-                                    print("✅ 文字起こし完了")
-                                    break
-                    
-                    await asyncio.wait_for(collect_responses(), timeout=10.0)
-                    
-                except asyncio.TimeoutError:
-                    print("⏰ 10秒でタイムアウト - 強制終了")
-                except Exception as e:
-                    print(f"❌ レスポンス処理エラー: {e}")
-                
-                # 最終結果を返す
-                if all_responses:
-                    final_result = " ".join(all_responses)
-                    print(f"📄 最終文字起こし結果: '{final_result}'")
-                    return final_result
-                else:
-                    print("❌ 文字起こし結果が取得できませんでした")
-                    return None
-                    
+            session = await exit_stack.enter_async_context(self._connect(reserved))
+        except BaseException:
+            metrics.inc("transcribe_errors_total")
+            await exit_stack.aclose()
+            raise
+        metrics.observe("transcribe_upstream_connect_ms", (time.perf_counter() - started) * 1000)
+        return LiveStream(self, session, exit_stack)
+
+    async def send_audio(self, audio_data: Union[bytes, memoryview], received_at: Optional[float] = None,
+                         offset_ms: Optional[float] = None):
+        """ストリーミングセッションへ音声フレームをそのまま転送"""
+        stream = self._stream
+        if stream is None:
+            raise RuntimeError("ストリーミングセッションが開始されていません")
+        if not stream.is_alive:
+            stream = await self._reopen(stream)
+
+        self._prepare_rotation(stream)
+        if self._standby is not None:
+            if stream.current is None:
+                # 直前のターンが区切られている - 次の発話から新しいセッションへ
+                stream = await self._rotate()
+            elif time.monotonic() - self._standby_ready_at >= self.rotation_wait:
+                stream = await self._rotate(forced=True)
+
+        try:
+            await stream.send_audio(audio_data, received_at, offset_ms)
+        except Exception:
+            if stream.is_alive:
+                raise
+            # 送信中に閉じられた - 開き直して同じフレームを送る
+            stream = await self._reopen(stream)
+            await stream.send_audio(audio_data, received_at, offset_ms)
+        view = memoryview(audio_data)
+        metrics.inc("transcribe_upstream_sends_total")
+        metrics.inc("transcribe_upstream_bytes_sent_total", view.nbytes)
+        if self._overlap_bytes:
+            self._remember(view)
+
+    async def end_utterance(self):
+        """発話の終了をLiveセッションへ通知し、溜まっている音声の文字起こしを促す"""
+        stream = self._stream
+        if stream is None:
+            return
+        if not stream.is_alive:
+            # 区切る発話は閉じたセッションとともに確定済み - 次の発話用に開き直しておく
+            await self._reopen(stream)
+            return
+        await stream.end_utterance()
+        self._recent_audio.clear()
+        self._recent_bytes = 0
+        if self._standby is not None:
+            await self._rotate()
+
+    def _remember(self, view: memoryview):
+        """直近 overlap_ms ぶんの音声を残す (コピーせずビューのまま)"""
+        self._recent_audio.append(view)
+        self._recent_bytes += view.nbytes
+        while self._recent_bytes - self._recent_audio[0].nbytes >= self._overlap_bytes:
+            self._recent_bytes -= self._recent_audio.popleft().nbytes
+
+    def _prepare_rotation(self, stream: LiveStream):
+        """使用中のセッションが入れ替え時期なら、次のセッションを裏で開き始める"""
+        if (
+            self.rotate_after <= 0
+            or self._standby is not None
+            or self._standby_task is not None
+            or stream.age < self.rotate_after
+            or time.monotonic() < self._rotation_retry_at
+        ):
+            return
+        self._standby_task = asyncio.create_task(self._open_standby())
+
+    async def _open_standby(self):
+        started = time.perf_counter()
+        try:
+            standby = await self._open_stream(reserved=True)
+        except AdmissionError as e:
+            # 予約枠も埋まっている - 使用中のセッションを使い続け、しばらくしてから再試行する
+            metrics.inc("transcribe_rotation_deferred_total")
+            logger.warning(f"⚠️ 処理枠に空きがないためLiveセッションの入れ替えを延期します: {e}")
+            self._rotation_retry_at = time.monotonic() + ROTATION_RETRY_INTERVAL
+            return
         except Exception as e:
-            print(f"❌ 文字起こしエラー: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            # 使用中のセッションはそのまま使い続け、しばらくしてから再試行する
+            metrics.inc("transcribe_rotation_failures_total")
+            logger.warning(f"⚠️ 次のLiveセッションを開けませんでした: {e}")
+            self._rotation_retry_at = time.monotonic() + ROTATION_RETRY_INTERVAL
+            return
+        finally:
+            self._standby_task = None
+        metrics.observe("transcribe_rotation_prepare_ms", (time.perf_counter() - started) * 1000)
+
+        if self._stream is None:
+            await standby.close()
+            return
+        self._standby = standby
+        self._standby_ready_at = time.monotonic()
+
+    async def _rotate(self, forced: bool = False) -> LiveStream:
+        """次のセッションへ切り替え、前のセッションは残りの結果を待ってから閉じる"""
+        old, new = self._stream, self._standby
+        self._stream, self._standby = new, None
+        new.rotated = True
+        metrics.inc("transcribe_rotations_total")
+        metrics.observe("transcribe_rotation_wait_ms", (time.monotonic() - self._standby_ready_at) * 1000)
+
+        if forced:
+            metrics.inc("transcribe_rotations_forced_total")
+            cut = old.current
+            if cut is not None and self._recent_audio:
+                # 直近の音声を重ねて送り、重複した文字は継ぎ目で取り除く
+                new.current = self.new_utterance()
+                new.current.seam = cut
+                for view in self._recent_audio:
+                    await new.send_audio(view)
+            await old.end_utterance()
+
+        logger.info(f"🔄 Liveセッションを入れ替え ({old.age:.0f}秒経過{', 発話途中' if forced else ''})")
+        task = asyncio.create_task(self._retire(old))
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+        return new
+
+    async def _reopen(self, stream: LiveStream) -> LiveStream:
+        """アップストリームが閉じたセッションを新しいセッションに置き換える
+
+        応答待ちだった発話はそれまでに届いた部分結果で確定させる (閉じたセッションに送った音声は
+        再送しない)。入れ替え用のセッションが開いていればそれを使い、なければ予約枠で開き直す。
+        開けなかった場合は例外を送出し、次の送信で再試行する。
+        """
+        metrics.inc("transcribe_upstream_reopens_total")
+        logger.warning(f"⚠️ Liveセッションが閉じられたため開き直します ({stream.age:.0f}秒経過)")
+        for utterance in stream.abandon():
+            await self._finish_utterance(stream, utterance)
+        await stream.close()
+        self._recent_audio.clear()
+        self._recent_bytes = 0
+
+        if self._standby is not None:
+            new, self._standby = self._standby, None
+        else:
+            new = await self._open_stream(reserved=True)
+        self._stream = new
+        return new
+
+    async def _retire(self, stream: LiveStream):
+        started = time.perf_counter()
+        await stream.drain()
+        metrics.observe("transcribe_rotation_drain_ms", (time.perf_counter() - started) * 1000)
+        await stream.close()
+
+    async def transcribe_audio_chunk(self, audio_data: bytes, utterance: Optional[Utterance] = None) -> Optional[str]:
+        """音声チャンクを文字起こし - 元のtranscribe.pyパターンを使用
+
+        部分結果は届くたびに on_partial へ通知し、最終結果を返す。
+        最初の部分結果が hedging.hedge_delay() 秒で届かなければ別のセッションにも同じ音声を送り、
+        先に応答した方を使う。hedging.timeout() 秒でどちらも応答しなければ UpstreamTimeoutError。
+        """
+        if utterance is None:
+            utterance = self.new_utterance()
+        trace = utterance.trace
+        policy = self.hedging
+        policy.record_request()
+        logger.debug(f"🎤 音声データ受信: {len(audio_data)} bytes")
+
+        started = time.perf_counter()
+        timeout = policy.timeout()
+        answered = asyncio.Event()
+        tasks: List[asyncio.Task] = []
+        winner: List[asyncio.Task] = []
+
+        def claim() -> bool:
+            """最初に応答したセッションを採用し、もう一方を取り消す"""
+            task = asyncio.current_task()
+            if not winner:
+                winner.append(task)
+                answered.set()
+                # ヘッジが応答した場合もリクエストの開始から測る
+                elapsed = time.perf_counter() - started
+                policy.observe_first_token(elapsed)
+                metrics.observe("transcribe_first_token_ms", elapsed * 1000)
+                for other in tasks:
+                    if other is not task:
+                        other.cancel()
+            return winner[0] is task
+
+        async def attempt():
+            # プールの接続済みセッション、またはチャンクごとの新しいセッションで処理
+            async with self._connect() as session:
+                trace.mark("upstream_connect")
+                await session.send_audio(audio_data)
+                trace.mark("first_byte_sent")
+                metrics.inc("transcribe_upstream_bytes_sent_total", len(audio_data))
+                # 音声ストリーム終了を通知
+                await session.end_audio_stream()
+
+                async for response in session.receive():
+                    if response.text is not None:
+                        text = response.text.strip()
+                        if text:
+                            if not claim():
+                                return
+                            await self._add_partial(utterance, text)
+                            logger.debug(f"📝 部分結果: {text}")
+
+                    if response.turn_complete:
+                        if claim():
+                            trace.mark("turn_complete")
+                        return
+
+                if not winner:
+                    # 何も返さずに終わった - 失敗として扱い、ヘッジできるようにする
+                    raise UpstreamClosedError("アップストリームが応答せずに終了しました")
+
+        tasks.append(asyncio.create_task(attempt()))
+        try:
+            if not await self._wait_answer(answered, tasks, policy.hedge_delay()):
+                # 応答が遅い (または失敗した) - 予算があれば別のセッションにも送る
+                if policy.allow_hedge(self.scheduler):
+                    metrics.inc("transcribe_hedges_total")
+                    logger.debug("🪁 応答が遅いため別のセッションにも送信します")
+                    tasks.append(asyncio.create_task(attempt()))
+                remaining = timeout - (time.perf_counter() - started)
+                await self._wait_answer(answered, tasks, remaining)
+
+            if not answered.is_set():
+                failed = [task for task in tasks if task.done() and not task.cancelled() and task.exception()]
+                if len(failed) == len(tasks):
+                    # すべて失敗した - 最初のエラーを返す (AdmissionError はそのまま過負荷として扱われる)
+                    raise failed[0].exception()
+                policy.observe_timeout(timeout)
+                metrics.inc("transcribe_timeouts_total")
+                logger.warning(f"⏰ {timeout:.1f}秒以内に応答がありませんでした")
+                raise UpstreamTimeoutError(f"{timeout:.1f}秒以内に文字起こしの応答がありませんでした")
+
+            if len(tasks) > 1 and winner[0] is tasks[1]:
+                policy.hedge_wins += 1
+                metrics.inc("transcribe_hedge_wins_total")
+
+            # 採用したセッションの残りの応答を待つ
+            remaining = policy.max_timeout - (time.perf_counter() - started)
+            try:
+                await asyncio.wait_for(asyncio.shield(winner[0]), timeout=max(remaining, 0))
+            except asyncio.TimeoutError:
+                metrics.inc("transcribe_timeouts_total")
+                logger.warning(f"⏰ {policy.max_timeout:g}秒でタイムアウト - 途中までの結果を返します")
+            except Exception as e:
+                metrics.inc("transcribe_errors_total")
+                logger.error(f"❌ レスポンス処理エラー: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        metrics.inc("transcribe_utterances_total")
+        # 最終結果を返す
+        if utterance.texts:
+            final_result = utterance.text
+            logger.debug(f"📄 最終文字起こし結果: '{final_result}'")
+            return final_result
+        logger.debug("❌ 文字起こし結果が取得できませんでした")
+        return None
+
+    @staticmethod
+    async def _wait_answer(answered: asyncio.Event, tasks: List[asyncio.Task], timeout: float) -> bool:
+        """どれかのセッションが応答するか、すべて終了するか、timeout 秒が過ぎるまで待つ"""
+        if answered.is_set():
+            return True
+        pending = [task for task in tasks if not task.done()]
+        if pending and timeout > 0:
+            deadline = time.perf_counter() + timeout
+            waiter = asyncio.ensure_future(answered.wait())
+            try:
+                # 1つが失敗しても、まだ応答を待っている方があれば期限まで待ち続ける
+                while not answered.is_set() and pending:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    await asyncio.wait([waiter, *pending], timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                    pending = [task for task in pending if not task.done()]
+            finally:
+                waiter.cancel()
+        return answered.is_set()
 
     async def end_session(self):
-        """文字起こしセッション終了"""
-        print("🔚 文字起こしサービス終了")
+        """文字起こしセッション終了 - 未完了のターンがあれば結果を待ってから閉じる"""
+        stream = self._stream
+        if stream is not None:
+            await stream.drain()
+            self._stream = None
+            await stream.close()
+
+        if self._standby_task is not None:
+            self._standby_task.cancel()
+            try:
+                await self._standby_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._standby_task = None
+        if self._standby is not None:
+            await self._standby.close()
+            self._standby = None
+        # 入れ替え前のセッションの結果も待つ
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+        self._recent_audio.clear()
+        self._recent_bytes = 0
+
+        logger.info("🔚 文字起こしサービス終了")
 
     async def cleanup(self):
         """リソースクリーンアップ"""
-        await self.end_session()
\ No newline at end of file
+        await self.end_session()
@@ -0,0 +1,287 @@
+"""文字起こし結果の永続化 (SQLite)
+
+確定した発話 (transcription_final) をセッションごとに追記していく。
+
+- 書き込みはイベントループから呼ぶ append / start_session / end_session がキューに積むだけで、
+  専用のライタースレッドが溜まっている分をまとめて1トランザクションでコミットする
+- WAL モードなので、HTTP API の読み出しは書き込みを待たずに別の接続から行える
+- キューが満杯の場合はその行を捨てて transcribe_store_dropped_total を数える
+  (ストアの遅れで文字起こしを止めない)
+- テキスト検索は FTS5 の trigram トークナイザ (分かち書きのない日本語の部分一致) を使い、
+  使えない SQLite や3文字未満の検索語では LIKE で探す
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .metrics import Trace, logger, metrics
+
+DEFAULT_BATCH_SIZE = 512
+DEFAULT_MAX_PENDING = 100_000
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_SEARCH_LIMIT = 50
+TRIGRAM_MIN_LENGTH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    mode TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL
+);
+CREATE TABLE IF NOT EXISTS utterances (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    utterance_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    offset_ms REAL,
+    trace_id TEXT,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS utterances_session ON utterances (session_id, id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS utterances_fts USING fts5(
+    text, content='utterances', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS utterances_fts_insert AFTER INSERT ON utterances BEGIN
+    INSERT INTO utterances_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+INSERT_UTTERANCE = (
+    "INSERT INTO utterances (session_id, utterance_id, text, created_at, offset_ms, trace_id, timings) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+INSERT_SESSION = "INSERT OR IGNORE INTO sessions (session_id, mode, started_at) VALUES (?, ?, ?)"
+END_SESSION = "UPDATE sessions SET ended_at = ? WHERE session_id = ?"
+
+UTTERANCE_COLUMNS = "id, session_id, utterance_id, text, created_at, offset_ms, trace_id, timings"
+
+# キューに積む操作の種類
+_UTTERANCE, _SESSION, _END = range(3)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL では NORMAL でもコミット済みのデータは壊れない (電源断時に直近のコミットが失われうるだけ)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def _page_limit(limit: int) -> int:
+    """1〜DEFAULT_PAGE_SIZE に収める (SQLite は負の LIMIT を無制限として扱う)"""
+    return max(1, min(limit, DEFAULT_PAGE_SIZE))
+
+
+def _utterance_dict(row: Tuple) -> Dict[str, Any]:
+    id_, session_id, utterance_id, text, created_at, offset_ms, trace_id, timings = row
+    record = {
+        "id": id_,
+        "session_id": session_id,
+        "utterance_id": utterance_id,
+        "text": text,
+        "created_at": created_at,
+        "offset_ms": offset_ms,
+    }
+    if trace_id is not None:
+        record["trace_id"] = trace_id
+    if timings:
+        record["timings_ms"] = json.loads(timings)
+    return record
+
+
+class TranscriptStore:
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE, max_pending: int = DEFAULT_MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue(max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+        self.fts = False
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+
+    def start(self):
+        """スキーマを作成し、ライタースレッドを起動"""
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = _connect(self.path)
+        try:
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"⚠️ FTS5 (trigram) が使えないため検索は LIKE で行います: {e}")
+            conn.commit()
+        finally:
+            conn.close()
+        self._thread = threading.Thread(target=self._run, name="transcript-store", daemon=True)
+        self._thread.start()
+        logger.info(f"💾 文字起こしストア: {self.path}")
+
+    def close(self, timeout: float = 10.0):
+        """残りを書き込んでからライタースレッドを止める (ブロックするのでスレッドから呼ぶ)"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # --- 書き込み (イベントループから呼ばれる - キューに積むだけ) ---
+
+    def start_session(self, session_id: str, mode: str):
+        self._put((_SESSION, (session_id, mode, time.time())))
+
+    def end_session(self, session_id: str):
+        self._put((_END, (time.time(), session_id)))
+
+    def append(self, session_id: str, message: Dict[str, Any], trace: Optional[Trace] = None):
+        """transcription_final メッセージ1件を追記"""
+        timings = trace.timings() if trace is not None else None
+        trace_id = trace.trace_id if trace is not None else None
+        row = (
+            session_id,
+            message["utterance_id"],
+            message["text"],
+            time.time(),
+            message.get("offset_ms"),
+            trace_id,
+            json.dumps(timings) if timings else None,
+        )
+        self._put((_UTTERANCE, row))
+
+    def _put(self, item: Tuple):
+        try:
+            self._queue.put_nowait(item + (time.perf_counter(),))
+        except queue.Full:
+            self.dropped += 1
+            metrics.inc("transcribe_store_dropped_total")
+
+    # --- ライタースレッド ---
+
+    def _run(self):
+        conn = _connect(self.path)
+        try:
+            while True:
+                item = self._queue.get()
+                stop = item is None
+                batch = [] if stop else [item]
+                # 溜まっている分をまとめて1トランザクションで書く
+                while not stop and len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                    else:
+                        batch.append(item)
+                if batch:
+                    self._write(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Tuple]):
+        sessions = [row for kind, row, _ in batch if kind == _SESSION]
+        utterances = [row for kind, row, _ in batch if kind == _UTTERANCE]
+        ends = [row for kind, row, _ in batch if kind == _END]
+        try:
+            with conn:
+                # セッション開始 → 発話 → 終了の順 (同じバッチ内でも整合するように)
+                if sessions:
+                    conn.executemany(INSERT_SESSION, sessions)
+                if utterances:
+                    conn.executemany(INSERT_UTTERANCE, utterances)
+                if ends:
+                    conn.executemany(END_SESSION, ends)
+        except sqlite3.Error as e:
+            metrics.inc("transcribe_store_errors_total")
+            logger.error(f"❌ 文字起こしストアの書き込みエラー: {e}")
+            return
+
+        now = time.perf_counter()
+        self.written += len(utterances)
+        self.batches += 1
+        metrics.inc("transcribe_store_writes_total", len(utterances))
+        metrics.observe("transcribe_store_batch_size", len(batch))
+        # キューに積んでからコミットされるまで
+        metrics.observe("transcribe_store_commit_ms", (now - batch[0][2]) * 1000)
+
+    # --- 読み出し (スレッドごとの接続 - asyncio.to_thread から呼ぶ) ---
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def get_session(self, session_id: str, after_id: int = 0,
+                    limit: int = DEFAULT_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """セッションの発話を id 順に返す (after_id より後を最大 limit 件)"""
+        conn = self._reader()
+        session = conn.execute(
+            "SELECT mode, started_at, ended_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if session is None:
+            return None
+        rows = conn.execute(
+            f"SELECT {UTTERANCE_COLUMNS} FROM utterances WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?",
+            (session_id, after_id, _page_limit(limit)),
+        ).fetchall()
+        mode, started_at, ended_at = session
+        return {
+            "session_id": session_id,
+            "mode": mode,
+            "started_at": started_at,
+            "ended_at": ended_at,
+            "utterances": [_utterance_dict(row) for row in rows],
+        }
+
+    def search(self, text: str, session_id: Optional[str] = None,
+               limit: int = DEFAULT_SEARCH_LIMIT) -> List[Dict[str, Any]]:
+        """セッションをまたいでテキストを部分一致で検索 (新しい順)"""
+        conn = self._reader()
+        where, params = [], []
+        if self.fts and len(text) >= TRIGRAM_MIN_LENGTH:
+            # フレーズとして検索 (検索語の " は重ねてエスケープ)
+            where.append("id IN (SELECT rowid FROM utterances_fts WHERE utterances_fts MATCH ?)")
+            params.append('"' + text.replace('"', '""') + '"')
+        else:
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("text LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+        if session_id is not None:
+            where.append("session_id = ?")
+            params.append(session_id)
+        rows = conn.execute(
+            f"SELECT {UTTERANCE_COLUMNS} FROM utterances WHERE {' AND '.join(where)} ORDER BY id DESC LIMIT ?",
+            (*params, _page_limit(limit)),
+        ).fetchall()
+        return [_utterance_dict(row) for row in rows]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "fts": self.fts,
+        }
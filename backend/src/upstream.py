@@ -0,0 +1,82 @@
+"""文字起こしアップストリームの抽象インターフェース
+
+TranscribeService と ConnectionManager はこのインターフェースだけに依存する。
+実装は Gemini Live API (gemini_backend.py) と、オフライン用の偽Liveサーバー
+(fake_backend.py) があり、TRANSCRIPTION_BACKEND 環境変数で切り替える。
+
+ストリーミングの約束事は Live API と同じ:
+
+- send_audio で音声を送り続ける
+- サーバー側の発話検出、または end_audio_stream でターンが区切られる
+- receive() は1ターン分の応答を返し、turn_complete の応答で終了する
+"""
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncContextManager, AsyncIterator, Optional, Union
+
+from .profiles import TranscriptionProfile
+
+BACKEND_GEMINI = "gemini"
+BACKEND_FAKE = "fake"
+
+
+class BackendConfigError(ValueError):
+    """バックエンドの設定不足 (APIキー未設定など)"""
+
+
+@dataclass
+class LiveResponse:
+    text: Optional[str] = None
+    turn_complete: bool = False
+
+
+class LiveSession(ABC):
+    # セッションを開いた時刻 (time.monotonic) - セッションの入れ替え時期の判断に使う
+    opened_at: Optional[float] = None
+
+    @abstractmethod
+    async def send_audio(self, audio_data: Union[bytes, memoryview]):
+        """16kHz mono int16 PCMを送信"""
+
+    @abstractmethod
+    async def end_audio_stream(self):
+        """音声ストリームの終了を通知し、溜まっている音声の応答を促す"""
+
+    @abstractmethod
+    def receive(self) -> AsyncIterator[LiveResponse]:
+        """1ターン分の応答を返す"""
+
+    def is_alive(self) -> bool:
+        return True
+
+
+class TranscriptionBackend(ABC):
+    name: str
+
+    @property
+    def quota_key(self) -> str:
+        """レート制限を共有する単位 (APIキーごと)"""
+        return self.name
+
+    @abstractmethod
+    def connect(self, profile: Optional[TranscriptionProfile] = None) -> AsyncContextManager[LiveSession]:
+        """profile (省略時は既定のプロファイル) のLiveセッションを開くコンテキストマネージャ"""
+
+
+def create_backend(name: Optional[str] = None, api_key: Optional[str] = None) -> TranscriptionBackend:
+    """設定に従ってバックエンドを生成"""
+    name = name or os.environ.get("TRANSCRIPTION_BACKEND", BACKEND_GEMINI)
+
+    if name == BACKEND_GEMINI:
+        api_key = api_key or os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise BackendConfigError("APIキーが設定されていません")
+        from .gemini_backend import GeminiBackend
+        return GeminiBackend(api_key)
+
+    if name == BACKEND_FAKE:
+        from .fake_backend import FakeLiveBackend, FakeLiveConfig
+        return FakeLiveBackend(FakeLiveConfig.from_env())
+
+    raise BackendConfigError(f"未対応のバックエンド: {name}")
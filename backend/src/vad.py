@@ -0,0 +1,213 @@
+"""サーバー側の音声区間検出 (VAD) とセグメンタ
+
+16kHz mono int16 のPCMをフレーム単位にまとめ、バッチ全体をNumPyで一括処理する。
+
+- エネルギー (RMS) とゼロ交差率で各フレームの有声/無声を判定
+- ハングオーバーで発話末尾の短い途切れを有声として扱う
+- 発話開始時は直前の無声フレーム (プリロール) を含めて送る
+- 最後の有声フレームから turn_end_ms 無音が続いたところで発話の終わりとする
+  (それより短い間は音声を送らずに同じ発話として続ける)
+
+無声区間はアップストリームへ送らず、発話の開始・終了を VADEvent として返す。
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+import numpy as np
+
+SPEECH_START = "speech_start"
+AUDIO = "audio"
+SPEECH_END = "speech_end"
+
+
+@dataclass(frozen=True)
+class VADConfig:
+    sample_rate: int = 16000
+    frame_ms: int = 20
+    # int16 スケールのRMS (transcribe.py / mic_test.py の音声レベルと同じ単位)
+    energy_threshold: float = 60.0
+    # これを超えるゼロ交差率はノイズとみなす (エネルギーが十分大きい場合を除く)
+    zcr_threshold: float = 0.35
+    strong_energy_ratio: float = 4.0
+    hangover_ms: int = 300
+    preroll_ms: int = 300
+    # 発話の終わりとみなす無音の長さ (ハングオーバーより短い場合はハングオーバーで区切る)
+    turn_end_ms: int = 0
+
+    @property
+    def frame_samples(self) -> int:
+        return self.sample_rate * self.frame_ms // 1000
+
+    @property
+    def hangover_frames(self) -> int:
+        return self.hangover_ms // self.frame_ms
+
+    @property
+    def preroll_frames(self) -> int:
+        return self.preroll_ms // self.frame_ms
+
+    @property
+    def turn_end_frames(self) -> int:
+        return max(self.hangover_frames, self.turn_end_ms // self.frame_ms)
+
+
+@dataclass
+class VADEvent:
+    kind: str
+    offset_ms: float
+    audio: Optional[np.ndarray] = None
+
+
+class VoiceActivitySegmenter:
+    def __init__(self, config: Optional[VADConfig] = None):
+        self.config = config or VADConfig()
+        self.frames_total = 0
+        self.frames_voiced = 0
+        self.reset()
+
+    def reset(self):
+        """ストリームの状態を初期化"""
+        fs = self.config.frame_samples
+        self._remainder = np.empty(0, dtype=np.int16)
+        self._preroll = np.empty((0, fs), dtype=np.int16)
+        self._frame_index = 0
+        self._last_speech = -(self.config.hangover_frames + 1)
+        self._active = False
+        # 音声の送信は止めたが、まだ発話の終わりを通知していない区間の終端フレーム
+        self._pending_end: Optional[int] = None
+
+    @property
+    def in_speech(self) -> bool:
+        return self._active or self._pending_end is not None
+
+    def classify(self, frames: np.ndarray) -> np.ndarray:
+        """(n, frame_samples) のフレーム配列を一括で有声/無声判定"""
+        cfg = self.config
+        samples = frames.astype(np.float32)
+        energy = np.sqrt(np.mean(samples * samples, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frames.shape[1] - 1)
+        return (energy >= cfg.energy_threshold) & (
+            (zcr <= cfg.zcr_threshold) | (energy >= cfg.energy_threshold * cfg.strong_energy_ratio)
+        )
+
+    def process(self, pcm: Union[bytes, bytearray, memoryview, np.ndarray]) -> List[VADEvent]:
+        """PCMを取り込み、発話境界と送信すべき音声を順に返す"""
+        fs = self.config.frame_samples
+        if isinstance(pcm, np.ndarray):
+            samples = pcm.astype(np.int16, copy=False)
+        else:
+            view = memoryview(pcm).cast("B")
+            samples = np.frombuffer(view[: len(view) // 2 * 2], dtype=np.int16)
+        if self._remainder.size:
+            samples = np.concatenate((self._remainder, samples))
+
+        n = samples.size // fs
+        self._remainder = samples[n * fs:].copy()
+        if n == 0:
+            return []
+
+        frames = samples[: n * fs].reshape(n, fs)
+        raw = self.classify(frames)
+
+        # ハングオーバー: 直近の有声フレームからの距離をバッチ全体で計算
+        index = np.arange(self._frame_index, self._frame_index + n)
+        last_speech = np.maximum.accumulate(np.where(raw, index, self._last_speech))
+        active = (index - last_speech) <= self.config.hangover_frames
+
+        events = self._segment(frames, active)
+
+        self.frames_total += n
+        self.frames_voiced += int(np.count_nonzero(active))
+        self._last_speech = int(last_speech[-1])
+        self._frame_index += n
+        # バッチ末尾までで無音が turn_end_ms に達していれば発話を終える
+        if self._pending_end is not None and self._silent_frames(self._frame_index) >= self.config.turn_end_frames:
+            events.append(self._end_turn())
+        return events
+
+    def flush(self) -> List[VADEvent]:
+        """ストリーム終了 - 発話中であれば終了イベントを返す"""
+        events = []
+        if self._active:
+            events.append(VADEvent(SPEECH_END, self._offset_ms(self._frame_index)))
+        elif self._pending_end is not None:
+            events.append(self._end_turn())
+        self.reset()
+        return events
+
+    def _offset_ms(self, frame_index: int) -> float:
+        return float(frame_index * self.config.frame_ms)
+
+    def _silent_frames(self, frame_index: int) -> int:
+        """保留中の発話の最後の有声フレームから frame_index までの無声フレーム数"""
+        return frame_index - (self._pending_end - self.config.hangover_frames)
+
+    def _end_turn(self) -> VADEvent:
+        event = VADEvent(SPEECH_END, self._offset_ms(self._pending_end))
+        self._pending_end = None
+        return event
+
+    def _segment(self, frames: np.ndarray, active: np.ndarray) -> List[VADEvent]:
+        """有声フレームの連続区間ごとにイベントを生成"""
+        n = len(active)
+        preroll_frames = self.config.preroll_frames
+        states = np.concatenate(([self._active], active))
+        changes = np.flatnonzero(states[1:] != states[:-1])
+        bounds = np.concatenate(([0], changes, [n]))
+
+        events: List[VADEvent] = []
+        if self._active and not active[0]:
+            # 前のバッチ末尾で発話が終わっていた (終了の通知は無音の長さが決まるまで保留)
+            self._pending_end = self._frame_index
+        previous_end = 0
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            if start == end or not active[start]:
+                continue
+
+            if start == 0 and self._active:
+                events.append(VADEvent(AUDIO, self._offset_ms(self._frame_index), frames[start:end].reshape(-1)))
+            else:
+                # プリロールは直前の発話区間と重ならない範囲に限定する
+                preroll = frames[max(previous_end, start - preroll_frames):start]
+                if previous_end == 0 and start < preroll_frames and len(self._preroll):
+                    preroll = np.concatenate((self._preroll, preroll))[-preroll_frames:]
+                onset = self._frame_index + start - len(preroll)
+                if self._pending_end is not None and (
+                    self._silent_frames(self._frame_index + start) < self.config.turn_end_frames
+                ):
+                    # 短い間のあとの再開は同じ発話として続ける
+                    self._pending_end = None
+                else:
+                    if self._pending_end is not None:
+                        events.append(self._end_turn())
+                    events.append(VADEvent(SPEECH_START, self._offset_ms(onset)))
+                audio = np.concatenate((preroll, frames[start:end])) if len(preroll) else frames[start:end]
+                events.append(VADEvent(AUDIO, self._offset_ms(onset), audio.reshape(-1)))
+
+            if end < n:
+                self._pending_end = self._frame_index + end
+            previous_end = end
+
+        # 次のバッチのプリロール用に末尾の無声フレームを保持
+        if active[-1] or preroll_frames == 0:
+            self._preroll = np.empty((0, frames.shape[1]), dtype=np.int16)
+        else:
+            voiced = np.flatnonzero(active)
+            tail_start = voiced[-1] + 1 if len(voiced) else 0
+            tail = frames[tail_start:]
+            if tail_start == 0 and len(self._preroll):
+                tail = np.concatenate((self._preroll, tail))
+            self._preroll = tail[-preroll_frames:].copy()
+
+        self._active = bool(active[-1])
+        return events
+
+
+def trim_silence(pcm: Union[bytes, memoryview], config: Optional[VADConfig] = None) -> Optional[bytes]:
+    """チャンク全体から無声区間を除去 - 有声区間がなければ None"""
+    segmenter = VoiceActivitySegmenter(config)
+    voiced = [event.audio for event in segmenter.process(pcm) if event.kind == AUDIO]
+    if not voiced:
+        return None
+    return np.concatenate(voiced).tobytes()
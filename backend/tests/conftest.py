@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+SAMPLE_RATE = 16000
+
+
+def tone(seconds: float, amplitude: float = 2000.0, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """有声と判定される倍音付きの正弦波"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    audio = amplitude * np.sin(2 * np.pi * 180 * t) + amplitude * 0.4 * np.sin(2 * np.pi * 540 * t)
+    return audio.astype(np.int16)
+
+
+def silence(seconds: float, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    return np.zeros(int(seconds * sample_rate), dtype=np.int16)
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(0)
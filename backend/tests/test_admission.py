@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from src.admission import AdmissionError, UpstreamScheduler
+
+
+def scheduler(**kwargs) -> UpstreamScheduler:
+    options = dict(max_concurrent=1, rate=1000.0, burst=1000, max_queue=64, max_wait=1.0)
+    options.update(kwargs)
+    return UpstreamScheduler(**options)
+
+
+def test_grants_up_to_max_concurrent_then_queues():
+    async def main():
+        upstream = scheduler(max_concurrent=2)
+        await upstream.acquire("a")
+        await upstream.acquire("b")
+        waiter = asyncio.create_task(upstream.acquire("c"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done() and upstream.queued == 1
+
+        upstream.release()
+        await asyncio.wait_for(waiter, 1)
+        assert upstream.active == 2 and upstream.queued == 0
+
+    asyncio.run(main())
+
+
+def test_round_robin_between_connections():
+    async def main():
+        upstream = scheduler()
+        await upstream.acquire("holder")
+        order = []
+
+        async def request(owner, n):
+            await upstream.acquire(owner)
+            order.append(f"{owner}{n}")
+            upstream.release()
+
+        # a が先に3件積んでも、後から来た b は a の2件目より先に許可される
+        tasks = [asyncio.create_task(request("a", n)) for n in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("b", 0)))
+        await asyncio.sleep(0)
+        upstream.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(main()) == ["a0", "b0", "a1", "a2"]
+
+
+def test_wait_times_out_with_admission_error():
+    async def main():
+        upstream = scheduler(max_wait=0.05)
+        await upstream.acquire("a")
+        with pytest.raises(AdmissionError):
+            await upstream.acquire("b")
+        assert upstream.timeouts == 1 and upstream.queued == 0
+        # 期限切れの待ちが残っていても、空いた枠は次の要求に回る
+        upstream.release()
+        await asyncio.wait_for(upstream.acquire("c"), 1)
+
+    asyncio.run(main())
+
+
+def test_full_queue_rejects_immediately():
+    async def main():
+        upstream = scheduler(max_queue=1)
+        await upstream.acquire("a")
+        waiter = asyncio.create_task(upstream.acquire("b"))
+        await asyncio.sleep(0)
+        assert upstream.saturated
+        with pytest.raises(AdmissionError):
+            await upstream.acquire("c")
+        assert upstream.rejected == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert upstream.queued == 0
+
+    asyncio.run(main())
+
+
+def test_rate_limit_delays_the_next_grant():
+    async def main():
+        upstream = scheduler(max_concurrent=10, rate=20.0, burst=1)
+        loop = asyncio.get_running_loop()
+        await upstream.acquire("a")
+        started = loop.time()
+        await upstream.acquire("a")
+        return loop.time() - started
+
+    assert asyncio.run(main()) == pytest.approx(0.05, abs=0.03)
+
+
+def test_slot_releases_on_error():
+    async def main():
+        upstream = scheduler()
+        with pytest.raises(RuntimeError):
+            async with upstream.slot("a"):
+                raise RuntimeError
+        assert upstream.active == 0
+
+    asyncio.run(main())
+
+
+def test_reserved_slots_are_kept_for_rotation():
+    async def main():
+        upstream = scheduler(max_concurrent=3, reserved=1)
+        await upstream.acquire("a")
+        await upstream.acquire("b")
+        # 通常の利用は予約枠を除いた数まで
+        waiter = asyncio.create_task(upstream.acquire("c"))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        upstream.acquire_reserved()
+        with pytest.raises(AdmissionError):
+            upstream.acquire_reserved()
+        assert upstream.active == 3
+
+        # 予約枠が返されても、通常の待ち行列は上限まで空かないと進まない
+        upstream.release()
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        upstream.release()
+        await asyncio.wait_for(waiter, 1)
+        return upstream
+
+    upstream = asyncio.run(main())
+    assert (upstream.reserved_granted, upstream.reserved_rejected) == (1, 1)
+
+
+def test_reserved_must_leave_a_normal_slot():
+    with pytest.raises(ValueError):
+        scheduler(max_concurrent=2, reserved=2)
@@ -0,0 +1,104 @@
+from itertools import accumulate
+
+import numpy as np
+import pytest
+
+from src.audio_codec import (
+    AudioDecoder,
+    AudioFormatError,
+    PolyphaseResampler,
+    _clamped_accumulate,
+    decode_ima_adpcm,
+    decode_mulaw,
+    encode_ima_adpcm,
+    encode_mulaw,
+)
+from src.protocol import FrameError, SampleFormat
+
+from .conftest import tone
+
+
+def snr_db(reference: np.ndarray, decoded: np.ndarray) -> float:
+    reference = reference.astype(np.float64)
+    noise = reference - decoded.astype(np.float64)
+    return 10 * np.log10(np.sum(reference ** 2) / max(np.sum(noise ** 2), 1e-9))
+
+
+def test_mulaw_round_trip():
+    samples = tone(0.5, amplitude=12000)
+    assert snr_db(samples, decode_mulaw(encode_mulaw(samples))) > 30
+
+
+def test_mulaw_covers_full_scale():
+    decoded = decode_mulaw(bytes(range(256)))
+    assert decoded.min() < -32000 and decoded.max() > 32000
+
+
+@pytest.mark.parametrize("amplitude", [500, 8000, 22000])
+def test_ima_adpcm_round_trip(amplitude):
+    # ブロックのサンプル数は奇数 (先頭1サンプル + 2の倍数)
+    samples = tone(0.25, amplitude=amplitude)[:3201]
+    block, _ = encode_ima_adpcm(samples)
+    decoded = decode_ima_adpcm(block)
+
+    assert decoded.size == samples.size
+    assert snr_db(samples, decoded) > 20
+
+
+def test_ima_adpcm_rejects_bad_blocks():
+    with pytest.raises(FrameError):
+        decode_ima_adpcm(b"\x00\x00")
+    with pytest.raises(FrameError):
+        decode_ima_adpcm(b"\x00\x00\xff\x00" + b"\x00" * 8)
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 17, 1000, 4097])
+@pytest.mark.parametrize("low, high, spread", [(0, 88, 20), (-32768, 32767, 20000)])
+def test_clamped_accumulate_matches_scalar_saturation(rng, n, low, high, spread):
+    for _ in range(10):
+        deltas = rng.integers(-spread, spread, n)
+        start = int(rng.integers(low, high))
+        expected = list(accumulate(deltas.tolist(), lambda v, d: min(high, max(low, v + d)), initial=start))[1:]
+        np.testing.assert_array_equal(_clamped_accumulate(start, deltas, low, high), expected)
+
+
+def test_passthrough_returns_payload_unchanged():
+    payload = tone(0.1).tobytes()
+    assert AudioDecoder().decode(payload) is payload
+
+
+@pytest.mark.parametrize("source_rate", [8000, 44100, 48000])
+def test_resampler_preserves_a_sine_and_its_length(source_rate):
+    seconds = 1.0
+    t = np.arange(int(source_rate * seconds)) / source_rate
+    source = (8000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    resampler = PolyphaseResampler(source_rate)
+    # チャンクに分けて流しても連続した出力になる
+    chunks = [resampler.process(source[i:i + 1234]) for i in range(0, source.size, 1234)]
+    output = np.concatenate(chunks)
+
+    assert abs(output.size - 16000 * seconds) <= 2
+    steady = output[1000:-1000]
+    assert np.sqrt(np.mean(steady.astype(np.float64) ** 2)) == pytest.approx(8000 / np.sqrt(2), rel=0.02)
+
+
+@pytest.mark.filterwarnings("error")
+def test_float32_non_finite_samples_are_sanitized():
+    poisoned = np.array([np.nan, np.inf, -np.inf, 0.25], dtype=np.float32)
+    decoded = np.frombuffer(AudioDecoder(16000, "pcm_f32le").decode(poisoned.tobytes()), dtype=np.int16)
+    np.testing.assert_array_equal(decoded, [0, 32767, -32768, 8192])
+
+    # リサンプラーを通す場合も NaN を履歴に入れない (入れば int16 への変換で警告になる)
+    decoder = AudioDecoder(48000, "pcm_f32le")
+    decoder.decode(np.tile(poisoned, 480).tobytes())
+    clean = np.frombuffer(decoder.decode(np.full(4800, 0.25, dtype=np.float32).tobytes()), dtype=np.int16)
+    assert clean[-100:].min() == clean[-100:].max() == 8192
+
+
+def test_decoder_rejects_unsupported_formats():
+    with pytest.raises(AudioFormatError):
+        AudioDecoder(4000)
+    with pytest.raises(AudioFormatError):
+        AudioDecoder(16000, "opus")
+    with pytest.raises(FrameError):
+        AudioDecoder().decode(b"\x00\x00\x00", SampleFormat.PCM_F32LE)
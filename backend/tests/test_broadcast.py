@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from src.broadcast import BroadcastHub
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.messages = []
+        self.closed = False
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send_text(self, payload: str):
+        await self.gate.wait()
+        self.messages.append(json.loads(payload))
+
+    async def close(self):
+        self.closed = True
+
+
+def message(seq: int, final: bool) -> str:
+    kind = "transcription_final" if final else "transcription_partial"
+    return json.dumps({"type": kind, "message_seq": seq})
+
+
+def test_subscribers_receive_published_results_in_order():
+    async def main():
+        hub = BroadcastHub(buffer_size=16)
+        hub.open("s")
+        sockets = [RecordingWebSocket() for _ in range(3)]
+        members = [hub.subscribe("s", socket) for socket in sockets]
+        for seq in range(1, 6):
+            hub.publish("s", "transcription_partial", message(seq, False))
+        # session_started などは配らない
+        hub.publish("s", "session_started", json.dumps({"type": "session_started"}))
+        hub.close("s")
+        await asyncio.gather(*(member.wait_closed() for member in members))
+        return sockets
+
+    for socket in asyncio.run(main()):
+        assert [m["message_seq"] for m in socket.messages] == [1, 2, 3, 4, 5]
+        assert socket.closed
+
+
+def test_slow_subscriber_drops_partials_before_finals():
+    async def main():
+        hub = BroadcastHub(buffer_size=3)
+        hub.open("s")
+        slow = RecordingWebSocket()
+        slow.gate.clear()
+        member = hub.subscribe("s", slow)
+        await asyncio.sleep(0)
+        hub.publish("s", "transcription_final", message(1, True))
+        for seq in range(2, 6):
+            hub.publish("s", "transcription_partial", message(seq, False))
+        hub.publish("s", "transcription_final", message(6, True))
+        slow.gate.set()
+        hub.close("s")
+        await member.wait_closed()
+        return slow.messages, member.dropped
+
+    messages, dropped = asyncio.run(main())
+    assert dropped == 3
+    assert messages[0] == {"type": "subscriber_lagged", "dropped": 3}
+    received = [m["message_seq"] for m in messages[1:]]
+    # 確定結果は残り、部分結果は古いものから捨てられる
+    assert 1 in received and 6 in received
+    assert received == sorted(received)
+
+
+def test_subscribe_to_unknown_session():
+    async def main():
+        return BroadcastHub().subscribe("missing", RecordingWebSocket())
+
+    assert asyncio.run(main()) is None
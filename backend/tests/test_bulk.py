@@ -0,0 +1,45 @@
+import wave
+
+import numpy as np
+import pytest
+
+from src.bulk import AudioFile, BulkConfig, find_segments
+
+from .conftest import SAMPLE_RATE, silence, tone
+
+
+@pytest.fixture
+def recording(tmp_path):
+    # 8秒の発話, 2秒の間, 8秒の発話, 0.6秒の間, 8秒の発話
+    audio = np.concatenate([tone(8), silence(2), tone(8), silence(0.6), tone(8)])
+    path = tmp_path / "recording.wav"
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(audio.tobytes())
+    return AudioFile.open(str(path))
+
+
+def bounds(audio, config, start=0, first_index=0):
+    return [(s.start / SAMPLE_RATE, s.end / SAMPLE_RATE) for s in find_segments(audio, config, start, first_index)]
+
+
+def test_segments_cover_the_file_without_gaps(recording):
+    segments = list(find_segments(recording, BulkConfig()))
+    assert segments[0].start == 0 and segments[-1].end == recording.frames
+    assert all(a.end == b.start for a, b in zip(segments, segments[1:]))
+    assert [s.index for s in segments] == list(range(len(segments)))
+
+
+@pytest.mark.parametrize("max_pause_ms, cuts", [(1500, [9.0]), (500, [9.0, 18.3]), (3000, [])])
+def test_pauses_the_upstream_would_end_a_turn_on_are_always_cut(recording, max_pause_ms, cuts):
+    segments = bounds(recording, BulkConfig(max_pause_ms=max_pause_ms))
+    assert [end for _, end in segments[:-1]] == pytest.approx(cuts, abs=0.05)
+
+
+def test_resuming_from_a_cut_gives_the_same_segments(recording):
+    config = BulkConfig(max_pause_ms=500)
+    segments = list(find_segments(recording, config))
+    resumed = list(find_segments(recording, config, segments[1].start, 1))
+    assert resumed == segments[1:]
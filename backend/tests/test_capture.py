@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from src.buffers import RingBuffer
+from src.capture import AudioSource, CaptureEngine
+
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(8)
+    out = np.zeros(8, dtype=np.int16)
+    ring.write(np.arange(6, dtype=np.int16))
+    assert ring.read_into(out[:4]) == 4
+    ring.write(np.arange(6, 12, dtype=np.int16))
+    assert len(ring) == 8
+    assert ring.read_into(out) == 8
+    np.testing.assert_array_equal(out, np.arange(4, 12))
+    assert ring.overflow_samples == 0
+
+
+def test_ring_buffer_drops_the_oldest_samples_when_full():
+    ring = RingBuffer(8)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.write(np.arange(6, 11, dtype=np.int16))
+    out = np.zeros(8, dtype=np.int16)
+    assert ring.read_into(out) == 8
+    np.testing.assert_array_equal(out, np.arange(3, 11))
+    assert ring.overflow_samples == 3
+
+    ring.write(np.arange(20, dtype=np.int16))
+    assert ring.read_into(out) == 8
+    np.testing.assert_array_equal(out, np.arange(12, 20))
+    assert ring.overflow_samples == 3 + 12
+
+
+def test_audio_source_must_implement_start_and_stop():
+    with pytest.raises(TypeError):
+        AudioSource()
+
+
+class ThreadSource(AudioSource):
+    """別スレッドから blocks を順に渡す"""
+
+    def __init__(self, blocks):
+        self.blocks = blocks
+        self.thread = None
+
+    def start(self, callback, on_end):
+        def run():
+            for block in self.blocks:
+                callback(block)
+            on_end()
+
+        self.thread = threading.Thread(target=run)
+        self.thread.start()
+
+    def stop(self):
+        self.thread.join()
+
+
+def test_capture_engine_yields_fixed_frames_and_the_remainder():
+    audio = np.arange(16000 * 3 // 10 + 500, dtype=np.int16)
+
+    async def main():
+        engine = CaptureEngine(ThreadSource(np.array_split(audio, 7)), frame_ms=100)
+        engine.start()
+        frames = [frame async for frame in engine.read_frames()]
+        engine.stop()
+        return engine, frames
+
+    engine, frames = asyncio.run(main())
+    assert [len(frame) for frame in frames] == [3200, 3200, 3200, 1000]
+    np.testing.assert_array_equal(np.frombuffer(b"".join(frames), dtype=np.int16), audio)
+    assert engine.stats()["overflow_ms"] == 0
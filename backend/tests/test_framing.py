@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from src.framing import FramePacer
+
+
+class Recorder:
+    def __init__(self):
+        self.frames = []
+
+    async def send(self, frame: bytes, received_at: float, offset_ms: float):
+        self.frames.append((np.frombuffer(frame, dtype=np.int16), received_at, offset_ms, time.perf_counter()))
+
+
+def test_frames_have_fixed_size_and_drain_sends_the_remainder():
+    async def main():
+        recorder = Recorder()
+        pacer = FramePacer(recorder.send, frame_ms=10, jitter_ms=1000)
+        pacer.start()
+        audio = np.arange(400, dtype=np.int16)
+        await pacer.push(audio.tobytes(), received_at=1.0, offset_ms=0.0)
+        await asyncio.sleep(0.05)
+        # 1フレームに満たない端数は drain まで送らない
+        assert [len(f[0]) for f in recorder.frames] == [160, 160]
+        await pacer.drain()
+        await pacer.close()
+        return recorder, audio
+
+    recorder, audio = asyncio.run(main())
+    assert [len(f[0]) for f in recorder.frames] == [160, 160, 80]
+    assert np.array_equal(np.concatenate([f[0] for f in recorder.frames]), audio)
+    assert [f[2] for f in recorder.frames] == [0.0, 10.0, 20.0]
+
+
+def test_frames_carry_receive_time_and_offset_of_their_first_sample():
+    async def main():
+        recorder = Recorder()
+        pacer = FramePacer(recorder.send, frame_ms=10)
+        await pacer.push(np.zeros(100, dtype=np.int16), received_at=1.0, offset_ms=0.0)
+        await pacer.push(np.zeros(300, dtype=np.int16), received_at=2.0, offset_ms=6.25)
+        await pacer.drain()
+        return recorder
+
+    recorder = asyncio.run(main())
+    assert [(f[1], f[2]) for f in recorder.frames] == [(1.0, 0.0), (2.0, 10.0), (2.0, 20.0)]
+
+
+def test_frames_are_paced_at_real_time():
+    async def main():
+        recorder = Recorder()
+        pacer = FramePacer(recorder.send, frame_ms=20, jitter_ms=1000)
+        pacer.start()
+        pushed = time.perf_counter()
+        await pacer.push(np.zeros(320 * 5, dtype=np.int16), received_at=pushed, offset_ms=0.0)
+        while len(recorder.frames) < 5:
+            await asyncio.sleep(0.005)
+        await pacer.close()
+        return recorder, pushed, pacer
+
+    recorder, pushed, pacer = asyncio.run(main())
+    sent_at = [f[3] for f in recorder.frames]
+    # 最初のフレームは待たずに送り、以降は1フレーム分の時間ごと
+    assert sent_at[0] - pushed < 0.015
+    assert sent_at[-1] - sent_at[0] == pytest.approx(0.08, abs=0.03)
+    assert pacer.catchup_frames == 0
+
+
+def test_backlog_beyond_jitter_is_sent_faster():
+    async def main():
+        recorder = Recorder()
+        pacer = FramePacer(recorder.send, frame_ms=20, jitter_ms=40, max_speedup=4.0)
+        pacer.start()
+        await pacer.push(np.zeros(320 * 10, dtype=np.int16), received_at=0.0, offset_ms=0.0)
+        while len(recorder.frames) < 10:
+            await asyncio.sleep(0.005)
+        await pacer.close()
+        return recorder, pacer
+
+    recorder, pacer = asyncio.run(main())
+    elapsed = recorder.frames[-1][3] - recorder.frames[0][3]
+    # 等速なら 180ms かかる
+    assert elapsed < 0.14
+    assert pacer.catchup_frames > 0
+
+
+def test_push_waits_for_space_when_the_buffer_is_full():
+    async def main():
+        recorder = Recorder()
+        # 容量は最低2フレーム分
+        pacer = FramePacer(recorder.send, frame_ms=10, buffer_ms=0)
+        blocked = asyncio.create_task(pacer.push(np.zeros(480, dtype=np.int16), received_at=0.0, offset_ms=0.0))
+        await asyncio.sleep(0.01)
+        assert not blocked.done() and pacer.buffered_ms == 20.0
+
+        await pacer.drain()
+        await asyncio.wait_for(blocked, 1)
+        await pacer.drain()
+        return recorder
+
+    recorder = asyncio.run(main())
+    assert sum(len(f[0]) for f in recorder.frames) == 480
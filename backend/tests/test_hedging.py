@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List
+
+import pytest
+
+from src.admission import UpstreamScheduler
+from src.hedging import HedgeBudget, HedgePolicy, LatencyTracker, UpstreamTimeoutError
+from src.transcribe_service import TranscribeService
+from src.upstream import LiveResponse, LiveSession, TranscriptionBackend
+
+
+def test_latency_tracker_uses_the_recent_window():
+    tracker = LatencyTracker(window=4)
+    for value in (10.0, 10.0, 1.0, 1.0, 1.0, 1.0):
+        tracker.observe(value)
+    assert tracker.quantile(100) == 1.0
+
+
+def test_budget_accrues_per_request_and_is_capped():
+    budget = HedgeBudget(ratio=0.5, burst=2)
+    assert not budget.try_spend()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(10):
+        budget.record_request()
+    assert budget.tokens == 2
+
+
+def test_hedges_are_denied_while_admission_is_queued():
+    policy = HedgePolicy(budget_ratio=1.0)
+    policy.record_request()
+    upstream = UpstreamScheduler()
+    upstream.queued = 1
+    assert not policy.allow_hedge(upstream)
+    # 断った時は予算を消費しない
+    upstream.queued = 0
+    assert policy.allow_hedge(upstream)
+    assert (policy.hedges, policy.denied) == (1, 1)
+
+
+def test_timeouts_are_recorded_at_the_deadline():
+    policy = HedgePolicy(min_timeout=0.5, max_timeout=10.0, min_samples=20)
+    for _ in range(100):
+        policy.observe_first_token(0.1)
+    before = policy.timeout()
+    for _ in range(20):
+        policy.observe_timeout(before)
+    # 期限切れを捨てると分位点が下がって期限がさらに短くなる - 期限の値で記録すれば延びる
+    assert policy.timeout() > before
+    assert policy.timeouts == 20
+
+
+class ScriptedSession(LiveSession):
+    """stall: 応答しない / empty: 何も返さずに終わる / それ以外: その文字列を返す"""
+
+    def __init__(self, behaviour: str):
+        self.behaviour = behaviour
+
+    async def send_audio(self, audio_data):
+        pass
+
+    async def end_audio_stream(self):
+        pass
+
+    async def receive(self):
+        if self.behaviour == "stall":
+            await asyncio.sleep(3600)
+        if self.behaviour != "empty":
+            yield LiveResponse(text=self.behaviour)
+            yield LiveResponse(turn_complete=True)
+
+
+class ScriptedBackend(TranscriptionBackend):
+    name = "scripted"
+
+    def __init__(self, behaviours: List[str]):
+        self.behaviours = list(behaviours)
+        self.connects = 0
+
+    @asynccontextmanager
+    async def connect(self, profile=None):
+        self.connects += 1
+        yield ScriptedSession(self.behaviours.pop(0))
+
+
+def test_a_stream_ending_without_response_is_hedged():
+    backend = ScriptedBackend(["empty", "こんにちは"])
+    service = TranscribeService(backend, hedging=HedgePolicy(budget_ratio=1.0))
+    assert asyncio.run(service.transcribe_audio_chunk(b"\x00\x00" * 160)) == "こんにちは"
+    assert backend.connects == 2
+    assert service.hedging.hedge_wins == 1
+
+
+def test_hedge_win_latency_is_measured_from_the_request_start():
+    policy = HedgePolicy(budget_ratio=1.0, min_samples=20)
+    for _ in range(20):
+        policy.observe_first_token(0.01)
+    delay = policy.hedge_delay()
+    service = TranscribeService(ScriptedBackend(["stall", "こんにちは"]), hedging=policy)
+
+    assert asyncio.run(service.transcribe_audio_chunk(b"\x00\x00" * 160)) == "こんにちは"
+    assert policy.tracker.quantile(100) >= delay
+
+
+def test_no_response_within_the_deadline_raises_timeout():
+    policy = HedgePolicy(budget_ratio=0.0, min_timeout=0.05, max_timeout=0.05)
+    service = TranscribeService(ScriptedBackend(["stall"]), hedging=policy)
+    with pytest.raises(UpstreamTimeoutError):
+        asyncio.run(service.transcribe_audio_chunk(b"\x00\x00" * 160))
+    assert policy.timeouts == 1
+    assert policy.tracker.quantile(100) == pytest.approx(0.05)
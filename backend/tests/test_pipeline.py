@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from src.fake_backend import FakeLiveBackend, FakeLiveConfig
+from src.metrics import Trace
+from src.pipeline import BackpressurePolicy, ConnectionPipeline, final_message, partial_message
+from src.profiles import PROFILES
+from src.transcribe_service import TranscribeService, Utterance
+
+from .conftest import silence, tone
+
+FAST = FakeLiveConfig(first_token_latency=0.0, token_interval=0.0)
+
+
+async def stream(audio: np.ndarray, profile_name: str, chunk_samples: int = 1600):
+    """ストリーミングモードで audio を流し、クライアントへ送られたメッセージを返す"""
+    profile = PROFILES[profile_name]
+    sent = []
+
+    async def send(seq, payload):
+        sent.append(json.loads(payload))
+
+    async def on_partial(utterance):
+        await pipeline.emit(partial_message(utterance))
+
+    async def on_result(utterance):
+        await pipeline.emit(final_message(utterance))
+
+    service = TranscribeService(FakeLiveBackend(FAST), on_result=on_result, on_partial=on_partial,
+                                profile=profile, rotate_after=0)
+    pipeline = ConnectionPipeline(service, send, chunk_workers=1, vad_config=profile.vad)
+    pipeline.start()
+    try:
+        await service.start_session(streaming=True, profile=profile)
+        data = audio.tobytes()
+        for i in range(0, len(data), chunk_samples * 2):
+            await pipeline.submit(data[i:i + chunk_samples * 2])
+        await pipeline.drain()
+        await pipeline.flush()
+        await service.end_session()
+        await asyncio.sleep(0.05)
+    finally:
+        await pipeline.close()
+    return sent
+
+
+def kinds(messages, kind):
+    return [m for m in messages if m["type"] == kind]
+
+
+@pytest.mark.parametrize("profile_name, finals", [("default", 1), ("meeting", 1), ("dictation", 2)])
+def test_pause_shorter_than_profile_silence_keeps_one_utterance(profile_name, finals):
+    # 1秒の間: default (1.5秒) と meeting (2秒) では1つの発話、dictation (0.5秒) では区切る
+    audio = np.concatenate([tone(1.0), silence(1.0), tone(1.0), silence(0.5)])
+    messages = asyncio.run(stream(audio, profile_name))
+
+    assert len(kinds(messages, "speech_started")) == finals
+    assert len(kinds(messages, "speech_ended")) == finals
+    results = kinds(messages, "transcription_final")
+    assert len(results) == finals
+    assert len({m["utterance_id"] for m in results}) == finals
+
+
+class ChunkService:
+    """チャンクモードの文字起こし - 先頭バイトが release されるまでそのチャンクの結果を返さない"""
+
+    is_streaming = False
+
+    def __init__(self):
+        self.gates = {}
+        self.received = []
+
+    def gate(self, data: bytes) -> asyncio.Event:
+        return self.gates.setdefault(data, asyncio.Event())
+
+    def release(self, *chunks: bytes):
+        for data in chunks:
+            self.gate(data).set()
+
+    def new_utterance(self, started=None, offset_ms=None) -> Utterance:
+        return Utterance(f"u{len(self.received)}", Trace(None, started), offset_ms)
+
+    async def transcribe_audio_chunk(self, data: bytes, utterance: Utterance) -> str:
+        self.received.append(data)
+        await self.gate(data[:1]).wait()
+        utterance.append(data.decode())
+        return utterance.text
+
+
+async def run_chunks(chunks, release_order=None, **options):
+    """チャンクを投入し、release_order の順に処理を終わらせて送られたメッセージを返す"""
+    service = ChunkService()
+    sent = []
+
+    async def send(seq, payload):
+        sent.append(json.loads(payload))
+
+    pipeline = ConnectionPipeline(service, send, **options)
+    pipeline.start()
+    try:
+        for sequence, data in enumerate(chunks):
+            await pipeline.submit(data, sequence=sequence)
+            # ワーカーが最初のチャンクを取り出してから次を積む
+            await asyncio.sleep(0)
+        for data in release_order or chunks:
+            service.release(data[:1])
+            await asyncio.sleep(0.01)
+        await pipeline.drain()
+        await asyncio.sleep(0.01)
+    finally:
+        await pipeline.close()
+    return sent, service, pipeline
+
+
+def test_chunk_results_are_delivered_in_submission_order():
+    chunks = [b"a", b"b", b"c"]
+    sent, _, _ = asyncio.run(run_chunks(chunks, release_order=[b"c", b"b", b"a"], chunk_workers=3))
+
+    results = kinds(sent, "transcription_final")
+    assert [m["text"] for m in results] == ["a", "b", "c"]
+    assert [m["sequence"] for m in results] == [0, 1, 2]
+    assert [m["message_seq"] for m in sent] == list(range(1, len(sent) + 1))
+
+
+def test_drop_oldest_discards_queued_chunks_and_signals_recovery():
+    chunks = [b"a", b"b", b"c", b"d", b"e"]
+    sent, service, pipeline = asyncio.run(run_chunks(
+        chunks, chunk_workers=1, max_queue=2, policy=BackpressurePolicy.DROP_OLDEST))
+
+    assert [m["text"] for m in kinds(sent, "transcription_final")] == ["a", "d", "e"]
+    assert service.received == [b"a", b"d", b"e"]
+    assert pipeline.dropped == 2
+    states = [m["state"] for m in kinds(sent, "backpressure")]
+    assert states == ["overloaded", "recovered"]
+    assert kinds(sent, "backpressure")[0]["policy"] == "drop_oldest"
+
+
+def test_coalesce_appends_to_the_last_queued_chunk():
+    chunks = [b"a", b"b", b"c", b"d"]
+    sent, service, pipeline = asyncio.run(run_chunks(
+        chunks, chunk_workers=1, max_queue=2, policy=BackpressurePolicy.COALESCE))
+
+    assert [m["text"] for m in kinds(sent, "transcription_final")] == ["a", "b", "cd"]
+    assert service.received == [b"a", b"b", b"cd"]
+    assert pipeline.coalesced == 1 and pipeline.dropped == 0
+    assert [m["state"] for m in kinds(sent, "backpressure")] == ["overloaded", "recovered"]
+
+
+def test_signal_blocks_the_reader_until_the_queue_has_room():
+    async def main():
+        service = ChunkService()
+        sent = []
+
+        async def send(seq, payload):
+            sent.append(json.loads(payload))
+
+        pipeline = ConnectionPipeline(service, send, chunk_workers=1, max_queue=1,
+                                      policy=BackpressurePolicy.SIGNAL)
+        pipeline.start()
+        try:
+            await pipeline.submit(b"a")
+            await asyncio.sleep(0)
+            await pipeline.submit(b"b")
+            blocked = asyncio.create_task(pipeline.submit(b"c"))
+            await asyncio.sleep(0.01)
+            assert not blocked.done() and pipeline.overloaded
+
+            service.release(b"a", b"b", b"c")
+            await asyncio.wait_for(blocked, 1)
+            await pipeline.drain()
+            await asyncio.sleep(0.01)
+        finally:
+            await pipeline.close()
+        return sent, pipeline
+
+    sent, pipeline = asyncio.run(main())
+    assert [m["text"] for m in kinds(sent, "transcription_final")] == ["a", "b", "c"]
+    assert pipeline.dropped == 0 and pipeline.coalesced == 0
+    assert [m["state"] for m in kinds(sent, "backpressure")] == ["overloaded", "recovered"]
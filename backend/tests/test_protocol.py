@@ -0,0 +1,73 @@
+import struct
+
+import numpy as np
+import pytest
+
+from src.protocol import (
+    FRAME_HEADER,
+    FrameError,
+    MessageError,
+    SampleFormat,
+    build_audio_frame,
+    parse_audio_frame,
+    parse_control_message,
+)
+
+
+def test_round_trip_keeps_header_fields_and_payload():
+    pcm = np.arange(-160, 160, dtype=np.int16).tobytes()
+    frame = parse_audio_frame(build_audio_frame(pcm, sequence=42, timestamp=1234.5, flags=3))
+
+    assert frame.sequence == 42
+    assert frame.timestamp == 1234.5
+    assert frame.sample_format == SampleFormat.PCM_S16LE
+    assert frame.flags == 3
+    assert bytes(frame.payload) == pcm
+
+
+def test_payload_is_a_view_without_copy():
+    data = bytearray(build_audio_frame(b"\x01\x00\x02\x00", sequence=0, timestamp=0.0))
+    frame = parse_audio_frame(data)
+    data[-1] = 0x7F
+    assert bytes(frame.payload)[-1] == 0x7F
+
+
+def test_sequence_wraps_to_u32():
+    frame = parse_audio_frame(build_audio_frame(b"", sequence=2**32 + 5, timestamp=0.0))
+    assert frame.sequence == 5
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"\x01" * (FRAME_HEADER.size - 1), "短すぎ"),
+    (FRAME_HEADER.pack(2, SampleFormat.PCM_S16LE, 0, 0, 0.0), "バージョン"),
+    (FRAME_HEADER.pack(1, 99, 0, 0, 0.0), "サンプル形式"),
+    (FRAME_HEADER.pack(1, SampleFormat.PCM_S16LE, 0, 0, 0.0) + b"\x00", "サンプル境界"),
+    (FRAME_HEADER.pack(1, SampleFormat.PCM_F32LE, 0, 0, 0.0) + b"\x00" * 6, "サンプル境界"),
+])
+def test_rejects_malformed_frames(data, message):
+    with pytest.raises(FrameError, match=message):
+        parse_audio_frame(data)
+
+
+def test_header_layout_is_little_endian():
+    frame = build_audio_frame(b"", sequence=0x01020304, timestamp=0.5, sample_format=SampleFormat.MULAW)
+    assert frame[:8] == bytes([1, SampleFormat.MULAW, 0, 0, 4, 3, 2, 1])
+    assert struct.unpack("<d", frame[8:16])[0] == 0.5
+
+
+def test_control_message_is_parsed_and_seq_normalized():
+    message = parse_control_message('{"type": "resume_session", "session_token": "t", "last_message_seq": "7"}')
+    assert message == {"type": "resume_session", "session_token": "t", "last_message_seq": 7}
+
+
+@pytest.mark.parametrize("text", [
+    "{not json",
+    "[1, 2]",
+    '{"sample_rate": 16000}',
+    '{"type": "resume_session", "last_message_seq": "abc"}',
+    '{"type": "resume_session", "last_message_seq": null}',
+    '{"type": "resume_session", "last_message_seq": -1}',
+])
+def test_malformed_control_message_raises_message_error(text):
+    with pytest.raises(MessageError):
+        parse_control_message(text)
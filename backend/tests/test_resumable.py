@@ -0,0 +1,118 @@
+import asyncio
+
+from src.resumable import ClientSession, ReplayBuffer, SequenceWindow, SessionRegistry
+
+
+class RecordingSocket:
+    def __init__(self, fail: bool = False):
+        self.sent = []
+        self.fail = fail
+
+    async def send_text(self, payload: str):
+        if self.fail:
+            raise ConnectionError("closed")
+        self.sent.append(payload)
+
+
+def test_replay_returns_messages_after_last_seq():
+    replay = ReplayBuffer(capacity=4)
+    for seq in range(1, 4):
+        replay.append(seq, f"m{seq}")
+    assert replay.since(1) == (["m2", "m3"], True)
+    assert replay.since(3) == ([], True)
+
+
+def test_replay_reports_gap_when_oldest_messages_were_dropped():
+    replay = ReplayBuffer(capacity=2)
+    for seq in range(1, 5):
+        replay.append(seq, f"m{seq}")
+    assert replay.since(1) == (["m3", "m4"], False)
+    assert replay.since(2) == (["m3", "m4"], True)
+
+
+def test_sequence_window_drops_duplicates_and_old_frames():
+    window = SequenceWindow(capacity=4)
+    assert all(window.add(n) for n in range(10))
+    assert not window.add(9)
+    # 覚えている範囲より古いものは受信済みとみなす
+    assert not window.add(2)
+    assert window.add(12) and window.last == 12
+    # 順番が前後しても、未受信なら受け付ける
+    assert window.add(11) and window.last == 12
+
+
+def test_client_keeps_messages_while_detached_and_replays_on_attach():
+    async def main():
+        first = RecordingSocket()
+        client = ClientSession(first)
+        await client.send(1, "m1")
+        client.detach()
+        await client.send(2, "m2")
+        await client.send(3, "m3")
+
+        second = RecordingSocket()
+        replayed, complete = await client.attach(second, last_seq=1)
+        await client.send(4, "m4")
+        return first.sent, second.sent, replayed, complete
+
+    first, second, replayed, complete = asyncio.run(main())
+    assert first == ["m1"]
+    assert second == ["m2", "m3", "m4"]
+    assert (replayed, complete) == (2, True)
+
+
+def test_send_error_detaches_but_keeps_the_message():
+    async def main():
+        client = ClientSession(RecordingSocket(fail=True))
+        await client.send(1, "m1")
+        assert client.websocket is None
+        socket = RecordingSocket()
+        await client.attach(socket, last_seq=0)
+        return socket.sent
+
+    assert asyncio.run(main()) == ["m1"]
+
+
+def test_accept_sequence_ignores_missing_and_resets_per_session():
+    client = ClientSession(RecordingSocket())
+    assert client.accept_sequence(None) and client.accept_sequence(None)
+    assert client.accept_sequence(0)
+    assert not client.accept_sequence(0)
+
+    client.begin("token", "session", "streaming")
+    assert client.accept_sequence(0)
+
+
+def test_registry_resumes_parked_session_once():
+    async def main():
+        registry = SessionRegistry(grace_period=10)
+        client = ClientSession(RecordingSocket())
+        client.begin("token", "session", "streaming")
+        registry.park(client)
+        assert client.websocket is None and len(registry) == 1
+
+        assert registry.resume("other") is None
+        assert registry.resume(None) is None
+        resumed = registry.resume("token")
+        assert registry.resume("token") is None
+        await registry.close()
+        return client, resumed, registry
+
+    client, resumed, registry = asyncio.run(main())
+    assert resumed is client
+    assert registry.metrics() == {"parked": 0, "resumed": 1, "expired": 0}
+
+
+def test_registry_closes_session_after_grace_period():
+    async def main():
+        registry = SessionRegistry(grace_period=0.02)
+        client = ClientSession(RecordingSocket())
+        client.begin("token", "session", "streaming")
+        registry.park(client)
+        await asyncio.sleep(0.1)
+        assert registry.resume("token") is None
+        return client, registry
+
+    client, registry = asyncio.run(main())
+    assert registry.expired == 1 and len(registry) == 0
+    assert not client.resumable
@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+from src.admission import AdmissionError
+from src.fake_backend import FakeLiveBackend, FakeLiveConfig
+from src.session_pool import LiveSessionPool
+
+
+def make_pool(**kwargs) -> LiveSessionPool:
+    return LiveSessionPool(FakeLiveBackend(FakeLiveConfig()), **kwargs)
+
+
+def test_acquire_uses_a_preconnected_session():
+    async def main():
+        pool = make_pool(min_size=1, max_size=2)
+        await pool.start()
+        try:
+            async with pool.session():
+                pass
+        finally:
+            await pool.close()
+        return pool
+
+    pool = asyncio.run(main())
+    assert (pool.hits, pool.misses) == (1, 0)
+    assert pool.backend.connections == 1
+
+
+def test_acquire_connects_when_nothing_is_idle():
+    async def main():
+        pool = make_pool(min_size=0, max_size=1, max_wait=5.0)
+        async with pool.session():
+            metrics = pool.metrics()
+        return pool, metrics
+
+    pool, metrics = asyncio.run(main())
+    # 設定した max_wait は待ち時間の統計で上書きされない
+    assert pool.max_wait == 5.0
+    assert (pool.hits, pool.misses) == (0, 1)
+    assert metrics["in_use"] == 1 and pool.metrics()["in_use"] == 0
+
+
+def test_full_pool_waits_for_a_released_slot():
+    async def main():
+        pool = make_pool(min_size=0, max_size=1, max_wait=1.0)
+        first = await pool.acquire()
+        waiter = asyncio.create_task(pool.acquire())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await pool.release(first)
+        second = await waiter
+        await pool.release(second)
+        return pool
+
+    pool = asyncio.run(main())
+    assert pool.timeouts == 0
+    assert pool.max_wait_seen >= 0.05
+
+
+def test_full_pool_times_out_after_max_wait():
+    async def main():
+        pool = make_pool(min_size=0, max_size=1, max_wait=0.1)
+        held = await pool.acquire()
+        started = time.perf_counter()
+        try:
+            with pytest.raises(AdmissionError):
+                await pool.acquire()
+            return pool, time.perf_counter() - started
+        finally:
+            await pool.release(held)
+
+    pool, waited = asyncio.run(main())
+    assert waited == pytest.approx(0.1, abs=0.05)
+    assert pool.timeouts == 1
+    assert pool.metrics()["max_wait_ms"] >= 100
+
+
+def test_dead_and_expired_sessions_are_evicted():
+    async def main():
+        pool = make_pool(min_size=2, max_size=2, health_check_interval=60)
+        await pool.start()
+        try:
+            dead, old = pool._idle
+            await dead.session.close()
+            old.created_at -= pool.max_age
+            async with pool.session() as session:
+                assert session is not dead.session and session is not old.session
+        finally:
+            await pool.close()
+        return pool
+
+    pool = asyncio.run(main())
+    assert pool.evicted == 2
+    assert (pool.hits, pool.misses) == (0, 1)
+    assert pool.metrics()["idle"] == 0
+
+
+def test_maintenance_refills_to_min_size():
+    async def main():
+        pool = make_pool(min_size=2, max_size=3, health_check_interval=60)
+        await pool.start()
+        try:
+            async with pool.session():
+                pass
+            await asyncio.sleep(0.05)
+            return pool.metrics()["idle"]
+        finally:
+            await pool.close()
+
+    assert asyncio.run(main()) == 2
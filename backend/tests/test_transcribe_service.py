@@ -0,0 +1,145 @@
+import asyncio
+
+import numpy as np
+
+from src.admission import UpstreamScheduler
+from src.fake_backend import FakeLiveBackend, FakeLiveConfig
+from src.transcribe_service import TranscribeService, Utterance, strip_seam
+from src.metrics import Trace
+
+from .conftest import silence, tone
+
+FAST = FakeLiveConfig(first_token_latency=0.0, token_interval=0.0, ms_per_token=100)
+FRAME = 1600  # 100ms
+
+
+class Recorder:
+    """部分結果と最終結果を発話IDごとに記録する"""
+
+    def __init__(self):
+        self.partials = {}
+        self.finals = {}
+
+    async def on_partial(self, utterance: Utterance):
+        self.partials.setdefault(utterance.utterance_id, []).append(utterance.text)
+
+    async def on_result(self, utterance: Utterance):
+        self.finals[utterance.utterance_id] = utterance.text
+
+
+def service_for(recorder: Recorder, config: FakeLiveConfig = FAST, **kwargs) -> TranscribeService:
+    return TranscribeService(FakeLiveBackend(config), on_result=recorder.on_result,
+                             on_partial=recorder.on_partial, **kwargs)
+
+
+async def play(service: TranscribeService, audio: np.ndarray, pace: float = 0.0):
+    data = audio.tobytes()
+    for i in range(0, len(data), FRAME * 2):
+        await service.send_audio(data[i:i + FRAME * 2])
+        await asyncio.sleep(pace)
+
+
+def test_strip_seam_removes_the_resent_overlap():
+    assert strip_seam("本日の会議では新しい機能", "新しい機能について確認します") == "について確認します"
+
+
+def test_strip_seam_ignores_short_coincidental_repeats():
+    # 2〜3文字の一致は偶然の繰り返しとみなして残す
+    assert strip_seam("それではよろしく", "よろしくお願いします") == "お願いします"
+    assert strip_seam("確認します", "します。次に") == "します。次に"
+    assert strip_seam("ですね", "ですね") == "ですね"
+
+
+def test_seam_stripped_to_empty_still_closes_the_utterance():
+    async def main():
+        recorder = Recorder()
+        service = service_for(recorder)
+        previous = Utterance("u1", Trace(None))
+        previous.append("新しい機能")
+        utterance = Utterance("u2", Trace(None))
+        utterance.seam = previous
+        await service._add_partial(utterance, "機能について")
+        # 前のセッションの結果が後から届き、重複を除くと空になる
+        previous.texts = ["新しい機能について"]
+        stream = type("Stream", (), {"rotated": False})()
+        await service._finish_utterance(stream, utterance)
+        return recorder
+
+    recorder = asyncio.run(main())
+    assert recorder.partials == {"u2": ["機能について"]}
+    assert recorder.finals == {"u2": ""}
+
+
+def test_every_partial_utterance_gets_a_final_across_forced_rotations():
+    async def main():
+        recorder = Recorder()
+        service = service_for(recorder, rotate_after=0.3, rotation_wait=0.0, rotation_overlap_ms=500)
+        await service.start_session(streaming=True)
+        for _ in range(4):
+            await play(service, tone(0.8), pace=0.05)
+        await service.end_session()
+        return recorder
+
+    recorder = asyncio.run(main())
+    assert recorder.partials
+    assert set(recorder.partials) <= set(recorder.finals)
+
+
+def test_rotation_uses_the_reserved_slot_when_saturated():
+    async def main():
+        recorder = Recorder()
+        scheduler = UpstreamScheduler(max_concurrent=2, reserved=1)
+        service = service_for(recorder, scheduler=scheduler, rotate_after=0.2)
+        await service.start_session(streaming=True)
+        first = service._stream
+        # 通常の枠はこの接続で埋まっている
+        assert scheduler.active == scheduler.limit
+        await play(service, np.concatenate([tone(0.5), silence(0.1)]), pace=0.05)
+        await service.end_utterance()
+        await asyncio.sleep(0.05)
+        await play(service, tone(0.3))
+        rotated = service._stream is not first
+        await service.end_session()
+        return scheduler, rotated
+
+    scheduler, rotated = asyncio.run(main())
+    assert rotated
+    assert scheduler.reserved_granted == 1
+    assert scheduler.active == 0
+
+
+def test_rotation_is_deferred_when_the_reserve_is_taken():
+    async def main():
+        recorder = Recorder()
+        scheduler = UpstreamScheduler(max_concurrent=1, reserved=0)
+        service = service_for(recorder, scheduler=scheduler, rotate_after=0.1)
+        await service.start_session(streaming=True)
+        first = service._stream
+        await asyncio.sleep(0.15)
+        await play(service, tone(0.3))
+        await asyncio.sleep(0.02)
+        kept = service._stream is first
+        await service.end_session()
+        return scheduler, kept
+
+    scheduler, kept = asyncio.run(main())
+    assert kept
+    assert scheduler.reserved_rejected >= 1
+
+
+def test_closed_upstream_session_is_reopened():
+    async def main():
+        recorder = Recorder()
+        config = FakeLiveConfig(first_token_latency=0.0, token_interval=0.0, ms_per_token=100, session_duration=0.3)
+        service = service_for(recorder, config, rotate_after=0)
+        await service.start_session(streaming=True)
+        # 上限時間を過ぎて閉じられた後も送信は失敗しない
+        await play(service, tone(1.0), pace=0.05)
+        await service.end_utterance()
+        await asyncio.sleep(0.05)
+        await service.end_session()
+        return recorder, service.backend.connections
+
+    recorder, connections = asyncio.run(main())
+    assert connections >= 2
+    assert set(recorder.partials) <= set(recorder.finals)
@@ -0,0 +1,57 @@
+import pytest
+
+from src.transcript_store import DEFAULT_PAGE_SIZE, TranscriptStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TranscriptStore(str(tmp_path / "transcripts.db"), batch_size=4)
+    store.start()
+    store.start_session("s1", "streaming")
+    store.start_session("s2", "chunk")
+    for i in range(10):
+        store.append("s1", {"utterance_id": f"u{i}", "text": f"本日の会議 その{i}", "offset_ms": i * 1000.0})
+    store.append("s2", {"utterance_id": "u0", "text": "資料を準備してください"})
+    store.end_session("s1")
+    # 書き込みはライタースレッドで行うので、閉じて書き終えてから読む
+    store.close()
+    return store
+
+
+def test_get_session_pages_with_after_id(store):
+    first = store.get_session("s1", limit=4)
+    assert [u["utterance_id"] for u in first["utterances"]] == ["u0", "u1", "u2", "u3"]
+    assert first["mode"] == "streaming" and first["ended_at"] is not None
+
+    rest = store.get_session("s1", after_id=first["utterances"][-1]["id"], limit=100)
+    assert [u["utterance_id"] for u in rest["utterances"]] == [f"u{i}" for i in range(4, 10)]
+    assert rest["utterances"][0]["offset_ms"] == 4000.0
+
+
+def test_get_session_unknown(store):
+    assert store.get_session("missing") is None
+
+
+@pytest.mark.parametrize("limit", [-1, 0])
+def test_non_positive_limit_is_not_unbounded(store, limit):
+    # SQLite は負の LIMIT を無制限として扱う
+    assert len(store.get_session("s1", limit=limit)["utterances"]) == 1
+    assert len(store.search("本日", limit=limit)) == 1
+
+
+def test_limit_is_capped_at_page_size(store):
+    assert len(store.get_session("s1", limit=DEFAULT_PAGE_SIZE * 10)["utterances"]) == 10
+
+
+def test_search_across_sessions_newest_first(store):
+    results = store.search("本日の会議")
+    assert [r["utterance_id"] for r in results][:2] == ["u9", "u8"]
+    assert {r["session_id"] for r in results} == {"s1"}
+
+    assert [r["session_id"] for r in store.search("資料")] == ["s2"]
+    assert store.search("本日", session_id="s2") == []
+
+
+def test_search_escapes_like_wildcards(store):
+    assert store.search("%") == []
+    assert store.search('"本日') == []
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from src.vad import AUDIO, SPEECH_END, SPEECH_START, VADConfig, VoiceActivitySegmenter
+
+from .conftest import silence, tone
+
+
+def run(audio: np.ndarray, batch: int, config: VADConfig = VADConfig()):
+    """batch サンプルずつ取り込んだ時のイベント (種類, 位置) と送信される音声"""
+    segmenter = VoiceActivitySegmenter(config)
+    events, forwarded = [], []
+    for i in range(0, audio.size, batch):
+        for event in segmenter.process(audio[i:i + batch]):
+            events.append((event.kind, event.offset_ms))
+            if event.kind == AUDIO:
+                forwarded.append(event.audio)
+    events.extend((event.kind, event.offset_ms) for event in segmenter.flush())
+    merged = [(kind, offset) for kind, offset in events if kind != AUDIO]
+    return merged, np.concatenate(forwarded) if forwarded else np.empty(0, dtype=np.int16)
+
+
+@pytest.fixture
+def speech() -> np.ndarray:
+    return np.concatenate([silence(1.0), tone(1.2), silence(0.15), tone(0.5), silence(1.0), tone(0.8), silence(0.6)])
+
+
+def test_detects_utterances_with_hangover(speech):
+    events, _ = run(speech, speech.size)
+    starts = [offset for kind, offset in events if kind == SPEECH_START]
+    ends = [offset for kind, offset in events if kind == SPEECH_END]
+
+    # 0.15秒の途切れはハングオーバー (300ms) の内側なので1つの発話
+    assert len(starts) == len(ends) == 2
+    # 発話の開始はプリロール (300ms) ぶん前から
+    assert starts[0] == pytest.approx(1000 - 300, abs=20)
+    assert ends[0] == pytest.approx(2850 + 300, abs=40)
+
+
+@pytest.mark.parametrize("batch", [1, 160, 320, 333, 4096, 16000])
+def test_batch_size_does_not_change_the_result(speech, batch):
+    expected_events, expected_audio = run(speech, speech.size)
+    events, audio = run(speech, batch)
+
+    assert events == expected_events
+    np.testing.assert_array_equal(audio, expected_audio)
+
+
+def test_silence_is_not_forwarded():
+    events, audio = run(silence(2.0), 320)
+    assert events == []
+    assert audio.size == 0
+
+
+def test_flush_ends_an_open_utterance():
+    segmenter = VoiceActivitySegmenter()
+    segmenter.process(tone(0.5))
+    assert segmenter.in_speech
+    assert [event.kind for event in segmenter.flush()] == [SPEECH_END]
+    assert not segmenter.in_speech
+
+
+def test_short_pause_does_not_end_the_turn():
+    # 0.8秒の間は turn_end_ms (1.5秒) より短い - 間の音声は送らずに同じ発話として続ける
+    audio = np.concatenate([tone(1.0), silence(0.8), tone(1.0), silence(2.0)])
+    events, forwarded = run(audio, 320, VADConfig(turn_end_ms=1500))
+    assert [kind for kind, _ in events] == [SPEECH_START, SPEECH_END]
+    assert forwarded.size < audio.size - silence(1.5).size
+
+
+def test_pause_reaching_turn_end_splits_the_turn():
+    audio = np.concatenate([tone(1.0), silence(0.8), tone(1.0)])
+    events, _ = run(audio, 320, VADConfig(turn_end_ms=500))
+    assert [kind for kind, _ in events] == [SPEECH_START, SPEECH_END, SPEECH_START, SPEECH_END]
+    # 発話の終わりは音声の送信を止めた位置 (ハングオーバーの末尾)
+    assert events[1][1] == pytest.approx(1000 + 300, abs=20)
+
+
+@pytest.mark.parametrize("batch", [1, 320, 333, 4096, 16000])
+def test_turn_end_is_batch_invariant(batch):
+    audio = np.concatenate([tone(0.5), silence(0.45), tone(0.3), silence(0.7), tone(0.4), silence(1.0)])
+    config = VADConfig(turn_end_ms=600)
+    assert run(audio, batch, config)[0] == run(audio, audio.size, config)[0]
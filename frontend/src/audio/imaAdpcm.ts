@@ -0,0 +1,90 @@
+// Mono IMA ADPCM encoder matching backend/src/audio_codec.py (decode_ima_adpcm).
+// Each block is independently decodable:
+//   predictor (i16) | step_index (u8) | reserved (u8) | 4-bit codes (low nibble first)
+// and holds an odd number of samples (the first one is the header predictor).
+
+const HEADER_SIZE = 4;
+
+const INDEX_TABLE = [-1, -1, -1, -1, 2, 4, 6, 8, -1, -1, -1, -1, 2, 4, 6, 8];
+
+const STEP_TABLE = [
+  7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+  50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+  253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+  1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+  3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442, 11487,
+  12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794, 32767,
+];
+
+/**
+ * Streaming encoder: 16-bit PCM in, one ADPCM block per call out (4 bits/sample).
+ * A block needs an odd sample count, so an even input leaves its last sample
+ * for the next block; flush() emits it as a header-only block.
+ */
+export class ImaAdpcmEncoder {
+  private index = 0;
+  private carry: number | null = null;
+
+  encode(pcm: Int16Array): ArrayBuffer | null {
+    let samples = pcm;
+    if (this.carry !== null) {
+      samples = new Int16Array(pcm.length + 1);
+      samples[0] = this.carry;
+      samples.set(pcm, 1);
+      this.carry = null;
+    }
+    if (samples.length === 0) return null;
+    const count = samples.length % 2 === 1 ? samples.length : samples.length - 1;
+    if (count < samples.length) this.carry = samples[count];
+    return this.encodeBlock(samples.subarray(0, count));
+  }
+
+  flush(): ArrayBuffer | null {
+    if (this.carry === null) return null;
+    const block = this.encodeBlock(Int16Array.of(this.carry));
+    this.carry = null;
+    return block;
+  }
+
+  reset() {
+    this.index = 0;
+    this.carry = null;
+  }
+
+  private encodeBlock(samples: Int16Array): ArrayBuffer {
+    const block = new Uint8Array(HEADER_SIZE + (samples.length - 1) / 2);
+    const header = new DataView(block.buffer, 0, HEADER_SIZE);
+    let predictor = samples[0];
+    let index = this.index;
+    header.setInt16(0, predictor, true);
+    header.setUint8(2, index);
+
+    for (let i = 1; i < samples.length; i++) {
+      const step = STEP_TABLE[index];
+      let diff = samples[i] - predictor;
+      let code = diff < 0 ? 8 : 0;
+      diff = Math.abs(diff);
+      let delta = step >> 3;
+      if (diff >= step) {
+        code |= 4;
+        diff -= step;
+        delta += step;
+      }
+      if (diff >= step >> 1) {
+        code |= 2;
+        diff -= step >> 1;
+        delta += step >> 1;
+      }
+      if (diff >= step >> 2) {
+        code |= 1;
+        delta += step >> 2;
+      }
+      predictor = Math.max(-32768, Math.min(32767, code & 8 ? predictor - delta : predictor + delta));
+      index = Math.max(0, Math.min(STEP_TABLE.length - 1, index + INDEX_TABLE[code]));
+      const byte = HEADER_SIZE + ((i - 1) >> 1);
+      block[byte] |= (i - 1) % 2 === 0 ? code : code << 4;
+    }
+    this.index = index;
+    return block.buffer;
+  }
+}
@@ -1,4 +1,4 @@
-import { useState, useCallback, useEffect } from 'react';
+import { useState, useCallback, useEffect, useRef } from 'react';
 import { useAudioCapture } from '../hooks/useAudioCapture';
 import { useWebSocket, type WebSocketMessage } from '../hooks/useWebSocket';
 
@@ -7,6 +7,9 @@ const WEBSOCKET_URL = 'ws://localhost:8000/ws/transcribe';
 export const AudioTranscriber: React.FC = () => {
   const [transcriptionResults, setTranscriptionResults] = useState<string[]>([]);
   const [currentTranscription, setCurrentTranscription] = useState<string>('');
+  // In-progress utterances (utterance_id -> latest partial), rendered as live text
+  const [liveTranscriptions, setLiveTranscriptions] = useState<Map<string, string>>(new Map());
+  const revisionsRef = useRef<Map<string, number>>(new Map());
   
   const audioCapture = useAudioCapture({
     bufferSize: 2048, // Valid power of 2
@@ -19,12 +22,29 @@ export const AudioTranscriber: React.FC = () => {
   // Handle WebSocket messages
   const handleWebSocketMessage = useCallback((message: WebSocketMessage) => {
     switch (message.type) {
-      case 'transcription_result':
+      case 'transcription_partial': {
+        const id = message.utterance_id!;
+        const revision = message.revision ?? 0;
+        // Ignore partials that arrive after a newer revision (or after the final)
+        if ((revisionsRef.current.get(id) ?? -1) >= revision) break;
+        revisionsRef.current.set(id, revision);
+        setLiveTranscriptions(prev => new Map(prev).set(id, message.text ?? ''));
+        break;
+      }
+      case 'transcription_final': {
+        const id = message.utterance_id!;
+        revisionsRef.current.set(id, Number.MAX_SAFE_INTEGER);
+        setLiveTranscriptions(prev => {
+          const next = new Map(prev);
+          next.delete(id);
+          return next;
+        });
         if (message.text) {
           setTranscriptionResults(prev => [...prev, message.text!]);
           setCurrentTranscription('');
         }
         break;
+      }
       case 'error':
         console.error('サーバーエラー:', message.message);
         break;
@@ -42,9 +62,8 @@ export const AudioTranscriber: React.FC = () => {
   
   // Handle audio chunks
   const handleAudioChunk = useCallback((chunk: { data: ArrayBuffer; timestamp: number; audioLevel: number }) => {
-    if (webSocket.isConnected) {
-      webSocket.sendAudioChunk(chunk.data, chunk.timestamp);
-    }
+    // Sent immediately when connected, buffered for re-send while reconnecting
+    webSocket.sendAudioChunk(chunk.data, chunk.timestamp);
   }, [webSocket]);
   
   // Start recording
@@ -80,6 +99,8 @@ export const AudioTranscriber: React.FC = () => {
   const clearResults = useCallback(() => {
     setTranscriptionResults([]);
     setCurrentTranscription('');
+    setLiveTranscriptions(new Map());
+    revisionsRef.current.clear();
   }, []);
   
   // Audio level indicator
@@ -231,7 +252,18 @@ export const AudioTranscriber: React.FC = () => {
       </div>
       
       {/* Current transcription */}
-      {currentTranscription && (
+      {liveTranscriptions.size > 0 ? (
+        <div style={{
+          padding: '15px',
+          backgroundColor: '#e3f2fd',
+          borderRadius: '5px',
+          marginBottom: '20px',
+          fontSize: '18px',
+          color: '#555',
+        }}>
+          {Array.from(liveTranscriptions.values()).join(' ')}
+        </div>
+      ) : currentTranscription && (
         <div style={{
           padding: '15px',
           backgroundColor: '#e3f2fd',
@@ -1,17 +1,39 @@
 import { useState, useRef, useCallback, useEffect } from 'react';
+import { ImaAdpcmEncoder } from '../audio/imaAdpcm';
+
+const FRAME_VERSION = 1;
+const FRAME_HEADER_SIZE = 16;
+// 4-bit IMA ADPCM: 8 KB/s at 16 kHz instead of 32 KB/s for raw PCM_S16LE
+const SAMPLE_FORMAT_IMA_ADPCM = 4;
+const AUDIO_ENCODING = 'ima_adpcm';
+const SAMPLE_RATE = 16000;
+// Recent frames kept for re-sending after a reconnect. The server does not keep
+// audio, so this must cover SESSION_RESUME_GRACE (30 s by default): ~30.7 s at
+// 2048 samples/frame. Frames that fall out of this buffer are lost on resume.
+const RESEND_BUFFER_FRAMES = 240;
+const RECONNECT_DELAY_MS = 1000;
 
 export interface TranscriptionResult {
-  type: 'transcription_result';
+  type: 'transcription_partial' | 'transcription_final';
+  utterance_id: string;
+  revision: number;
   text: string;
-  timestamp: number;
 }
 
 export interface WebSocketMessage {
-  type: 'session_started' | 'session_ended' | 'error' | 'transcription_result';
+  type: 'session_started' | 'session_ended' | 'session_resumed' | 'error' | 'transcription_partial' | 'transcription_final';
   text?: string;
+  utterance_id?: string;
+  revision?: number;
   message?: string;
   code?: string;
+  mode?: 'chunk' | 'streaming';
+  protocol?: 'json' | 'binary';
+  sequence?: number;
   timestamp?: number;
+  message_seq?: number;
+  session_token?: string;
+  last_audio_sequence?: number | null;
 }
 
 export interface WebSocketHookState {
@@ -31,6 +53,13 @@ export const useWebSocket = (url: string) => {
   
   const socketRef = useRef<WebSocket | null>(null);
   const onMessageRef = useRef<((message: WebSocketMessage) => void) | null>(null);
+  const sequenceRef = useRef<number>(0);
+  const encoderRef = useRef(new ImaAdpcmEncoder());
+  // Resumable session state (see backend/src/resumable.py)
+  const sessionTokenRef = useRef<string | null>(null);
+  const lastMessageSeqRef = useRef<number>(0);
+  const sentFramesRef = useRef<{ sequence: number; frame: ArrayBuffer }[]>([]);
+  const manualCloseRef = useRef<boolean>(false);
   
   const connect = useCallback(() => {
     if (socketRef.current?.readyState === WebSocket.OPEN) {
@@ -38,6 +67,7 @@ export const useWebSocket = (url: string) => {
     }
     
     setState(prev => ({ ...prev, isConnecting: true, error: null }));
+    manualCloseRef.current = false;
     
     try {
       const socket = new WebSocket(url);
@@ -50,11 +80,39 @@ export const useWebSocket = (url: string) => {
           isConnecting: false,
           error: null,
         }));
+        // Reconnected mid-session: ask the server to replay what we missed
+        if (sessionTokenRef.current) {
+          socket.send(JSON.stringify({
+            type: 'resume_session',
+            session_token: sessionTokenRef.current,
+            last_message_seq: lastMessageSeqRef.current,
+          }));
+        }
       };
       
       socket.onmessage = (event) => {
         try {
           const message: WebSocketMessage = JSON.parse(event.data);
+          if (message.message_seq !== undefined) {
+            lastMessageSeqRef.current = message.message_seq;
+          }
+          if (message.type === 'session_started') {
+            sessionTokenRef.current = message.session_token ?? null;
+          } else if (message.type === 'session_ended') {
+            sessionTokenRef.current = null;
+          } else if (message.type === 'session_resumed') {
+            // Re-send only the frames the server has not received
+            const last = message.last_audio_sequence ?? -1;
+            const oldest = sentFramesRef.current[0]?.sequence;
+            if (oldest !== undefined && oldest > last + 1) {
+              console.warn(`音声フレーム ${last + 1}〜${oldest - 1} は保持していないため送り直せません`);
+            }
+            for (const { sequence, frame } of sentFramesRef.current) {
+              if (sequence > last) socket.send(frame);
+            }
+          } else if (message.type === 'error' && message.code === 'session_expired') {
+            sessionTokenRef.current = null;
+          }
           setState(prev => ({ ...prev, lastMessage: message }));
           
           if (onMessageRef.current) {
@@ -71,6 +129,10 @@ export const useWebSocket = (url: string) => {
           isConnected: false,
           isConnecting: false,
         }));
+        if (!manualCloseRef.current && sessionTokenRef.current) {
+          socketRef.current = null;
+          setTimeout(() => connectRef.current(), RECONNECT_DELAY_MS);
+        }
       };
       
       socket.onerror = () => {
@@ -91,7 +153,12 @@ export const useWebSocket = (url: string) => {
     }
   }, [url]);
   
+  const connectRef = useRef(connect);
+  connectRef.current = connect;
+  
   const disconnect = useCallback(() => {
+    manualCloseRef.current = true;
+    sessionTokenRef.current = null;
     if (socketRef.current) {
       socketRef.current.close();
       socketRef.current = null;
@@ -112,24 +179,55 @@ export const useWebSocket = (url: string) => {
   }, []);
   
   const startSession = useCallback(() => {
-    sendMessage({ type: 'start_session' });
+    // Keep one upstream Live session open for the whole recording
+    sequenceRef.current = 0;
+    lastMessageSeqRef.current = 0;
+    sentFramesRef.current = [];
+    encoderRef.current.reset();
+    sendMessage({
+      type: 'start_session',
+      mode: 'streaming',
+      protocol: 'binary',
+      encoding: AUDIO_ENCODING,
+      sample_rate: SAMPLE_RATE,
+    });
   }, [sendMessage]);
   
+  const sendFrame = useCallback((block: ArrayBuffer, timestamp: number) => {
+    const open = socketRef.current?.readyState === WebSocket.OPEN;
+    // While reconnecting, keep buffering frames so they can be re-sent after resume
+    if (!open && !sessionTokenRef.current) return;
+    
+    // Binary frame: fixed header + one ADPCM block (see backend/src/protocol.py)
+    const frame = new Uint8Array(FRAME_HEADER_SIZE + block.byteLength);
+    const header = new DataView(frame.buffer, 0, FRAME_HEADER_SIZE);
+    header.setUint8(0, FRAME_VERSION);
+    header.setUint8(1, SAMPLE_FORMAT_IMA_ADPCM);
+    header.setUint16(2, 0, true);
+    header.setUint32(4, sequenceRef.current, true);
+    header.setFloat64(8, timestamp, true);
+    frame.set(new Uint8Array(block), FRAME_HEADER_SIZE);
+    
+    const sent = sentFramesRef.current;
+    sent.push({ sequence: sequenceRef.current, frame: frame.buffer });
+    if (sent.length > RESEND_BUFFER_FRAMES) sent.shift();
+    sequenceRef.current = (sequenceRef.current + 1) >>> 0;
+    
+    if (open) socketRef.current!.send(frame.buffer);
+  }, []);
+  
   const endSession = useCallback(() => {
+    // Send the sample held back to keep the last ADPCM block odd-length
+    const last = encoderRef.current.flush();
+    if (last) sendFrame(last, Date.now());
     sendMessage({ type: 'end_session' });
-  }, [sendMessage]);
+  }, [sendFrame, sendMessage]);
   
   const sendAudioChunk = useCallback((audioData: ArrayBuffer, timestamp: number) => {
-    // Convert ArrayBuffer to base64
-    const uint8Array = new Uint8Array(audioData);
-    const base64 = btoa(String.fromCharCode(...uint8Array));
-    
-    sendMessage({
-      type: 'audio_chunk',
-      data: base64,
-      timestamp,
-    });
-  }, [sendMessage]);
+    // Capture runs at 16 kHz, so this is 16 kHz PCM_S16LE
+    const block = encoderRef.current.encode(new Int16Array(audioData));
+    if (block) sendFrame(block, timestamp);
+  }, [sendFrame]);
   
   const setOnMessage = useCallback((callback: (message: WebSocketMessage) => void) => {
     onMessageRef.current = callback;